@@ -0,0 +1,204 @@
+"""
+Memory and query benchmark for node storage at fleet scale.
+
+Builds the same synthetic rows (node names x instances, fresh strings per row as a
+scan produces them) three ways and reports memory, build time and lookup times:
+
+    dict     plain @dataclass Node plus name -> instance -> entry dicts (the old FleetIndex layout)
+    slotted  @dataclass(slots=True) Node in the same dicts
+    table    NodeTable columns with interned strings and name/URL indexes
+
+    python benchmarks/bench_node_table.py --rows 50000 --output table.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from node_manager import Node, normalize_remote_url
+from node_table import NodeTable
+
+LAYOUTS = ["dict", "slotted", "table"]
+
+
+@dataclass
+class PlainNode:
+    name: str
+    path: str
+    is_git_repo: bool
+    remote_url: Optional[str] = None
+    last_update_time: Optional[str] = None
+    install_time: Optional[str] = None
+
+
+@dataclass
+class PlainEntry:
+    instance: str
+    node: object
+    head_sha: Optional[str] = None
+    status: str = "未知"
+
+
+def iter_rows(rows: int, instances: int, seed: int = 0) -> Iterator[tuple]:
+    """
+    (instance, name, path, url, updated, installed, sha) tuples. Every string is built
+    per row, like separate scans of each instance would return them.
+    """
+    rng = random.Random(seed)
+    names = max(1, rows // instances)
+    for i in range(rows):
+        n, inst = i % names, i // names
+        owner = f"author{n % 700}"
+        yield (
+            f"instance-{inst}",
+            f"ComfyUI-Node-{n:05d}",
+            f"/srv/comfy/instance-{inst}/custom_nodes/ComfyUI-Node-{n:05d}",
+            f"https://github.com/{owner}/ComfyUI-Node-{n:05d}" if n % 10 else None,
+            f"2024-0{1 + n % 9}-1{n % 10} 12:00:00" if n % 3 == 0 else None,
+            f"2023-1{n % 3}-0{1 + n % 9} 08:30:00",
+            "%040x" % rng.getrandbits(160) if n % 10 else None,
+        )
+
+
+def build_dicts(data: Iterator[tuple], node_cls) -> Dict[str, Dict[str, PlainEntry]]:
+    entries: Dict[str, Dict[str, PlainEntry]] = {}
+    for inst, name, path, url, updated, installed, sha in data:
+        node = node_cls(name, path, url is not None, url, updated, installed)
+        entries.setdefault(name, {})[inst] = PlainEntry(inst, node, sha)
+    return entries
+
+
+def build_table(data: Iterator[tuple]) -> NodeTable:
+    table = NodeTable()
+    for inst, name, path, url, updated, installed, sha in data:
+        table.add(Node(name, path, url is not None, url, updated, installed), inst, sha)
+    return table
+
+
+def measure_build(build: Callable[[Iterator[tuple]], object], make: Callable[[], Iterator[tuple]]) -> tuple:
+    """
+    (store, bytes retained, build seconds). Rows are generated while building, so only
+    what the layout keeps is counted; the time comes from a separate untraced run.
+    """
+    data = list(make())
+    start = time.perf_counter()
+    build(iter(data))
+    elapsed = time.perf_counter() - start
+    del data
+    gc.collect()
+    tracemalloc.start()
+    built = build(make())
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, current, elapsed
+
+
+def per_call(fn: Callable[[], object], calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls
+
+
+def bench_layout(layout: str, rows: int, instances: int, lookups: int, seed: int) -> Dict:
+    make = lambda: iter_rows(rows, instances, seed)
+    data = list(make())
+    rng = random.Random(seed)
+    samples = [data[rng.randrange(len(data))] for _ in range(lookups)]
+    urls = [row[3] for row in samples if row[3]]
+    instance_names = sorted({row[0] for row in data})
+    del data
+
+    if layout == "table":
+        store, memory, build = measure_build(build_table, make)
+        it = iter(samples * 2)
+        by_name = per_call(lambda: store.find(next(it)[1], next(it)[0]), lookups // 2)
+        it_url = iter(urls)
+        by_url = per_call(lambda: store.rows_by_url(next(it_url)), len(urls))
+
+        def matrix():
+            return [(name, {store.instance(r): r for r in store.rows_by_name(name)}) for name in store.names()]
+    else:
+        node_cls = PlainNode if layout == "dict" else Node
+        store, memory, build = measure_build(lambda rows_: build_dicts(rows_, node_cls), make)
+        it = iter(samples)
+        by_name = per_call(lambda: (lambda row: store.get(row[1], {}).get(row[0]))(next(it)), lookups)
+        # Without a URL index every lookup scans all entries
+        scan_urls = urls[:20]
+        it_url = iter(scan_urls)
+
+        def scan(url):
+            key = normalize_remote_url(url)
+            return [e for per in store.values() for e in per.values()
+                    if e.node.remote_url and normalize_remote_url(e.node.remote_url) == key]
+
+        by_url = per_call(lambda: scan(next(it_url)), len(scan_urls))
+
+        def matrix():
+            return [(name, {inst: store[name].get(inst) for inst in instance_names}) for name in sorted(store)]
+
+    start = time.perf_counter()
+    matrix()
+    join = time.perf_counter() - start
+    return {
+        "memory_mb": round(memory / 1024 ** 2, 2),
+        "bytes_per_row": round(memory / rows, 1),
+        "build_s": round(build, 4),
+        "lookup_name_us": round(by_name * 1e6, 3),
+        "lookup_url_us": round(by_url * 1e6, 3),
+        "matrix_s": round(join, 4),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare node storage layouts at fleet scale.")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--instances", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--only", nargs="+", choices=LAYOUTS, default=LAYOUTS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for layout in args.only:
+        print(f"Benchmarking {layout}...", file=sys.stderr)
+        results[layout] = bench_layout(layout, args.rows, args.instances, args.lookups, args.seed)
+        gc.collect()
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": args.rows,
+        "instances": args.instances,
+        "results": results,
+    }
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    print(f"\n{'layout':<8} {'MB':>8} {'B/row':>8} {'build':>8} {'name µs':>9} {'url µs':>10} {'matrix':>8}", file=sys.stderr)
+    for layout, r in results.items():
+        print(f"{layout:<8} {r['memory_mb']:>8.2f} {r['bytes_per_row']:>8.1f} {r['build_s']:>7.3f}s "
+              f"{r['lookup_name_us']:>9.2f} {r['lookup_url_us']:>10.1f} {r['matrix_s']:>7.3f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import os
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# Fixed identity and timestamps keep generated repos byte-identical between runs
+GIT_ENV = {
+    "GIT_AUTHOR_NAME": "bench",
+    "GIT_AUTHOR_EMAIL": "bench@localhost",
+    "GIT_COMMITTER_NAME": "bench",
+    "GIT_COMMITTER_EMAIL": "bench@localhost",
+    "GIT_CONFIG_NOSYSTEM": "1",
+    "GIT_TERMINAL_PROMPT": "0",
+}
+BASE_TIMESTAMP = 1700000000
+
+
+@dataclass
+class FixtureSpec:
+    git_nodes: int = 20
+    folder_nodes: int = 5
+    history_depth: int = 50
+    files_per_node: int = 50
+    commits_ahead: int = 3
+    file_size: int = 2048
+    folder_size_kb: int = 512
+
+
+@dataclass
+class Fixture:
+    root: str
+    custom_nodes: str
+    remotes_dir: str
+    spec: FixtureSpec
+    git_node_names: List[str] = field(default_factory=list)
+    folder_node_names: List[str] = field(default_factory=list)
+    # Commit each Git node was cloned at, before upstream moved ahead
+    base_shas: Dict[str, str] = field(default_factory=dict)
+
+    def remote_url(self, name: str) -> str:
+        # file:// forces the real pack transport instead of a hardlinking local clone
+        return "file://" + os.path.join(self.remotes_dir, f"{name}.git")
+
+
+def git_env() -> dict:
+    env = os.environ.copy()
+    env.update(GIT_ENV)
+    return env
+
+
+def run_git(args: List[str], cwd: str = None, stdin: bytes = None) -> str:
+    res = subprocess.run(["git"] + args, cwd=cwd, input=stdin, env=git_env(), check=True,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return res.stdout.decode().strip()
+
+
+def _blob(size: int, seed: str) -> bytes:
+    line = (f"# {seed} " + "x" * 70 + "\n").encode()
+    return (line * (size // len(line) + 1))[:size]
+
+
+def _fast_import_stream(name: str, start: int, count: int, spec: FixtureSpec, parent: bool) -> bytes:
+    """
+    Build a git fast-import stream of `count` commits on refs/heads/main.
+    The first commit of a fresh repo writes every file, later ones each touch one file.
+    """
+    out = []
+    for i in range(start, start + count):
+        msg = f"{name} commit {i}".encode()
+        ts = BASE_TIMESTAMP + i * 60
+        out.append(b"commit refs/heads/main\n")
+        out.append(f"committer bench <bench@localhost> {ts} +0000\n".encode())
+        out.append(f"data {len(msg)}\n".encode() + msg + b"\n")
+        if i == start and parent:
+            out.append(b"from refs/heads/main^0\n")
+        if i == 0:
+            paths = [f"src/module_{j}.py" for j in range(spec.files_per_node)] + ["requirements.txt"]
+        else:
+            paths = [f"src/module_{i % max(spec.files_per_node, 1)}.py"]
+        for path in paths:
+            data = b"numpy\n" if path == "requirements.txt" else _blob(spec.file_size, f"{name}:{path}:{i}")
+            out.append(f"M 100644 inline {path}\n".encode())
+            out.append(f"data {len(data)}\n".encode() + data + b"\n")
+        out.append(b"\n")
+    return b"".join(out)
+
+
+def create_git_node(fixture: Fixture, name: str) -> None:
+    spec = fixture.spec
+    bare = os.path.join(fixture.remotes_dir, f"{name}.git")
+    run_git(["init", "-q", "--bare", "--initial-branch=main", bare])
+    run_git(["fast-import", "--quiet"], cwd=bare,
+            stdin=_fast_import_stream(name, 0, max(spec.history_depth, 1), spec, parent=False))
+
+    node_dir = os.path.join(fixture.custom_nodes, name)
+    run_git(["clone", "-q", fixture.remote_url(name), node_dir])
+    fixture.base_shas[name] = run_git(["rev-parse", "HEAD"], cwd=node_dir)
+
+    # Upstream moves on after the clone, so check/pull have real work to do
+    if spec.commits_ahead:
+        run_git(["fast-import", "--quiet"], cwd=bare,
+                stdin=_fast_import_stream(name, max(spec.history_depth, 1), spec.commits_ahead, spec, parent=True))
+
+
+def create_folder_node(fixture: Fixture, name: str) -> None:
+    spec = fixture.spec
+    node_dir = os.path.join(fixture.custom_nodes, name)
+    os.makedirs(node_dir)
+    remaining = spec.folder_size_kb * 1024
+    i = 0
+    while remaining > 0:
+        size = min(remaining, 64 * 1024)
+        sub = os.path.join(node_dir, f"part_{i // 20}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"file_{i}.bin"), "wb") as f:
+            f.write(_blob(size, f"{name}:{i}"))
+        remaining -= size
+        i += 1
+
+
+def build_fixture(root: str, spec: FixtureSpec) -> Fixture:
+    """
+    Create <root>/ComfyUI/custom_nodes with synthetic Git and folder nodes,
+    plus <root>/remotes holding one bare upstream repo per Git node.
+    """
+    fixture = Fixture(
+        root=root,
+        custom_nodes=os.path.join(root, "ComfyUI", "custom_nodes"),
+        remotes_dir=os.path.join(root, "remotes"),
+        spec=spec,
+    )
+    os.makedirs(fixture.custom_nodes, exist_ok=True)
+    os.makedirs(fixture.remotes_dir, exist_ok=True)
+
+    for i in range(spec.git_nodes):
+        name = f"bench-git-node-{i:03d}"
+        create_git_node(fixture, name)
+        fixture.git_node_names.append(name)
+
+    for i in range(spec.folder_nodes):
+        name = f"bench-folder-node-{i:03d}"
+        create_folder_node(fixture, name)
+        fixture.folder_node_names.append(name)
+    return fixture
+
+
+def reset_git_nodes(fixture: Fixture) -> None:
+    """
+    Move every Git node and its origin/main back to the commit it was cloned at, undoing a fetch or pull.
+    Fetched objects stay in the local store, so only the first check/pull run transfers packs.
+    """
+    for name in fixture.git_node_names:
+        node_dir = os.path.join(fixture.custom_nodes, name)
+        base = fixture.base_shas[name]
+        run_git(["reset", "-q", "--hard", base], cwd=node_dir)
+        run_git(["update-ref", "refs/remotes/origin/main", base], cwd=node_dir)
@@ -0,0 +1,216 @@
+"""
+Offline benchmark harness for NodeManager operations.
+
+Generates a synthetic custom_nodes tree backed by local bare remotes, times
+scan / check / pull / clone / copy / restore / backup against it and writes
+the results as JSON so runs can be compared across versions:
+
+    python benchmarks/run_benchmarks.py --git-nodes 30 --output before.json
+    python benchmarks/run_benchmarks.py --git-nodes 30 --output after.json --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+import node_manager
+from node_manager import NodeManager
+from benchmarks.fixtures import FixtureSpec, Fixture, build_fixture, reset_git_nodes, git_env
+
+ALL_BENCHMARKS = ["scan", "check", "pull", "clone", "copy", "restore", "backup"]
+
+
+def summarize(samples: List[float]) -> Dict:
+    return {
+        "runs": [round(s, 6) for s in samples],
+        "min": round(min(samples), 6),
+        "median": round(statistics.median(samples), 6),
+        "mean": round(statistics.mean(samples), 6),
+        "max": round(max(samples), 6),
+    }
+
+
+def timed(fn: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None,
+          teardown: Optional[Callable[[], None]] = None) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+        if teardown:
+            teardown()
+    return summarize(samples)
+
+
+def repo_version() -> str:
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+class BenchmarkRunner:
+    def __init__(self, fixture: Fixture, manager: NodeManager, repeat: int):
+        self.fixture = fixture
+        self.manager = manager
+        self.repeat = repeat
+        self.scratch = os.path.join(fixture.root, "scratch")
+
+    def _git_paths(self) -> List[str]:
+        return [os.path.join(self.fixture.custom_nodes, n) for n in self.fixture.git_node_names]
+
+    def _clean_scratch(self) -> None:
+        shutil.rmtree(self.scratch, ignore_errors=True)
+        os.makedirs(self.scratch)
+
+    def bench_scan(self) -> Dict:
+        return timed(lambda: self.manager.scan_directory(self.fixture.custom_nodes), self.repeat)
+
+    def bench_check(self) -> Dict:
+        def run():
+            for path in self._git_paths():
+                self.manager.check_update(path)
+        return timed(run, self.repeat, setup=lambda: reset_git_nodes(self.fixture))
+
+    def bench_pull(self) -> Dict:
+        def run():
+            for path in self._git_paths():
+                self.manager.pull_node(path)
+        return timed(run, self.repeat, setup=lambda: reset_git_nodes(self.fixture),
+                     teardown=lambda: reset_git_nodes(self.fixture))
+
+    def bench_clone(self) -> Dict:
+        def run():
+            for name in self.fixture.git_node_names:
+                self.manager.clone_node(self.fixture.remote_url(name), os.path.join(self.scratch, name))
+        return timed(run, self.repeat, setup=self._clean_scratch)
+
+    def bench_copy(self) -> Dict:
+        def run():
+            for name in self.fixture.folder_node_names:
+                self.manager.copy_node(os.path.join(self.fixture.custom_nodes, name), os.path.join(self.scratch, name))
+        return timed(run, self.repeat, setup=self._clean_scratch)
+
+    def bench_backup(self) -> Dict:
+        backup_path = os.path.join(self.fixture.root, "backup.json")
+        nodes = self.manager.scan_directory(self.fixture.custom_nodes)
+        return timed(lambda: self.manager.create_backup(nodes, backup_path), self.repeat)
+
+    def bench_restore(self) -> Dict:
+        # Mirrors App.restore_logic: load the backup and clone every entry that is missing
+        backup_path = os.path.join(self.fixture.root, "restore_backup.json")
+        entries = [{"name": n, "url": self.fixture.remote_url(n), "is_git": True} for n in self.fixture.git_node_names]
+        with open(backup_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+
+        def run():
+            for info in self.manager.load_backup(backup_path):
+                target = os.path.join(self.scratch, info["name"])
+                if os.path.exists(target):
+                    continue
+                self.manager.clone_node(info["url"], target)
+                self.manager.set_node_install_time(info["name"])
+        return timed(run, self.repeat, setup=self._clean_scratch)
+
+    def run(self, names: List[str]) -> Dict[str, Dict]:
+        results = {}
+        for name in names:
+            print(f"Running {name}...", file=sys.stderr)
+            results[name] = getattr(self, f"bench_{name}")()
+            print(f"  median {results[name]['median']:.4f}s", file=sys.stderr)
+        return results
+
+
+def compare(current: Dict, baseline: Dict) -> None:
+    print(f"{'benchmark':<10} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, res in current["results"].items():
+        old = baseline.get("results", {}).get(name)
+        if not old:
+            continue
+        ratio = res["median"] / old["median"] if old["median"] else float("nan")
+        print(f"{name:<10} {old['median']:>11.4f}s {res['median']:>11.4f}s {ratio:>7.2f}x")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark NodeManager operations against synthetic fixtures.")
+    parser.add_argument("--git-nodes", type=int, default=FixtureSpec.git_nodes)
+    parser.add_argument("--folder-nodes", type=int, default=FixtureSpec.folder_nodes)
+    parser.add_argument("--history-depth", type=int, default=FixtureSpec.history_depth)
+    parser.add_argument("--files", type=int, default=FixtureSpec.files_per_node, help="files per Git node")
+    parser.add_argument("--commits-ahead", type=int, default=FixtureSpec.commits_ahead, help="upstream commits not yet pulled")
+    parser.add_argument("--folder-size-kb", type=int, default=FixtureSpec.folder_size_kb)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="+", choices=ALL_BENCHMARKS, default=ALL_BENCHMARKS)
+    parser.add_argument("--workdir", help="where to build fixtures (default: a temp dir, removed afterwards)")
+    parser.add_argument("--keep", action="store_true", help="keep the fixture directory")
+    parser.add_argument("--output", help="write JSON results to this file (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    spec = FixtureSpec(
+        git_nodes=args.git_nodes,
+        folder_nodes=args.folder_nodes,
+        history_depth=args.history_depth,
+        files_per_node=args.files,
+        commits_ahead=args.commits_ahead,
+        folder_size_kb=args.folder_size_kb,
+    )
+
+    root = args.workdir or tempfile.mkdtemp(prefix="comfynode_bench_")
+    os.makedirs(root, exist_ok=True)
+    # Never touch the user's nodes_meta.json
+    node_manager.META_FILE = os.path.join(root, "nodes_meta.json")
+    node_manager.COMMIT_CACHE_FILE = os.path.join(root, "commit_cache.json")
+    # Git commands issued by NodeManager inherit this environment
+    os.environ.update({k: v for k, v in git_env().items() if k.startswith("GIT_")})
+
+    try:
+        print(f"Building fixtures in {root}...", file=sys.stderr)
+        start = time.perf_counter()
+        fixture = build_fixture(root, spec)
+        print(f"  done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        runner = BenchmarkRunner(fixture, NodeManager(), args.repeat)
+        report = {
+            "version": repo_version(),
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "git": subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip(),
+            "spec": vars(spec),
+            "repeat": args.repeat,
+            "results": runner.run(args.only),
+        }
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import span
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Runs inside the target interpreter: cache tag and magic number decide which .pyc it accepts
+_TAG_SCRIPT = "import sys, importlib.util, json; print(json.dumps([sys.implementation.cache_tag, importlib.util.MAGIC_NUMBER.hex()]))"
+
+# Runs inside the target interpreter: compile the listed files on a process pool.
+# compile_file lives in an importable module, so this also works with spawn on Windows.
+_COMPILE_SCRIPT = r"""
+import sys, json, compileall, functools
+from concurrent.futures import ProcessPoolExecutor
+files = json.load(sys.stdin)
+workers = int(sys.argv[1]) or None
+compile_one = functools.partial(compileall.compile_file, quiet=2, force=True)
+if len(files) < 20:
+    ok = [compile_one(f) for f in files]
+else:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ok = list(pool.map(compile_one, files, chunksize=16))
+print(json.dumps([f for f, good in zip(files, ok) if not good]))
+"""
+
+
+@dataclass
+class CompileReport:
+    nodes: int = 0
+    files_checked: int = 0
+    compiled: int = 0
+    failed: List[str] = field(default_factory=list)
+    pruned: int = 0
+    seconds: float = 0.0
+
+    def describe(self) -> str:
+        return (f"{self.nodes} 个节点, 检查 {self.files_checked} 个源文件, 编译 {self.compiled} 个"
+                f" (失败 {len(self.failed)}), 清理 {self.pruned} 个过期缓存, 用时 {self.seconds:.1f}s")
+
+
+def _source_of(pyc_name: str) -> Optional[str]:
+    """
+    'mod.cpython-311.opt-1.pyc' -> 'mod.py'
+    """
+    if not pyc_name.endswith(".pyc"):
+        return None
+    parts = pyc_name[:-4].split(".")
+    if len(parts) < 2:
+        return None
+    if len(parts) >= 3 and parts[-1].startswith("opt-"):
+        parts = parts[:-1]
+    return ".".join(parts[:-1]) + ".py"
+
+
+def _pyc_fresh(pyc_path: str, st: os.stat_result, magic: bytes) -> bool:
+    try:
+        with open(pyc_path, "rb") as f:
+            header = f.read(16)
+    except OSError:
+        return False
+    if len(header) < 16 or header[:4] != magic:
+        return False
+    flags = int.from_bytes(header[4:8], "little")
+    if flags & 0b1:
+        # Hash-based pyc, the interpreter validates (or trusts) it by itself
+        return True
+    mtime = int.from_bytes(header[8:12], "little")
+    size = int.from_bytes(header[12:16], "little")
+    return mtime == (int(st.st_mtime) & 0xFFFFFFFF) and size == (st.st_size & 0xFFFFFFFF)
+
+
+class BytecodeCompiler:
+    """
+    Precompile node sources with the interpreter that will import them. Sources whose
+    .pyc is current are skipped without starting the interpreter, and .pyc files whose
+    source was deleted are removed so stale modules cannot be imported.
+    """
+
+    def __init__(self, max_workers: int = 0, timeout: float = 600):
+        # 0 lets the target interpreter use one worker per CPU
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._tags: Dict[str, Tuple[str, bytes]] = {}
+
+    def interpreter_tag(self, python_path: str) -> Tuple[str, bytes]:
+        with self._lock:
+            if python_path in self._tags:
+                return self._tags[python_path]
+        res = subprocess.run([python_path, "-c", _TAG_SCRIPT], capture_output=True, text=True, check=True,
+                             timeout=60, creationflags=_CREATE_NO_WINDOW)
+        tag, magic = json.loads(res.stdout)
+        with self._lock:
+            self._tags[python_path] = (tag, bytes.fromhex(magic))
+        return self._tags[python_path]
+
+    def scan(self, node_path: str, tag: str, magic: bytes, prune: bool = True) -> Tuple[List[str], int, int]:
+        """
+        Returns (stale sources, sources checked, orphaned .pyc files removed) for one node.
+        """
+        stale = []
+        checked = pruned = 0
+        stack = [node_path]
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            names = {e.name for e in entries}
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name == "__pycache__":
+                            if prune:
+                                pruned += self._prune(entry.path, names)
+                        elif not entry.name.startswith("."):
+                            stack.append(entry.path)
+                        continue
+                    if not entry.name.endswith(".py"):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                checked += 1
+                pyc = os.path.join(current, "__pycache__", f"{entry.name[:-3]}.{tag}.pyc")
+                if not _pyc_fresh(pyc, st, magic):
+                    stale.append(entry.path)
+        return stale, checked, pruned
+
+    def _prune(self, cache_dir: str, sources: set) -> int:
+        removed = 0
+        try:
+            with os.scandir(cache_dir) as it:
+                pycs = [e.name for e in it if e.is_file(follow_symlinks=False)]
+        except OSError:
+            return 0
+        for name in pycs:
+            source = _source_of(name)
+            if source and source not in sources:
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                    removed += 1
+                except OSError:
+                    pass
+        if removed == len(pycs):
+            try:
+                os.rmdir(cache_dir)
+            except OSError:
+                pass
+        return removed
+
+    def compile_nodes(self, node_paths: List[str], python_path: str, prune: bool = True,
+                      progress: Optional[Callable[[str], None]] = None) -> CompileReport:
+        start = time.perf_counter()
+        report = CompileReport(nodes=len(node_paths))
+        tag, magic = self.interpreter_tag(python_path)
+        stale: List[str] = []
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for files, checked, pruned in pool.map(lambda p: self.scan(p, tag, magic, prune), node_paths):
+                stale.extend(files)
+                report.files_checked += checked
+                report.pruned += pruned
+        if stale:
+            if progress:
+                progress(f"编译 {len(stale)} 个已变化的源文件...")
+            with span("compile", node=f"{len(stale)} files"):
+                res = subprocess.run([python_path, "-c", _COMPILE_SCRIPT, str(self.max_workers)],
+                                     input=json.dumps(stale), capture_output=True, text=True, encoding="utf-8",
+                                     timeout=self.timeout, creationflags=_CREATE_NO_WINDOW)
+            if res.returncode != 0:
+                raise Exception(res.stderr.strip() or f"exit code {res.returncode}")
+            report.failed = json.loads(res.stdout.strip().splitlines()[-1])
+            report.compiled = len(stale) - len(report.failed)
+        report.seconds = time.perf_counter() - start
+        return report
@@ -0,0 +1,169 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from link_engine import is_link
+
+
+@dataclass
+class DirUsage:
+    path: str
+    total: int = 0
+    git: int = 0
+    files: int = 0
+    # Set when the folder itself is a symlink/junction, e.g. a shared models subfolder
+    link_target: Optional[str] = None
+
+    @property
+    def working_tree(self) -> int:
+        return self.total - self.git
+
+
+class _DirEntry:
+    """
+    What one directory holds directly. Valid while the directory mtime is unchanged,
+    which moves whenever an entry is added, removed or renamed in it.
+    """
+    __slots__ = ("mtime_ns", "size", "files", "shared", "subdirs", "links")
+
+    def __init__(self, mtime_ns: int):
+        self.mtime_ns = mtime_ns
+        self.size = 0
+        self.files = 0
+        # (dev, ino, size) of files with more than one hardlink, counted once per measurement
+        self.shared: List[Tuple[int, int, int]] = []
+        self.subdirs: List[str] = []
+        self.links: List[str] = []
+
+
+class DiskUsageCache:
+    """
+    Directory sizes from os.scandir walks, with per-directory results cached by mtime.
+    A refresh only stats directories; files are re-read only in directories that changed.
+    Symlinked folders are followed, but every real directory and hardlinked file is
+    counted once per measurement.
+    """
+
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._dirs: Dict[str, _DirEntry] = {}
+
+    def _entry(self, path: str) -> Optional[_DirEntry]:
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._dirs.get(path)
+        if cached is not None and cached.mtime_ns == mtime_ns:
+            return cached
+
+        entry = _DirEntry(mtime_ns)
+        try:
+            with os.scandir(path) as it:
+                for item in it:
+                    try:
+                        if item.is_symlink():
+                            if item.is_dir():
+                                entry.links.append(os.path.realpath(item.path))
+                            continue
+                        if item.is_dir(follow_symlinks=False):
+                            entry.subdirs.append(item.name)
+                            continue
+                        st = item.stat(follow_symlinks=False)
+                        if os.name == "nt":
+                            # DirEntry.stat() reports st_nlink/st_dev/st_ino as 0 on Windows
+                            st = os.lstat(item.path)
+                    except OSError:
+                        continue
+                    entry.files += 1
+                    if st.st_nlink > 1:
+                        entry.shared.append((st.st_dev, st.st_ino, st.st_size))
+                    else:
+                        entry.size += st.st_size
+        except OSError:
+            return None
+        with self._lock:
+            self._dirs[path] = entry
+        return entry
+
+    def _walk(self, path: str, seen_dirs: Set[str], seen_inodes: Set[Tuple[int, int]],
+              exclude: Tuple[str, ...] = ()) -> Tuple[int, int]:
+        total = files = 0
+        stack = [(path, exclude)]
+        while stack:
+            current, skip = stack.pop()
+            real = os.path.realpath(current)
+            if real in seen_dirs:
+                continue
+            seen_dirs.add(real)
+            entry = self._entry(current)
+            if entry is None:
+                continue
+            total += entry.size
+            files += entry.files
+            for dev, ino, size in entry.shared:
+                if (dev, ino) not in seen_inodes:
+                    seen_inodes.add((dev, ino))
+                    total += size
+            stack.extend((os.path.join(current, name), ()) for name in entry.subdirs if name not in skip)
+            stack.extend((target, ()) for target in entry.links)
+        return total, files
+
+    def measure(self, path: str, split_git: bool = True, seen_dirs: Optional[Set[str]] = None,
+                seen_inodes: Optional[Set[Tuple[int, int]]] = None) -> DirUsage:
+        """
+        Size of a folder. With split_git, the .git directory is reported separately (and included in total).
+        Pass shared seen sets to avoid counting the same data twice across several folders.
+        """
+        seen_dirs = set() if seen_dirs is None else seen_dirs
+        seen_inodes = set() if seen_inodes is None else seen_inodes
+        usage = DirUsage(path)
+        if is_link(path):
+            usage.link_target = os.path.realpath(path)
+        if split_git:
+            git_dir = os.path.join(path, ".git")
+            if os.path.isdir(git_dir):
+                usage.git, git_files = self._walk(git_dir, seen_dirs, seen_inodes)
+                usage.files += git_files
+            working, files = self._walk(path, seen_dirs, seen_inodes, exclude=(".git",))
+        else:
+            working, files = self._walk(path, seen_dirs, seen_inodes)
+        usage.total = usage.git + working
+        usage.files += files
+        return usage
+
+    def measure_many(self, paths: List[str], split_git: bool = True,
+                     progress: Optional[Callable[[DirUsage], None]] = None) -> Dict[str, DirUsage]:
+        """
+        Measure independent folders in parallel, e.g. every custom node.
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for usage in pool.map(lambda p: self.measure(p, split_git), paths):
+                results[usage.path] = usage
+                if progress:
+                    progress(usage)
+        return results
+
+    def measure_children(self, root: str) -> Tuple[List[DirUsage], int]:
+        """
+        Per-subfolder usage of root (e.g. models/checkpoints, models/loras) plus the
+        deduplicated total: folders linked to the same target count once in the total.
+        """
+        try:
+            with os.scandir(root) as it:
+                children = sorted(e.path for e in it if e.is_dir())
+        except OSError:
+            return [], 0
+        usages = list(self.measure_many(children, split_git=False).values())
+        # Second pass hits the cache, it only re-stats directories
+        total = self.measure(root, split_git=False).total
+        return sorted(usages, key=lambda u: u.total, reverse=True), total
+
+    def clear(self) -> None:
+        with self._lock:
+            self._dirs.clear()
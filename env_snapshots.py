@@ -0,0 +1,208 @@
+import os
+import json
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+from metrics import span
+from git_refs import resolve_git_dir, read_head
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Snapshots taken automatically before bulk operations, oldest are pruned beyond this
+MAX_AUTO_SNAPSHOTS = 30
+
+# How a node differs between a snapshot and the current tree
+DIFF_SAME = "相同"
+DIFF_CHANGED = "版本不同"
+DIFF_REMOVED = "已删除"
+DIFF_ADDED = "新增"
+
+
+@dataclass
+class SnapshotEntry:
+    sha: str
+    # None when HEAD was detached
+    branch: Optional[str] = None
+    url: Optional[str] = None
+
+
+@dataclass
+class Snapshot:
+    id: str
+    name: str
+    root: str
+    created: float
+    auto: bool = False
+    nodes: Dict[str, SnapshotEntry] = field(default_factory=dict)
+
+    @property
+    def formatted_date(self) -> str:
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.created))
+
+
+@dataclass
+class SnapshotDiff:
+    name: str
+    kind: str
+    old_sha: Optional[str] = None
+    new_sha: Optional[str] = None
+
+
+@dataclass
+class RollbackResult:
+    name: str
+    ok: bool
+    message: str = ""
+
+
+def capture_heads(root: str, names: Optional[List[str]] = None) -> Dict[str, SnapshotEntry]:
+    """
+    HEAD of every Git node under root, read from the ref files without running git.
+    """
+    if names is None:
+        try:
+            names = [e.name for e in os.scandir(root) if e.is_dir()]
+        except OSError:
+            return {}
+    heads = {}
+    for name in names:
+        git_dir = resolve_git_dir(os.path.join(root, name))
+        if not git_dir:
+            continue
+        branch, sha = read_head(git_dir)
+        if sha:
+            heads[name] = SnapshotEntry(sha=sha, branch=branch)
+    return heads
+
+
+class SnapshotStore:
+    """
+    Named records of which commit every Git node of a custom_nodes folder was on, one JSON
+    file each. Rolling back only moves each repo to a commit it already has, so it works
+    offline and takes as long as a checkout.
+    """
+
+    def __init__(self, directory: str, max_workers: int = 8):
+        self.directory = directory
+        self.max_workers = max_workers
+
+    def _path(self, snapshot_id: str) -> str:
+        return os.path.join(self.directory, f"{snapshot_id}.json")
+
+    def save(self, snapshot: Snapshot) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(snapshot.id) + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(snapshot), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._path(snapshot.id))
+
+    def load(self, snapshot_id: str) -> Snapshot:
+        with open(self._path(snapshot_id), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        data["nodes"] = {name: SnapshotEntry(**entry) for name, entry in data.get("nodes", {}).items()}
+        return Snapshot(**data)
+
+    def snapshots(self, root: Optional[str] = None) -> List[Snapshot]:
+        """
+        All snapshots, newest first; with root only those of that custom_nodes folder.
+        """
+        snapshots = []
+        try:
+            files = [f for f in os.listdir(self.directory) if f.endswith(".json")]
+        except OSError:
+            return []
+        for file in files:
+            try:
+                snapshot = self.load(file[:-5])
+            except Exception as e:
+                print(f"Error loading snapshot {file}: {e}")
+                continue
+            if root is None or os.path.normcase(os.path.normpath(snapshot.root)) == os.path.normcase(os.path.normpath(root)):
+                snapshots.append(snapshot)
+        snapshots.sort(key=lambda s: s.created, reverse=True)
+        return snapshots
+
+    def delete(self, snapshot_id: str) -> None:
+        try:
+            os.remove(self._path(snapshot_id))
+        except FileNotFoundError:
+            pass
+
+    def create(self, root: str, name: str, auto: bool = False, urls: Optional[Dict[str, str]] = None) -> Snapshot:
+        created = time.time()
+        snapshot_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(created)) + f"-{int(created * 1000) % 1000:03d}"
+        snapshot = Snapshot(id=snapshot_id, name=name, root=os.path.abspath(root), created=created, auto=auto,
+                            nodes=capture_heads(root))
+        for node_name, entry in snapshot.nodes.items():
+            entry.url = (urls or {}).get(node_name)
+        self.save(snapshot)
+        if auto:
+            self._prune_auto(root)
+        return snapshot
+
+    def _prune_auto(self, root: str) -> None:
+        auto = [s for s in self.snapshots(root) if s.auto]
+        for snapshot in auto[MAX_AUTO_SNAPSHOTS:]:
+            self.delete(snapshot.id)
+
+    def diff(self, snapshot: Snapshot) -> List[SnapshotDiff]:
+        """
+        Snapshot against the current HEADs of its folder.
+        """
+        current = capture_heads(snapshot.root)
+        diffs = []
+        for name in sorted(set(snapshot.nodes) | set(current), key=str.lower):
+            old, new = snapshot.nodes.get(name), current.get(name)
+            if old and not new:
+                diffs.append(SnapshotDiff(name, DIFF_REMOVED, old.sha, None))
+            elif new and not old:
+                diffs.append(SnapshotDiff(name, DIFF_ADDED, None, new.sha))
+            elif old.sha != new.sha or old.branch != new.branch:
+                diffs.append(SnapshotDiff(name, DIFF_CHANGED, old.sha, new.sha))
+            else:
+                diffs.append(SnapshotDiff(name, DIFF_SAME, old.sha, new.sha))
+        return diffs
+
+    def _git(self, node_path: str, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", *args], cwd=node_path, capture_output=True, text=True,
+                              creationflags=_CREATE_NO_WINDOW)
+
+    def _rollback_node(self, node_path: str, entry: SnapshotEntry) -> RollbackResult:
+        name = os.path.basename(os.path.normpath(node_path))
+        with span("rollback", node=name):
+            if self._git(node_path, "cat-file", "-e", f"{entry.sha}^{{commit}}").returncode != 0:
+                return RollbackResult(name, False, f"本地没有提交 {entry.sha[:7]}，需要联网获取")
+            # Plain checkouts carry local modifications over and refuse when they would be overwritten
+            if entry.branch:
+                res = self._git(node_path, "checkout", "-q", "-B", entry.branch, entry.sha)
+            else:
+                res = self._git(node_path, "checkout", "-q", "--detach", entry.sha)
+            if res.returncode != 0:
+                return RollbackResult(name, False, res.stderr.strip() or f"exit code {res.returncode}")
+        return RollbackResult(name, True, f"{entry.branch or '分离 HEAD'} @ {entry.sha[:7]}")
+
+    def rollback(self, snapshot: Snapshot,
+                 progress: Optional[Callable[[RollbackResult], None]] = None) -> List[RollbackResult]:
+        """
+        Move every node that differs from the snapshot back to its recorded commit, in
+        parallel. Nodes added since are left alone, deleted ones are reported.
+        """
+        jobs = []
+        results = []
+        for diff in self.diff(snapshot):
+            if diff.kind == DIFF_CHANGED:
+                jobs.append((os.path.join(snapshot.root, diff.name), snapshot.nodes[diff.name]))
+            elif diff.kind == DIFF_REMOVED:
+                result = RollbackResult(diff.name, False, "节点已不存在，需要重新安装")
+                results.append(result)
+                if progress:
+                    progress(result)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for result in pool.map(lambda job: self._rollback_node(*job), jobs):
+                results.append(result)
+                if progress:
+                    progress(result)
+        return results
@@ -0,0 +1,265 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from node_manager import NodeManager, Node, resolve_custom_nodes_path, resolve_python_path
+from node_table import NodeTable
+
+
+@dataclass
+class FleetInstance:
+    name: str
+    root: str
+    custom_nodes_path: str
+    python_path: Optional[str] = None
+
+
+class FleetEntry:
+    """
+    One node as seen in one ComfyUI instance: a view on a row of the fleet's NodeTable,
+    so status and SHA changes land in the shared columns.
+    """
+    __slots__ = ("table", "row")
+
+    def __init__(self, table: NodeTable, row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def instance(self) -> str:
+        return self.table.instance(self.row)
+
+    @property
+    def node(self) -> Node:
+        return self.table.node(self.row)
+
+    @property
+    def head_sha(self) -> Optional[str]:
+        return self.table.head_sha(self.row)
+
+    @head_sha.setter
+    def head_sha(self, sha: Optional[str]) -> None:
+        self.table.set_head_sha(self.row, sha)
+
+    @property
+    def status(self) -> str:
+        return self.table.status(self.row)
+
+    @status.setter
+    def status(self, status: str) -> None:
+        self.table.set_status(self.row, status)
+
+
+@dataclass
+class FleetActionResult:
+    instance: str
+    node_name: str
+    ok: bool
+    message: str = ""
+
+
+class FleetIndex:
+    """
+    Registry of several ComfyUI roots plus a shared index of their custom nodes.
+    Scanned nodes live in one NodeTable with an instance column; its name index makes
+    the node x instance matrix a lookup once the instances have been scanned.
+    """
+
+    def __init__(self, manager: NodeManager, max_workers: int = 6):
+        self.manager = manager
+        self.max_workers = max_workers
+        self.instances: Dict[str, FleetInstance] = {}
+        self.table = NodeTable()
+
+    # --- Registration ---
+    def add_instance(self, root: str, name: Optional[str] = None) -> FleetInstance:
+        root = os.path.normpath(root)
+        if not os.path.isdir(root):
+            raise FileNotFoundError(f"The path {root} does not exist.")
+
+        for inst in self.instances.values():
+            if os.path.normcase(inst.root) == os.path.normcase(root):
+                return inst
+
+        if not name:
+            name = os.path.basename(root) or root
+        # Keep instance names unique, they are used as matrix column keys
+        base, i = name, 2
+        while name in self.instances:
+            name = f"{base} ({i})"
+            i += 1
+
+        inst = FleetInstance(
+            name=name,
+            root=root,
+            custom_nodes_path=resolve_custom_nodes_path(root),
+            python_path=resolve_python_path(root),
+        )
+        self.instances[name] = inst
+        return inst
+
+    def remove_instance(self, name: str) -> None:
+        self.instances.pop(name, None)
+        for row in self.table.instance_rows(name):
+            self.table.remove(row)
+
+    def roots(self) -> List[str]:
+        return [inst.root for inst in self.instances.values()]
+
+    # --- Scanning ---
+    def _scan_instance(self, inst: FleetInstance) -> List[Tuple[Node, Optional[str]]]:
+        scanned = []
+        for node in self.manager.scan_directory(inst.custom_nodes_path):
+            head_sha = None
+            if os.path.exists(os.path.join(node.path, '.git')):
+                head_sha = self.manager.get_head_sha(node.path)
+            scanned.append((node, head_sha))
+        return scanned
+
+    def scan_all(self, progress: Optional[Callable[[str, int, Optional[Exception]], None]] = None) -> int:
+        """
+        Scan every registered instance concurrently and rebuild the shared index.
+        progress(instance_name, node_count, error) is called as each instance finishes.
+        Returns the total number of entries indexed.
+        """
+        table = NodeTable()
+        old = self.table
+        total = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._scan_instance, inst): inst for inst in self.instances.values()}
+            for future in as_completed(futures):
+                inst = futures[future]
+                try:
+                    scanned = future.result()
+                except Exception as e:
+                    if progress:
+                        progress(inst.name, 0, e)
+                    continue
+                for node, head_sha in scanned:
+                    previous = old.find(node.name, inst.name)
+                    # Keep the last known update status while the SHA is unchanged
+                    status = "未知"
+                    if previous is not None and old.head_sha(previous) == head_sha:
+                        status = old.status(previous)
+                    table.add(node, inst.name, head_sha, status)
+                total += len(scanned)
+                if progress:
+                    progress(inst.name, len(scanned), None)
+        self.table = table
+        return total
+
+    def check_updates(self, proxy: Optional[str] = None,
+                      progress: Optional[Callable[[FleetEntry], None]] = None) -> None:
+        """
+        Run check_update for every Git entry of every instance in parallel.
+        """
+        targets = self.all_entries()
+
+        def _check(entry: FleetEntry) -> FleetEntry:
+            if not entry.head_sha:
+                entry.status = "不适用"
+                return entry
+            has_update = self.manager.check_update(entry.node.path, proxy=proxy)
+            entry.status = "有更新" if has_update else "已是最新"
+            return entry
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for future in as_completed([pool.submit(_check, e) for e in targets]):
+                entry = future.result()
+                if progress:
+                    progress(entry)
+
+    # --- Queries ---
+    def node_names(self) -> List[str]:
+        return sorted(self.table.names(), key=str.lower)
+
+    def entries_for(self, node_name: str) -> Dict[str, FleetEntry]:
+        """
+        {instance_name: entry} of every instance that has the node.
+        """
+        table = self.table
+        return {table.instance(row): FleetEntry(table, row) for row in table.rows_by_name(node_name)}
+
+    def all_entries(self) -> List[FleetEntry]:
+        table = self.table
+        return [FleetEntry(table, row) for row in table]
+
+    def matrix(self) -> List[Tuple[str, Dict[str, Optional[FleetEntry]]]]:
+        """
+        Return rows of (node_name, {instance_name: entry or None}) for every indexed node.
+        """
+        rows = []
+        for name in self.node_names():
+            per_instance = self.entries_for(name)
+            rows.append((name, {inst: per_instance.get(inst) for inst in self.instances}))
+        return rows
+
+    def get(self, node_name: str, instance: str) -> Optional[FleetEntry]:
+        table = self.table
+        row = table.find(node_name, instance)
+        return None if row is None else FleetEntry(table, row)
+
+    # --- Bulk actions ---
+    def run_bulk(self, action: Callable[[FleetInstance, FleetEntry], str],
+                 targets: List[Tuple[str, str]],
+                 progress: Optional[Callable[[FleetActionResult], None]] = None) -> List[FleetActionResult]:
+        """
+        Run action(instance, entry) for each (instance_name, node_name) pair in parallel.
+        Pairs whose node is not present in that instance are skipped.
+        """
+        jobs = []
+        for inst_name, node_name in targets:
+            inst = self.instances.get(inst_name)
+            entry = self.get(node_name, inst_name)
+            if inst and entry:
+                jobs.append((inst, entry))
+
+        def _run(inst: FleetInstance, entry: FleetEntry) -> FleetActionResult:
+            try:
+                msg = action(inst, entry)
+                return FleetActionResult(inst.name, entry.node.name, True, msg or "")
+            except Exception as e:
+                return FleetActionResult(inst.name, entry.node.name, False, str(e))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(_run, inst, entry) for inst, entry in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if progress:
+                    progress(result)
+        return results
+
+    def pull(self, targets: List[Tuple[str, str]], proxy: Optional[str] = None,
+             progress: Optional[Callable[[FleetActionResult], None]] = None) -> List[FleetActionResult]:
+        """
+        Pull the given (instance_name, node_name) pairs across instances in parallel.
+        """
+        def _pull(inst: FleetInstance, entry: FleetEntry) -> str:
+            if not entry.head_sha:
+                raise Exception("Not a git repository.")
+            summary = self.manager.pull_node(entry.node.path, proxy=proxy)
+            self.manager.update_node_timestamp(entry.node.path)
+            entry.head_sha = self.manager.get_head_sha(entry.node.path)
+            entry.status = "已更新"
+            return summary
+
+        return self.run_bulk(_pull, targets, progress)
+
+    def install_requirements(self, targets: List[Tuple[str, str]], proxy: Optional[str] = None,
+                             progress: Optional[Callable[[FleetActionResult], None]] = None) -> List[FleetActionResult]:
+        """
+        Install requirements for the given pairs with each instance's own python.
+        """
+        def _install(inst: FleetInstance, entry: FleetEntry) -> str:
+            if not inst.python_path:
+                raise Exception(f"No python interpreter found for {inst.name}.")
+            if not os.path.exists(os.path.join(entry.node.path, "requirements.txt")):
+                return "无 requirements.txt"
+            if not self.manager.install_requirements(entry.node.path, inst.python_path, proxy=proxy):
+                return "依赖已满足"
+            return ""
+
+        return self.run_bulk(_install, targets, progress)
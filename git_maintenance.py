@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from metrics import span
+from git_refs import resolve_git_dir, common_dir
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Leftovers of a running or crashed git process; maintaining the repo now would race it
+_LOCK_FILES = ("index.lock", "HEAD.lock", "packed-refs.lock", "gc.pid")
+
+
+@dataclass
+class PackStats:
+    """
+    Object store layout from 'git count-objects -v', sizes in bytes.
+    """
+    loose_objects: int = 0
+    loose_size: int = 0
+    packs: int = 0
+    pack_size: int = 0
+    garbage_size: int = 0
+
+    @property
+    def total_size(self) -> int:
+        return self.loose_size + self.pack_size + self.garbage_size
+
+
+@dataclass
+class MaintenanceResult:
+    path: str
+    ok: bool
+    before: Optional[PackStats] = None
+    after: Optional[PackStats] = None
+    steps: List[str] = field(default_factory=list)
+    message: str = ""
+    seconds: float = 0.0
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(os.path.normpath(self.path))
+
+    @property
+    def reclaimed(self) -> int:
+        if not self.before or not self.after:
+            return 0
+        return self.before.total_size - self.after.total_size
+
+    def describe(self) -> str:
+        if not self.ok:
+            return self.message
+        if not self.steps:
+            return "无需维护"
+        return (f"{'/'.join(self.steps)}: 包 {self.before.packs} -> {self.after.packs}, "
+                f"松散对象 {self.before.loose_objects} -> {self.after.loose_objects}, "
+                f"回收 {self.reclaimed / 1024 ** 2:.1f} MB, 用时 {self.seconds:.1f}s")
+
+
+def parse_count_objects(output: str) -> PackStats:
+    values = {}
+    for line in output.splitlines():
+        key, _, value = line.partition(":")
+        try:
+            values[key.strip()] = int(value.strip())
+        except ValueError:
+            pass
+    # count-objects reports sizes in KiB
+    return PackStats(
+        loose_objects=values.get("count", 0),
+        loose_size=values.get("size", 0) * 1024,
+        packs=values.get("packs", 0),
+        pack_size=values.get("size-pack", 0) * 1024,
+        garbage_size=values.get("size-garbage", 0) * 1024,
+    )
+
+
+class GitMaintainer:
+    """
+    Keep the object stores of node repos compact: pack loose objects incrementally,
+    consolidate with gc once too many packs pile up, and keep a commit-graph so
+    ahead/behind counts and log walks stay fast. Repos are maintained in parallel and the
+    time of the last run is remembered for the idle-time schedule.
+    """
+
+    def __init__(self, state_file: Optional[str] = None, max_workers: int = 4,
+                 loose_limit: int = 100, pack_limit: int = 10):
+        self.state_file = state_file
+        self.max_workers = max_workers
+        # Below both limits a repo is left alone unless forced
+        self.loose_limit = loose_limit
+        self.pack_limit = pack_limit
+        self._lock = threading.Lock()
+        self._last_run: Dict[str, float] = {}
+        if state_file and os.path.exists(state_file):
+            try:
+                with open(state_file, "r", encoding="utf-8") as f:
+                    self._last_run = json.load(f)
+            except Exception as e:
+                print(f"Error loading maintenance state: {e}")
+
+    def save(self) -> None:
+        if not self.state_file:
+            return
+        with self._lock:
+            data = dict(self._last_run)
+        try:
+            with open(self.state_file, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except Exception as e:
+            print(f"Error saving maintenance state: {e}")
+
+    def last_run(self, node_path: str) -> Optional[float]:
+        with self._lock:
+            return self._last_run.get(os.path.abspath(node_path))
+
+    def due(self, node_paths: List[str], interval: float) -> List[str]:
+        """
+        Repos not maintained within the last interval seconds.
+        """
+        now = time.time()
+        return [p for p in node_paths if now - (self.last_run(p) or 0) >= interval]
+
+    def _git(self, git_dir: str, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", f"--git-dir={git_dir}", *args], capture_output=True, text=True,
+                              creationflags=_CREATE_NO_WINDOW)
+
+    def stats(self, git_dir: str) -> PackStats:
+        res = self._git(git_dir, "count-objects", "-v")
+        if res.returncode != 0:
+            raise Exception(res.stderr.strip() or f"count-objects exit code {res.returncode}")
+        return parse_count_objects(res.stdout)
+
+    def maintain(self, node_path: str, force: bool = False) -> MaintenanceResult:
+        start = time.perf_counter()
+        result = MaintenanceResult(path=node_path, ok=False)
+        git_dir = resolve_git_dir(node_path)
+        if not git_dir:
+            result.message = "不是 Git 仓库"
+            return result
+        # Objects and locks of worktrees live in the common dir
+        store = common_dir(git_dir)
+        busy = [name for name in _LOCK_FILES if os.path.exists(os.path.join(store, name))
+                or os.path.exists(os.path.join(git_dir, name))]
+        if busy:
+            result.message = f"有其他 Git 操作正在进行 ({', '.join(busy)})，已跳过"
+            return result
+        try:
+            with span("maintain", node=result.name):
+                result.before = self.stats(store)
+                before = result.before
+                gc = force or before.packs > self.pack_limit or before.garbage_size > 0
+                repack = not gc and before.loose_objects > self.loose_limit
+                if gc:
+                    # Consolidates every pack into one and prunes unreachable objects;
+                    # writes the commit-graph too (gc.writeCommitGraph defaults to true)
+                    self._run(store, result, "gc", "gc", "--quiet")
+                elif repack:
+                    # Incremental: only the loose objects go into a new pack, existing packs stay
+                    self._run(store, result, "repack", "repack", "-d", "-q")
+                if not gc and (repack or not os.path.exists(os.path.join(store, "objects", "info", "commit-graph"))):
+                    self._run(store, result, "commit-graph", "commit-graph", "write", "--reachable")
+                result.after = self.stats(store)
+            result.ok = True
+        except Exception as e:
+            result.message = str(e).strip().splitlines()[-1] if str(e).strip() else repr(e)
+        result.seconds = time.perf_counter() - start
+        if result.ok:
+            with self._lock:
+                self._last_run[os.path.abspath(node_path)] = time.time()
+        return result
+
+    def _run(self, git_dir: str, result: MaintenanceResult, step: str, *args: str) -> None:
+        res = self._git(git_dir, *args)
+        if res.returncode != 0:
+            raise Exception(f"{step}: {res.stderr.strip() or f'exit code {res.returncode}'}")
+        result.steps.append(step)
+
+    def maintain_many(self, node_paths: List[str], force: bool = False, max_workers: Optional[int] = None,
+                      progress: Optional[Callable[[MaintenanceResult], None]] = None) -> List[MaintenanceResult]:
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as pool:
+            for result in pool.map(lambda p: self.maintain(p, force), node_paths):
+                results.append(result)
+                if progress:
+                    progress(result)
+        self.save()
+        return results
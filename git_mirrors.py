@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Endpoints without any sample yet are ranked as if they answered in this many seconds
+UNKNOWN_LATENCY = 2.0
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    Where git traffic for URLs starting with origin_prefix goes. prefix == origin_prefix is the upstream itself.
+    """
+    origin_prefix: str
+    prefix: str
+
+    @property
+    def is_mirror(self) -> bool:
+        return self.prefix != self.origin_prefix
+
+    def rewrite(self, url: str) -> str:
+        return self.prefix + url[len(self.origin_prefix):]
+
+    def git_env(self) -> Dict[str, str]:
+        """
+        Config passed through the environment so clone/fetch/pull use the mirror while
+        the stored remote URL keeps pointing upstream (url.<mirror>.insteadOf=<origin>).
+        """
+        if not self.is_mirror:
+            return {}
+        return {
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": f"url.{self.prefix}.insteadOf",
+            "GIT_CONFIG_VALUE_0": self.origin_prefix,
+        }
+
+
+@dataclass
+class EndpointStats:
+    latency: Optional[float] = None
+    ok: int = 0
+    fail: int = 0
+    last_probe: float = 0.0
+
+    @property
+    def success_rate(self) -> float:
+        # Laplace smoothing keeps one early failure from burying an endpoint forever
+        return (self.ok + 1) / (self.ok + self.fail + 2)
+
+    @property
+    def score(self) -> float:
+        latency = self.latency if self.latency is not None else UNKNOWN_LATENCY
+        return latency / self.success_rate
+
+
+class MirrorSelector:
+    """
+    URL rewrite rules (origin prefix -> mirror prefixes) plus latency and success-rate
+    statistics per endpoint. Stale endpoints are probed with 'git ls-remote' in parallel
+    before ranking; results of real operations feed the success rate.
+    """
+
+    def __init__(self, rules: Optional[Dict[str, List[str]]] = None, stats_file: Optional[str] = None,
+                 probe_interval: float = 600, timeout: float = 10):
+        self.rules = {k: list(v) for k, v in (rules or {}).items() if k}
+        self.stats_file = stats_file
+        self.probe_interval = probe_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._stats: Dict[str, EndpointStats] = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return
+        try:
+            with open(self.stats_file, "r", encoding="utf-8") as f:
+                self._stats = {k: EndpointStats(**v) for k, v in json.load(f).items()}
+        except Exception as e:
+            print(f"Error loading mirror stats: {e}")
+
+    def save(self) -> None:
+        if not self.stats_file:
+            return
+        with self._lock:
+            data = {k: asdict(v) for k, v in self._stats.items()}
+        try:
+            with open(self.stats_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=4)
+        except Exception as e:
+            print(f"Error saving mirror stats: {e}")
+
+    def stats(self, endpoint: Endpoint) -> EndpointStats:
+        with self._lock:
+            return self._stats.setdefault(endpoint.prefix, EndpointStats())
+
+    def candidates(self, url: str) -> List[Endpoint]:
+        """
+        Upstream plus every mirror of the longest matching rule.
+        """
+        matches = [p for p in self.rules if url.startswith(p)]
+        if not matches:
+            return []
+        origin = max(matches, key=len)
+        return [Endpoint(origin, origin)] + [Endpoint(origin, m) for m in self.rules[origin] if m]
+
+    def probe(self, endpoint: Endpoint, url: str, env: Optional[dict] = None) -> bool:
+        start = time.perf_counter()
+        try:
+            res = subprocess.run(["git", "ls-remote", "--quiet", endpoint.rewrite(url), "HEAD"],
+                                 env=env, capture_output=True, text=True, timeout=self.timeout,
+                                 creationflags=_CREATE_NO_WINDOW)
+            ok = res.returncode == 0
+        except (subprocess.TimeoutExpired, OSError):
+            ok = False
+        elapsed = time.perf_counter() - start
+        stats = self.stats(endpoint)
+        with self._lock:
+            stats.last_probe = time.time()
+            if ok:
+                stats.ok += 1
+                # Smooth out single slow answers
+                stats.latency = elapsed if stats.latency is None else 0.7 * stats.latency + 0.3 * elapsed
+            else:
+                stats.fail += 1
+        return ok
+
+    def rank(self, url: str, env: Optional[dict] = None, force_probe: bool = False) -> List[Endpoint]:
+        """
+        Endpoints for url, best first. Without a matching rule this is just the upstream.
+        """
+        endpoints = self.candidates(url)
+        if not endpoints:
+            return []
+        now = time.time()
+        stale = [ep for ep in endpoints if force_probe or now - self.stats(ep).last_probe > self.probe_interval]
+        if stale:
+            env = dict(env or os.environ, GIT_TERMINAL_PROMPT="0")
+            with ThreadPoolExecutor(max_workers=len(stale)) as pool:
+                list(pool.map(lambda ep: self.probe(ep, url, env), stale))
+            self.save()
+        return sorted(endpoints, key=lambda ep: self.stats(ep).score)
+
+    def record(self, endpoint: Endpoint, ok: bool) -> None:
+        stats = self.stats(endpoint)
+        with self._lock:
+            if ok:
+                stats.ok += 1
+            else:
+                stats.fail += 1
+
+
+def parse_rules(text: str) -> Dict[str, List[str]]:
+    """
+    One rule per line: '<origin prefix> = <mirror prefix>, <mirror prefix>'. Lines starting with # are ignored.
+    """
+    rules = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        origin, _, mirrors = line.partition("=")
+        origin = origin.strip()
+        if origin:
+            rules[origin] = [m.strip() for m in mirrors.split(",") if m.strip()]
+    return rules
+
+
+def format_rules(rules: Dict[str, List[str]]) -> str:
+    return "\n".join(f"{origin} = {', '.join(mirrors)}" for origin, mirrors in rules.items())
@@ -0,0 +1,355 @@
+import os
+import re
+import json
+import datetime
+import threading
+import subprocess
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+# Windows: keep the git helper processes from flashing console windows
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+_SECTION_RE = re.compile(r'^\s*\[\s*([A-Za-z0-9.-]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+
+
+def resolve_git_dir(node_path: str) -> Optional[str]:
+    """
+    Return the git directory of a working tree, following 'gitdir:' files used by worktrees and submodules.
+    """
+    dot_git = os.path.join(node_path, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        try:
+            with open(dot_git, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+        except OSError:
+            return None
+        if content.startswith("gitdir:"):
+            git_dir = content[len("gitdir:"):].strip()
+            return os.path.normpath(os.path.join(node_path, git_dir))
+    return None
+
+
+def common_dir(git_dir: str) -> str:
+    """
+    Linked worktrees keep HEAD locally but share refs, packed-refs and config with the main repo.
+    """
+    try:
+        with open(os.path.join(git_dir, 'commondir'), 'r', encoding='utf-8') as f:
+            return os.path.normpath(os.path.join(git_dir, f.read().strip()))
+    except OSError:
+        return git_dir
+
+
+def _read_packed_ref(common: str, refname: str) -> Optional[str]:
+    try:
+        with open(os.path.join(common, 'packed-refs'), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(('#', '^')):
+                    continue
+                sha, _, name = line.rstrip('\n').partition(' ')
+                if name == refname:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+
+def read_ref(git_dir: str, refname: str, depth: int = 0) -> Optional[str]:
+    """
+    Resolve a ref (e.g. 'HEAD' or 'refs/remotes/origin/main') to a SHA by reading files directly.
+    """
+    if depth > 5:
+        return None
+    common = common_dir(git_dir)
+    # HEAD and other pseudo refs are per worktree, everything under refs/ is shared
+    base = common if refname.startswith('refs/') else git_dir
+    try:
+        with open(os.path.join(base, *refname.split('/')), 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+    except OSError:
+        return _read_packed_ref(common, refname)
+    if content.startswith('ref:'):
+        return read_ref(git_dir, content[4:].strip(), depth + 1)
+    return content or None
+
+
+def read_head(git_dir: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Return (branch_name, sha) for HEAD. branch_name is None when HEAD is detached.
+    sha is None on an unborn branch.
+    """
+    try:
+        with open(os.path.join(git_dir, 'HEAD'), 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+    except OSError:
+        return None, None
+    if content.startswith('ref:'):
+        refname = content[4:].strip()
+        branch = refname[len('refs/heads/'):] if refname.startswith('refs/heads/') else refname
+        return branch, read_ref(git_dir, refname)
+    return None, content or None
+
+
+def read_config(git_dir: str) -> Dict[str, Dict[str, str]]:
+    """
+    Minimal parser for the repository config: {'branch "main"': {'remote': 'origin', ...}, ...}.
+    Section names are lowercased, subsection names kept as-is, the last value of a key wins.
+    """
+    sections: Dict[str, Dict[str, str]] = {}
+    current = None
+    try:
+        with open(os.path.join(common_dir(git_dir), 'config'), 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+    except OSError:
+        return sections
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped[0] in '#;':
+            continue
+        m = _SECTION_RE.match(stripped)
+        if m:
+            name = m.group(1).lower()
+            if m.group(2) is not None:
+                name = f'{name} "{m.group(2)}"'
+            current = sections.setdefault(name, {})
+            continue
+        if current is None:
+            continue
+        key, sep, value = stripped.partition('=')
+        value = value.strip() if sep else "true"
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        current[key.strip().lower()] = value
+    return sections
+
+
+def read_upstream(git_dir: str, branch: Optional[str], config: Optional[Dict] = None) -> Optional[str]:
+    """
+    Return the remote-tracking ref of a branch (e.g. 'refs/remotes/origin/main'), or None without upstream.
+    """
+    if not branch:
+        return None
+    if config is None:
+        config = read_config(git_dir)
+    section = config.get(f'branch "{branch}"', {})
+    remote, merge = section.get('remote'), section.get('merge')
+    if not remote or not merge:
+        return None
+    if remote == '.':
+        return merge
+    if merge.startswith('refs/heads/'):
+        return f'refs/remotes/{remote}/{merge[len("refs/heads/"):]}'
+    return None
+
+
+@dataclass
+class CommitInfo:
+    head_sha: str
+    upstream_sha: Optional[str]
+    author: str
+    committed_date: int
+    summary: str
+    ahead: Optional[int] = None
+    behind: Optional[int] = None
+
+    @property
+    def formatted_date(self) -> str:
+        return datetime.datetime.fromtimestamp(self.committed_date).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_commit(data: bytes) -> Tuple[str, int, str]:
+    """
+    Extract (author name, committer timestamp, summary line) from a raw commit object.
+    """
+    header, _, message = data.partition(b'\n\n')
+    author, committed = "", 0
+    for line in header.split(b'\n'):
+        if line.startswith(b'author '):
+            author = line[7:].split(b' <', 1)[0].decode('utf-8', 'replace')
+        elif line.startswith(b'committer '):
+            parts = line.rsplit(b' ', 2)
+            try:
+                committed = int(parts[-2])
+            except (ValueError, IndexError):
+                pass
+    summary = message.decode('utf-8', 'replace').strip().split('\n', 1)[0]
+    return author, committed, summary
+
+
+class _BatchClosed(Exception):
+    """
+    The batch process was retired (evicted or closed) before this read got its turn.
+    """
+
+
+class _CatFileBatch:
+    """
+    A long-lived 'git cat-file --batch' process, one object read per request.
+    """
+
+    def __init__(self, git_dir: str):
+        self.lock = threading.Lock()
+        self.closed = False
+        self.proc = subprocess.Popen(
+            ['git', f'--git-dir={git_dir}', 'cat-file', '--batch'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+            creationflags=_CREATE_NO_WINDOW,
+        )
+
+    def read(self, sha: str) -> Optional[bytes]:
+        with self.lock:
+            if self.closed:
+                raise _BatchClosed()
+            self.proc.stdin.write(sha.encode() + b'\n')
+            self.proc.stdin.flush()
+            header = self.proc.stdout.readline().split()
+            if len(header) != 3:
+                # '<sha> missing'
+                return None
+            data = self.proc.stdout.read(int(header[2]) + 1)
+            return data[:-1]
+
+    def close(self) -> None:
+        # Waits for a read in progress, so it never sees its pipe closed underneath it
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.proc.stdin.close()
+                self.proc.wait(timeout=2)
+            except Exception:
+                self.proc.kill()
+
+
+class CommitInfoCache:
+    """
+    Per-repo commit summary, author, date and ahead/behind counts keyed by the HEAD and
+    remote-tracking SHAs. Lookups only read ref files; misses are filled through a
+    long-lived cat-file batch process per repo plus one rev-list count when the refs differ.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, max_processes: int = 16):
+        self.cache_file = cache_file
+        self.max_processes = max_processes
+        self._lock = threading.Lock()
+        self._entries: Dict[str, CommitInfo] = {}
+        self._batches: "OrderedDict[str, _CatFileBatch]" = OrderedDict()
+        self._dirty = False
+        self.load()
+
+    def load(self) -> None:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = {path: CommitInfo(**info) for path, info in data.items()}
+        except Exception as e:
+            print(f"Error loading commit cache: {e}")
+
+    def save(self) -> None:
+        if not self.cache_file or not self._dirty:
+            return
+        with self._lock:
+            data = {path: asdict(info) for path, info in self._entries.items()}
+            self._dirty = False
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except Exception as e:
+            print(f"Error saving commit cache: {e}")
+
+    def _batch(self, git_dir: str) -> _CatFileBatch:
+        evicted = []
+        with self._lock:
+            batch = self._batches.get(git_dir)
+            if batch is not None:
+                self._batches.move_to_end(git_dir)
+                return batch
+            batch = _CatFileBatch(git_dir)
+            self._batches[git_dir] = batch
+            while len(self._batches) > self.max_processes:
+                evicted.append(self._batches.popitem(last=False)[1])
+        # Closing waits for reads in flight, never do that while holding the cache lock
+        for old in evicted:
+            old.close()
+        return batch
+
+    def _discard(self, git_dir: str, batch: _CatFileBatch) -> None:
+        with self._lock:
+            if self._batches.get(git_dir) is batch:
+                del self._batches[git_dir]
+        batch.close()
+
+    def _count(self, git_dir: str, head_sha: str, upstream_sha: str) -> Tuple[Optional[int], Optional[int]]:
+        if head_sha == upstream_sha:
+            return 0, 0
+        try:
+            res = subprocess.run(
+                ['git', f'--git-dir={git_dir}', 'rev-list', '--left-right', '--count', f'{head_sha}...{upstream_sha}'],
+                capture_output=True, text=True, check=True, creationflags=_CREATE_NO_WINDOW,
+            )
+            ahead, behind = res.stdout.split()
+            return int(ahead), int(behind)
+        except Exception:
+            return None, None
+
+    def get(self, node_path: str) -> Optional[CommitInfo]:
+        key = os.path.normpath(node_path)
+        git_dir = resolve_git_dir(key)
+        if not git_dir:
+            return None
+        branch, head_sha = read_head(git_dir)
+        if not head_sha:
+            return None
+        upstream = read_upstream(git_dir, branch)
+        upstream_sha = read_ref(git_dir, upstream) if upstream else None
+
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached and cached.head_sha == head_sha and cached.upstream_sha == upstream_sha:
+            return cached
+
+        # Under heavy eviction a fresh batch can be retired again before its first read
+        for _ in range(3):
+            batch = self._batch(git_dir)
+            try:
+                data = batch.read(head_sha)
+                break
+            except _BatchClosed:
+                # Evicted or closed by another thread between lookup and read, start a fresh one
+                self._discard(git_dir, batch)
+            except Exception as e:
+                print(f"Error reading commit {head_sha[:7]} in {node_path}: {e}")
+                self._discard(git_dir, batch)
+                return None
+        else:
+            res = subprocess.run(['git', f'--git-dir={git_dir}', 'cat-file', 'commit', head_sha],
+                                 capture_output=True, creationflags=_CREATE_NO_WINDOW)
+            data = res.stdout if res.returncode == 0 else None
+        if data is None:
+            return None
+        author, committed, summary = parse_commit(data)
+        ahead, behind = self._count(git_dir, head_sha, upstream_sha) if upstream_sha else (None, None)
+        info = CommitInfo(head_sha, upstream_sha, author, committed, summary, ahead, behind)
+        with self._lock:
+            self._entries[key] = info
+            self._dirty = True
+        return info
+
+    def invalidate(self, node_path: str) -> None:
+        with self._lock:
+            if self._entries.pop(os.path.normpath(node_path), None):
+                self._dirty = True
+
+    def close(self) -> None:
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            batch.close()
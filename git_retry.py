@@ -0,0 +1,113 @@
+import os
+import time
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+# Error classes, decide whether an attempt is repeated
+ERR_NETWORK = "网络中断"
+ERR_SERVER = "服务器错误"
+ERR_REMOTE = "远程拒绝"
+ERR_LOCAL = "本地错误"
+
+# Checked in this order, the first class with a matching marker wins
+_MARKERS = (
+    (ERR_LOCAL, ("conflict", "unmerged", "would be overwritten", "not possible to fast-forward",
+                 "divergent branches", "commit your changes", "index.lock", "not a git repository",
+                 "already exists and is not an empty directory", "no space left")),
+    (ERR_REMOTE, ("authentication failed", "repository not found", "could not read username",
+                  "permission denied", "returned error: 401", "returned error: 403", "returned error: 404",
+                  "does not appear to be a git repository")),
+    (ERR_SERVER, ("returned error: 5", "returned error: 429", "internal server error", "bad gateway",
+                  "service unavailable", "gateway timeout")),
+    (ERR_NETWORK, ("connection reset", "timed out", "early eof", "unexpected disconnect", "rpc failed",
+                   "gnutls", "ssl", "tls", "could not resolve host", "failed to connect", "connection refused",
+                   "hung up unexpectedly", "transfer closed", "index-pack failed", "operation too slow",
+                   "network is unreachable", "broken pipe", "curl 18", "curl 56", "curl 92")),
+)
+
+
+def classify_error(error) -> str:
+    """
+    Map git output to an error class. Unknown failures count as ERR_REMOTE: not retried
+    on the same endpoint, but another mirror may still be tried.
+    """
+    text = str(error).lower()
+    for kind, markers in _MARKERS:
+        if any(m in text for m in markers):
+            return kind
+    return ERR_REMOTE
+
+
+@dataclass
+class TransferReport:
+    """
+    Retries and resumption of one clone/fetch/pull, appended to its summary.
+    """
+    retries: List[str] = field(default_factory=list)
+    resumed: bool = False
+    bytes_saved: int = 0
+
+    def describe(self) -> str:
+        parts = []
+        if self.retries:
+            counts: Dict[str, int] = {}
+            for kind in self.retries:
+                counts[kind] = counts.get(kind, 0) + 1
+            detail = ", ".join(f"{k} x{v}" for k, v in counts.items())
+            parts.append(f"重试 {len(self.retries)} 次 ({detail})")
+        if self.resumed:
+            parts.append("从已下载的部分续传")
+        if self.bytes_saved:
+            parts.append(f"续传节省 {self.bytes_saved / 1024 ** 2:.1f} MB")
+        return "，".join(parts)
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with jitter. Network and server errors are retried, errors from
+    the remote (auth, missing repo) and local errors (conflicts, dirty tree) are not.
+    """
+    max_attempts: int = 4
+    base_delay: float = 2.0
+    max_delay: float = 60.0
+    retry_on: tuple = (ERR_NETWORK, ERR_SERVER)
+
+    def delay(self, attempt: int) -> float:
+        # Equal jitter: at least half the backoff, so parallel workers do not retry in lockstep
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def run(self, fn: Callable[[], T], report: Optional[TransferReport] = None,
+            sleep: Callable[[float], None] = time.sleep) -> T:
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind not in self.retry_on or attempt + 1 >= self.max_attempts:
+                    raise
+                if report is not None:
+                    report.retries.append(kind)
+                wait = self.delay(attempt)
+                print(f"{kind}，{wait:.1f}s 后重试 ({attempt + 1}/{self.max_attempts - 1}): {str(e).strip()[:200]}")
+                sleep(wait)
+                attempt += 1
+
+
+def object_store_size(git_dir: str) -> int:
+    """
+    Bytes in the object store, i.e. what a resumed transfer does not download again.
+    """
+    total = 0
+    for dirpath, _, filenames in os.walk(os.path.join(git_dir, "objects")):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
@@ -1,20 +1,53 @@
 import os
 import json
+import datetime
+import time
 import shutil
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 import webbrowser
 from tkinter import filedialog, messagebox, simpledialog
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from node_manager import NodeManager, Node
+from node_manager import NodeManager, Node, resolve_custom_nodes_path, resolve_python_path
+from fleet import FleetIndex
+from node_watcher import NodeWatcher
+from metrics import REGISTRY
+from requirements_analyzer import RequirementsAnalyzer
+from wheelhouse import Wheelhouse
+from link_engine import plan_batch, apply_plan, ACTION_OK, ACTION_CONFLICT, ACTION_REPLACE
+from model_merge import plan_models_merge, execute_merge, rollback_merge, purge_holding, MERGE_MOVE
+from model_dedup import DedupScanner, replace_duplicates, MODE_HARDLINK, MODE_SYMLINK
+from disk_usage import DiskUsageCache
+from node_repair import NodeRepairer, LOCAL_STASH, LOCAL_DISCARD
+from git_mirrors import MirrorSelector, parse_rules, format_rules
+from node_registry import NodeRegistry
+from search_index import SearchIndex
+from import_profiler import ImportProfiler, profile_key
+from bytecode_compiler import BytecodeCompiler
+from git_maintenance import GitMaintainer
+from env_snapshots import SnapshotStore, DIFF_SAME, DIFF_CHANGED
+from local_status import (local_status, scan_worktree_changes, stash_changes, pop_stash, discard_changes,
+                          backup_changes, CHANGES_STASH, CHANGES_SKIP, CHANGES_OVERWRITE)
+from migration_planner import MigrationPlanner, STATUS_MISSING, STATUS_MIGRATED_GIT, STATUS_COPIED, STATUS_SKIPPED_NON_GIT
 import sys
 import queue
-import subprocess
-import ctypes
 
 # Config File
 CONFIG_FILE = "config.json"
+HASH_CACHE_FILE = "model_hash_cache.json"
+MERGE_JOURNAL_DIR = "merge_journals"
+MIRROR_STATS_FILE = "mirror_stats.json"
+REGISTRY_CACHE_FILE = "registry_cache.json"
+PROFILE_CACHE_FILE = "import_profile_cache.json"
+MAINTENANCE_STATE_FILE = "maintenance_state.json"
+CHANGES_BACKUP_DIR = "local_changes_backup"
+REPAIR_BACKUP_DIR = "repair_backups"
+SNAPSHOT_DIR = "snapshots"
+# Idle-time git maintenance: how long without input or log output counts as idle, and how often a repo is due
+IDLE_SECONDS = 300
+MAINTENANCE_INTERVAL = 7 * 24 * 3600
 
 class TextRedirector(object):
     def __init__(self, queue):
@@ -43,8 +76,15 @@ class App(ttk.Window):
                   foreground=[('selected', '#000000')])
         
         self.manager = NodeManager()
+        self.fleet = FleetIndex(self.manager)
+        self.planner = MigrationPlanner(self.manager)
         self.current_nodes = []
         self.migration_nodes = []
+        self.migration_plan = {} # node name -> MigrationPlanItem
+        # Index of the old environment, the target side is rebuilt whenever it may have changed
+        self.migration_source = None
+        self.migration_lock = threading.Lock()
+        self.migration_target_job = None
         self.manage_checked = set()
         self.migrate_checked = set()
         
@@ -54,6 +94,7 @@ class App(ttk.Window):
         # UI Variables
         self.comfy_root_var = tk.StringVar()
         self.custom_nodes_path_var = tk.StringVar()
+        self.custom_nodes_path_var.trace_add("write", self.on_custom_nodes_path_changed)
         self.python_path_var = tk.StringVar()
         self.proxy_var = tk.StringVar()
         
@@ -68,6 +109,31 @@ class App(ttk.Window):
         self.backup_file_var = tk.StringVar()
         self.restore_target_var = tk.StringVar()
         
+        # Link Options
+        self.link_merge_var = tk.BooleanVar(value=False)
+        self.link_all_instances_var = tk.BooleanVar(value=False)
+        self.link_dry_run_var = tk.BooleanVar(value=False)
+        self.link_keep_existing_var = tk.BooleanVar(value=True)
+        self.dedup_mode_var = tk.StringVar(value="硬链接")
+        
+        # Fleet Variables
+        self.fleet_root_var = tk.StringVar()
+        self.fleet_filter_var = tk.StringVar()
+        self.fleet_checked = set()
+        
+        # Shared Wheelhouse
+        self.use_wheelhouse_var = tk.BooleanVar(value=False)
+        self.wheelhouse_dir_var = tk.StringVar(value=os.path.join(os.path.dirname(os.path.abspath(__file__)), "wheelhouse"))
+        self.wheelhouse_max_gb_var = tk.StringVar(value="10")
+        
+        # Git Mirrors: origin prefix -> mirror prefixes
+        self.mirror_rules = {}
+        self.mirror_window = None
+        
+        # Local node registry files (e.g. ComfyUI-Manager custom-node-list.json)
+        self.registry_files = []
+        self.registry = None
+        
         # Filter Variables
         self.migrate_filter_var = tk.StringVar()
         self.manage_filter_name_var = tk.StringVar()
@@ -80,8 +146,31 @@ class App(ttk.Window):
         self.manage_filter_status_var.trace("w", lambda *args: self.update_manage_list())
         self.migrate_filter_var.trace("w", lambda *args: self.filter_migrate_list())
         self.migrate_filter_status_var.trace("w", lambda *args: self.filter_migrate_list())
+        self.fleet_filter_var.trace("w", lambda *args: self.update_fleet_matrix())
         
         self.node_status_map = {} # Cache for node status
+        # Field-qualified search over the manage, migrate and fleet lists
+        self.manage_index = SearchIndex()
+        self.migrate_index = SearchIndex()
+        self.fleet_index = SearchIndex()
+        # Import-time profiles per node name
+        self.profile_map = {}
+        self.profiler = ImportProfiler(os.path.join(os.path.dirname(os.path.abspath(__file__)), PROFILE_CACHE_FILE))
+        self.bytecode_compiler = BytecodeCompiler()
+        self.maintainer = GitMaintainer(os.path.join(os.path.dirname(os.path.abspath(__file__)), MAINTENANCE_STATE_FILE))
+        self.maintenance_running = False
+        self.snapshots = SnapshotStore(os.path.join(os.path.dirname(os.path.abspath(__file__)), SNAPSHOT_DIR))
+        self.snapshot_window = None
+        self.last_activity = time.time()
+        self.commit_info_map = {} # node name -> CommitInfo
+        self.local_status_nodes = set() # names whose status came from the offline pass, not a fetch
+        self.node_size_map = {} # node name -> DirUsage
+        self.disk_usage = DiskUsageCache()
+        self.node_watcher = None
+        self.perf_window = None
+        self.watch_nodes_var = tk.BooleanVar(value=False)
+        self.precompile_var = tk.BooleanVar(value=False)
+        self.idle_maintenance_var = tk.BooleanVar(value=False)
         
         self.load_config()
         self.create_widgets()
@@ -93,6 +182,10 @@ class App(ttk.Window):
         # Start log polling
         self.after(100, self.poll_log_queue)
 
+        self.bind_all("<Any-KeyPress>", self.note_activity, add="+")
+        self.bind_all("<Any-ButtonPress>", self.note_activity, add="+")
+        self.after(60 * 1000, self.check_idle_maintenance)
+
     def poll_log_queue(self):
         try:
             while True:
@@ -144,8 +237,95 @@ class App(ttk.Window):
 
         threading.Thread(target=_test, daemon=True).start()
 
+    # --- Git Mirrors ---
+    def apply_mirror_settings(self):
+        if not self.mirror_rules:
+            self.manager.mirrors = None
+            return None
+        if self.manager.mirrors is None:
+            stats_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), MIRROR_STATS_FILE)
+            self.manager.mirrors = MirrorSelector(self.mirror_rules, stats_file)
+        else:
+            self.manager.mirrors.rules = dict(self.mirror_rules)
+        return self.manager.mirrors
+
+    def show_mirror_panel(self):
+        if self.mirror_window and self.mirror_window.winfo_exists():
+            self.mirror_window.lift()
+            return
+        
+        win = ttk.Toplevel(self)
+        win.title("Git 镜像")
+        win.geometry("820x520")
+        self.mirror_window = win
+        
+        rules_frame = ttk.Labelframe(win, text="地址改写规则 (每行: 原地址前缀 = 镜像前缀1, 镜像前缀2)", padding=5)
+        rules_frame.pack(fill=X, padx=5, pady=5)
+        self.mirror_rules_text = tk.Text(rules_frame, height=6)
+        self.mirror_rules_text.pack(fill=X)
+        self.mirror_rules_text.insert("1.0", format_rules(self.mirror_rules) or
+                                      "# https://github.com/ = https://mirror.example.com/https://github.com/")
+        
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        ttk.Button(toolbar, text="保存规则", command=self.save_mirror_rules, bootstyle="success").pack(side=LEFT, padx=5)
+        ttk.Label(toolbar, text="测速仓库:").pack(side=LEFT, padx=5)
+        self.mirror_probe_url_var = tk.StringVar(value="https://github.com/comfyanonymous/ComfyUI")
+        ttk.Entry(toolbar, textvariable=self.mirror_probe_url_var).pack(side=LEFT, fill=X, expand=True, padx=5)
+        ttk.Button(toolbar, text="测速", command=self.probe_mirrors, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        
+        columns = ("endpoint", "latency", "ok", "fail", "rate")
+        headings = ("端点", "延迟 (ms)", "成功", "失败", "成功率")
+        self.mirror_tree = ttk.Treeview(win, columns=columns, show="headings")
+        for col, text in zip(columns, headings):
+            self.mirror_tree.heading(col, text=text)
+            self.mirror_tree.column(col, width=80, anchor=E)
+        self.mirror_tree.column("endpoint", width=420, anchor=W)
+        self.mirror_tree.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        self.refresh_mirror_panel()
+
+    def save_mirror_rules(self):
+        self.mirror_rules = parse_rules(self.mirror_rules_text.get("1.0", END))
+        self.apply_mirror_settings()
+        self.save_config()
+        self.log(f"Git 镜像规则已保存: {len(self.mirror_rules)} 条")
+        self.refresh_mirror_panel()
+
+    def refresh_mirror_panel(self):
+        if not self.mirror_window or not self.mirror_window.winfo_exists():
+            return
+        self.mirror_tree.delete(*self.mirror_tree.get_children())
+        selector = self.manager.mirrors
+        if selector is None:
+            return
+        url = self.mirror_probe_url_var.get().strip()
+        for endpoint in selector.candidates(url):
+            stats = selector.stats(endpoint)
+            latency = f"{stats.latency * 1000:.0f}" if stats.latency is not None else "-"
+            name = endpoint.prefix + ("" if endpoint.is_mirror else " (上游)")
+            self.mirror_tree.insert("", END, values=(name, latency, stats.ok, stats.fail, f"{stats.success_rate:.0%}"))
+
+    def probe_mirrors(self):
+        selector = self.apply_mirror_settings()
+        url = self.mirror_probe_url_var.get().strip()
+        if selector is None or not selector.candidates(url):
+            messagebox.showinfo("提示", "没有与测速仓库匹配的镜像规则")
+            return
+        proxy = self.get_proxy_url()
+        
+        def _probe():
+            self.log(f"Git 镜像测速: {url}")
+            ranked = selector.rank(url, env=self.manager._get_git_env(proxy), force_probe=True)
+            self.log(f"最快端点: {ranked[0].prefix}")
+            self.after(0, self.refresh_mirror_panel)
+        
+        threading.Thread(target=_probe, daemon=True).start()
+
     def on_closing(self):
         self.save_config()
+        self.stop_node_watcher()
+        self.manager.commit_cache.save()
+        self.manager.commit_cache.close()
         self.destroy()
 
     def create_widgets(self):
@@ -179,6 +359,7 @@ class App(ttk.Window):
         
         ttk.Entry(proxy_frame, textvariable=self.proxy_var).pack(side=LEFT, fill=X, expand=True)
         ttk.Button(proxy_frame, text="测试", command=self.test_proxy, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(proxy_frame, text="Git 镜像", command=self.show_mirror_panel, bootstyle="info-outline").pack(side=LEFT, padx=5)
         
         ttk.Button(settings_frame, text="保存配置", command=self.save_config, bootstyle="success").grid(row=2, column=2, padx=5)
         
@@ -186,6 +367,8 @@ class App(ttk.Window):
         self.log_btn = ttk.Button(settings_frame, text="隐藏日志", command=self.toggle_log_sidebar, bootstyle="secondary-outline")
         self.log_btn.grid(row=0, column=3, rowspan=3, padx=5, sticky=NS)
         
+        ttk.Button(settings_frame, text="性能统计", command=self.show_perf_panel, bootstyle="secondary-outline").grid(row=0, column=4, rowspan=3, padx=5, sticky=NS)
+        
         settings_frame.columnconfigure(1, weight=1)
 
         # --- Tabs ---
@@ -212,6 +395,11 @@ class App(ttk.Window):
         self.notebook.add(self.tab_backup, text="备份还原")
         self.setup_backup_tab()
 
+        # Tab 5: Fleet (Multiple Instances)
+        self.tab_fleet = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.tab_fleet, text="多实例")
+        self.setup_fleet_tab()
+
         # --- Right Pane: Log Section ---
         self.log_frame = ttk.Labelframe(self.main_paned, text="系统日志", padding=10)
         self.main_paned.add(self.log_frame, weight=1)
@@ -235,19 +423,24 @@ class App(ttk.Window):
         filter_frame = ttk.Frame(self.tab_manage)
         filter_frame.pack(fill=X, pady=5)
         
-        ttk.Label(filter_frame, text="名称:").pack(side=LEFT, padx=2)
-        ttk.Entry(filter_frame, textvariable=self.manage_filter_name_var, width=15).pack(side=LEFT, padx=5)
+        ttk.Label(filter_frame, text="搜索:").pack(side=LEFT, padx=2)
+        ttk.Entry(filter_frame, textvariable=self.manage_filter_name_var, width=30).pack(side=LEFT, padx=5)
 
         ttk.Label(filter_frame, text="类型:").pack(side=LEFT, padx=2)
         ttk.Combobox(filter_frame, textvariable=self.manage_filter_type_var, values=["全部", "Git", "文件夹"], state="readonly", width=8).pack(side=LEFT, padx=5)
 
         ttk.Label(filter_frame, text="状态:").pack(side=LEFT, padx=2)
-        ttk.Combobox(filter_frame, textvariable=self.manage_filter_status_var, values=["全部", "有更新", "已是最新", "未知", "检查中..."], state="readonly", width=10).pack(side=LEFT, padx=5)
+        ttk.Combobox(filter_frame, textvariable=self.manage_filter_status_var, values=["全部", "有更新", "已是最新", "落后", "本地修改", "未知", "检查中..."], state="readonly", width=10).pack(side=LEFT, padx=5)
         
         ttk.Separator(filter_frame, orient=VERTICAL).pack(side=LEFT, padx=10, fill=Y)
         
         ttk.Button(filter_frame, text="全选", command=self.select_all_manage, bootstyle="secondary-outline").pack(side=LEFT, padx=5)
         ttk.Button(filter_frame, text="全不选", command=self.deselect_all_manage, bootstyle="secondary-outline").pack(side=LEFT, padx=5)
+        
+        ttk.Separator(filter_frame, orient=VERTICAL).pack(side=LEFT, padx=10, fill=Y)
+        ttk.Checkbutton(filter_frame, text="自动监视目录变化", variable=self.watch_nodes_var, command=self.toggle_node_watcher, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(filter_frame, text="操作后预编译字节码", variable=self.precompile_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(filter_frame, text="空闲时维护 Git 仓库", variable=self.idle_maintenance_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
 
         # Toolbar
         toolbar = ttk.Frame(self.tab_manage)
@@ -257,6 +450,11 @@ class App(ttk.Window):
         ttk.Button(toolbar, text="检查更新", command=self.start_check_updates_thread, bootstyle="primary").pack(side=LEFT, padx=5)
         ttk.Button(toolbar, text="更新选中", command=self.start_update_selected_thread, bootstyle="success").pack(side=LEFT, padx=5)
         ttk.Button(toolbar, text="安装依赖", command=self.start_install_reqs_thread, bootstyle="warning").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="依赖分析", command=self.start_analyze_reqs_thread, bootstyle="warning-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="匹配 Git 地址", command=self.start_registry_match_thread, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="加载耗时分析", command=self.start_profile_thread, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="Git 仓库维护", command=self.start_maintenance_thread, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="版本快照", command=self.show_snapshot_panel, bootstyle="info-outline").pack(side=LEFT, padx=5)
         ttk.Button(toolbar, text="修复选中", command=self.start_repair_selected_thread, bootstyle="danger-outline").pack(side=LEFT, padx=5)
         ttk.Button(toolbar, text="删除选中", command=self.start_delete_selected_thread, bootstyle="danger").pack(side=LEFT, padx=5)
         
@@ -270,7 +468,7 @@ class App(ttk.Window):
         tree_frame = ttk.Frame(self.tab_manage)
         tree_frame.pack(fill=BOTH, expand=True)
 
-        columns = ("select", "name", "type", "remote", "status", "msg")
+        columns = ("select", "name", "type", "remote", "status", "commits", "commit_date", "size", "import_time", "memory", "msg")
         self.manage_tree = ttk.Treeview(tree_frame, columns=columns, show="headings", selectmode="extended")
         
         self.manage_tree.heading("select", text="选择", command=lambda: self.sort_treeview(self.manage_tree, "select", False))
@@ -278,6 +476,11 @@ class App(ttk.Window):
         self.manage_tree.heading("type", text="类型", command=lambda: self.sort_treeview(self.manage_tree, "type", False))
         self.manage_tree.heading("remote", text="Git 地址", command=lambda: self.sort_treeview(self.manage_tree, "remote", False))
         self.manage_tree.heading("status", text="更新状态", command=lambda: self.sort_treeview(self.manage_tree, "status", False))
+        self.manage_tree.heading("commits", text="提交差异", command=lambda: self.sort_treeview(self.manage_tree, "commits", False))
+        self.manage_tree.heading("commit_date", text="最后提交", command=lambda: self.sort_treeview(self.manage_tree, "commit_date", False))
+        self.manage_tree.heading("size", text="占用空间", command=lambda: self.sort_treeview(self.manage_tree, "size", False))
+        self.manage_tree.heading("import_time", text="加载耗时", command=lambda: self.sort_treeview(self.manage_tree, "import_time", False))
+        self.manage_tree.heading("memory", text="加载内存", command=lambda: self.sort_treeview(self.manage_tree, "memory", False))
         self.manage_tree.heading("msg", text="信息", command=lambda: self.sort_treeview(self.manage_tree, "msg", False))
         
         self.manage_tree.column("select", width=60, anchor=CENTER, stretch=False)
@@ -285,6 +488,11 @@ class App(ttk.Window):
         self.manage_tree.column("type", width=80, minwidth=60, stretch=False)
         self.manage_tree.column("remote", width=300, minwidth=150)
         self.manage_tree.column("status", width=100, minwidth=80, stretch=False)
+        self.manage_tree.column("commits", width=110, minwidth=80, stretch=False)
+        self.manage_tree.column("commit_date", width=160, minwidth=100, stretch=False)
+        self.manage_tree.column("size", width=150, minwidth=80, stretch=False)
+        self.manage_tree.column("import_time", width=90, minwidth=60, stretch=False, anchor=E)
+        self.manage_tree.column("memory", width=90, minwidth=60, stretch=False, anchor=E)
         self.manage_tree.column("msg", width=200, minwidth=100)
         
         # Scrollbars
@@ -330,11 +538,11 @@ class App(ttk.Window):
         
         ttk.Separator(filter_frame, orient=VERTICAL).pack(side=LEFT, padx=10, fill=Y)
         
-        ttk.Label(filter_frame, text="名称:").pack(side=LEFT, padx=2)
-        ttk.Entry(filter_frame, textvariable=self.migrate_filter_var, width=15).pack(side=LEFT, padx=5)
+        ttk.Label(filter_frame, text="搜索:").pack(side=LEFT, padx=2)
+        ttk.Entry(filter_frame, textvariable=self.migrate_filter_var, width=30).pack(side=LEFT, padx=5)
 
         ttk.Label(filter_frame, text="状态:").pack(side=LEFT, padx=2)
-        ttk.Combobox(filter_frame, textvariable=self.migrate_filter_status_var, values=["全部", "可迁移", "已存在", "已迁移"], state="readonly", width=10).pack(side=LEFT, padx=5)
+        ttk.Combobox(filter_frame, textvariable=self.migrate_filter_status_var, values=["全部", "可迁移", "已存在", "相同", "目标落后", "目标领先", "版本不同", "远程不同", "重命名", "已迁移"], state="readonly", width=10).pack(side=LEFT, padx=5)
         
         ttk.Separator(filter_frame, orient=VERTICAL).pack(side=LEFT, padx=10, fill=Y)
         
@@ -456,11 +664,14 @@ class App(ttk.Window):
             self.log("备份文件为空。")
             return
             
+        if os.path.isdir(target_root):
+            self.take_snapshot(target_root, "恢复前")
         self.log(f"开始从备份恢复 {total} 个节点...")
         
         success_count = 0
         skip_count = 0
         fail_count = 0
+        restored = []
         
         for node_info in nodes_data:
             name = node_info.get("name")
@@ -471,21 +682,23 @@ class App(ttk.Window):
                 
             target_path = os.path.join(target_root, name)
             
-            if os.path.exists(target_path):
+            if os.path.exists(target_path) and not self.manager.is_partial_clone(target_path, url):
                 self.log(f"跳过 {name}: 目标已存在。")
                 skip_count += 1
                 continue
                 
             self.log(f"正在恢复 {name} ({url})...")
             try:
-                self.manager.clone_node(url, target_path, proxy=proxy if proxy else None)
+                summary = self.manager.clone_node(url, target_path, proxy=proxy if proxy else None)
                 self.manager.set_node_install_time(name) # Record install time
-                self.log(f"已恢复 {name}")
+                self.log(f"已恢复 {name}:\n{summary}")
+                restored.append(target_path)
                 success_count += 1
             except Exception as e:
                 self.log(f"恢复失败 {name}: {e}")
                 fail_count += 1
                 
+        self.precompile_nodes(restored)
         summary = f"恢复完成。\n成功: {success_count}\n跳过: {skip_count}\n失败: {fail_count}"
         self.log("-" * 40)
         self.log(summary)
@@ -495,10 +708,35 @@ class App(ttk.Window):
         if os.path.normpath(target_root) == os.path.normpath(self.custom_nodes_path_var.get()):
             self.refresh_current_nodes()
 
+    def precompile_nodes(self, node_paths, python_path=None):
+        """
+        Final stage of the operations that change node code: compile what changed with the
+        interpreter ComfyUI runs, so its first start does not pay for it.
+        """
+        if not self.precompile_var.get() or not node_paths:
+            return
+        python_path = python_path or self.python_path_var.get()
+        if not python_path or not os.path.exists(python_path):
+            self.log("跳过字节码预编译: 未设置 Python 路径。")
+            return
+        try:
+            report = self.bytecode_compiler.compile_nodes(node_paths, python_path, progress=self.log)
+        except Exception as e:
+            self.log(f"字节码预编译失败: {e}")
+            return
+        self.log(f"字节码预编译完成: {report.describe()}")
+        for path in report.failed[:20]:
+            self.log(f"  编译失败: {path}")
+
     # --- Helpers ---
     def log(self, msg):
+        # Anything worth logging means an operation is running, which keeps idle maintenance away
+        self.last_activity = time.time()
         print(msg)
 
+    def note_activity(self, event=None):
+        self.last_activity = time.time()
+
     def on_manage_click(self, event):
         col = self.manage_tree.identify_column(event.x)
         if col != '#1':
@@ -690,13 +928,28 @@ class App(ttk.Window):
                     self.comfy_root_var.set(config.get("comfy_root", ""))
                     self.python_path_var.set(config.get("python_path", ""))
                     self.proxy_var.set(config.get("proxy", ""))
+                    self.watch_nodes_var.set(config.get("watch_nodes", False))
+                    self.precompile_var.set(config.get("precompile_bytecode", False))
+                    self.idle_maintenance_var.set(config.get("idle_maintenance", False))
+                    self.use_wheelhouse_var.set(config.get("use_wheelhouse", False))
+                    self.wheelhouse_dir_var.set(config.get("wheelhouse_dir", self.wheelhouse_dir_var.get()))
+                    self.wheelhouse_max_gb_var.set(str(config.get("wheelhouse_max_gb", 10)))
+                    self.mirror_rules = config.get("mirror_rules", {})
+                    self.registry_files = config.get("registry_files", [])
                     self.old_nodes_path_var.set(config.get("old_nodes_path", ""))
                     self.symlink_source_var.set(config.get("symlink_source", ""))
                     self.workflow_source_var.set(config.get("workflow_source", ""))
                     self.symlink_target_var.set(config.get("symlink_target", ""))
                     self.model_target_var.set(config.get("model_target", ""))
                     self.workflow_target_var.set(config.get("workflow_target", ""))
+                    for root in config.get("fleet_roots", []):
+                        try:
+                            self.fleet.add_instance(root)
+                        except Exception as e:
+                            self.log(f"Fleet instance skipped ({root}): {e}")
                     self.update_paths_from_root()
+                    self.apply_wheelhouse_settings()
+                    self.apply_mirror_settings()
             except Exception as e:
                 self.log(f"Config load error: {e}")
 
@@ -708,12 +961,21 @@ class App(ttk.Window):
             "comfy_root": self.comfy_root_var.get(),
             "python_path": self.python_path_var.get(),
             "proxy": self.proxy_var.get(),
+            "watch_nodes": self.watch_nodes_var.get(),
+            "precompile_bytecode": self.precompile_var.get(),
+            "idle_maintenance": self.idle_maintenance_var.get(),
+            "use_wheelhouse": self.use_wheelhouse_var.get(),
+            "wheelhouse_dir": self.wheelhouse_dir_var.get(),
+            "wheelhouse_max_gb": self.get_wheelhouse_max_gb(),
+            "mirror_rules": self.mirror_rules,
+            "registry_files": self.registry_files,
             "old_nodes_path": self.old_nodes_path_var.get(),
             "symlink_source": self.symlink_source_var.get(),
             "workflow_source": self.workflow_source_var.get(),
             "symlink_target": self.symlink_target_var.get(),
             "model_target": self.model_target_var.get(),
-            "workflow_target": self.workflow_target_var.get()
+            "workflow_target": self.workflow_target_var.get(),
+            "fleet_roots": self.fleet.roots()
         }
         try:
             with open(config_path, 'w') as f:
@@ -726,16 +988,12 @@ class App(ttk.Window):
         root = self.comfy_root_var.get()
         if root and os.path.isdir(root):
             # Infer custom_nodes
-            cn_path = os.path.join(root, "ComfyUI", "custom_nodes") # Standard install
-            if not os.path.exists(cn_path):
-                cn_path = os.path.join(root, "custom_nodes") # Portable root might be the ComfyUI folder itself
-            
-            self.custom_nodes_path_var.set(cn_path)
+            self.custom_nodes_path_var.set(resolve_custom_nodes_path(root))
             
             # Infer python if not set
             if not self.python_path_var.get():
-                py_path = os.path.join(root, "python_embeded", "python.exe")
-                if os.path.exists(py_path):
+                py_path = resolve_python_path(root)
+                if py_path:
                     self.python_path_var.set(py_path)
                     self.log(f"Auto-detected Python: {py_path}")
 
@@ -769,59 +1027,281 @@ class App(ttk.Window):
             self.log(f"Scanning {path}...")
             nodes = self.manager.scan_directory(path)
             self.current_nodes = nodes
+            self.manage_index.clear()
+            for node in nodes:
+                self.index_manage_node(node)
             self.update_manage_list()
+            self.start_commit_info_thread()
+            self.start_node_size_thread()
+            self.start_migration_target_thread(nodes)
             self.log(f"Loaded {len(nodes)} nodes.")
+            # Follow the (possibly changed) custom_nodes path
+            if self.watch_nodes_var.get() and (not self.node_watcher or self.node_watcher.path != path):
+                self.start_node_watcher()
         except Exception as e:
             self.log(f"Scan failed: {e}")
 
+    def manage_row_values(self, node, matches=None):
+        """
+        Build the treeview row for a node, or None if it is hidden by the current search.
+        matches is the result of manage_search(); pass it when building many rows.
+        """
+        if matches is None:
+            matches = self.manage_search()
+        if node.name not in matches:
+            return None
+        node_type_str = "Git" if node.is_git_repo else "文件夹"
+        status = self.node_status_map.get(node.name, "未知")
+            
+        msg_val = ""
+        if node.last_update_time:
+            msg_val = f"最后更新: {node.last_update_time}"
+        elif node.install_time:
+            msg_val = f"安装时间: {node.install_time}"
+        
+        commits_val, date_val = self.format_commit_info(self.commit_info_map.get(node.name))
+        return (
+            "☐",
+            node.name,
+            node_type_str,
+            node.remote_url if node.remote_url else "-",
+            status,
+            commits_val,
+            date_val,
+            self.format_node_size(self.node_size_map.get(node.name)),
+            *self.format_profile(self.profile_map.get(node.name)),
+            msg_val
+        )
+
+    def manage_search(self):
+        """
+        Names matching the search box plus the type/status dropdowns, e.g. 'owner:kijai status:有更新'.
+        """
+        query = [self.manage_filter_name_var.get()]
+        # node.is_git_repo is also True for folders with a manually set URL
+        if self.manage_filter_type_var.get() != "全部":
+            query.append(f'type:"{self.manage_filter_type_var.get()}"')
+        if self.manage_filter_status_var.get() != "全部":
+            query.append(f'status:"{self.manage_filter_status_var.get()}"')
+        return self.manage_index.search(" ".join(query))
+
+    def index_manage_node(self, node):
+        info = self.commit_info_map.get(node.name)
+        self.manage_index.set(
+            node.name,
+            name=node.name,
+            url=node.remote_url,
+            type="Git" if node.is_git_repo else "文件夹",
+            status=self.node_status_map.get(node.name, "未知"),
+            updated=node.last_update_time,
+            installed=node.install_time,
+            committed=info.formatted_date if info else None,
+        )
+
+    def set_node_status(self, node_name, status, local=False):
+        self.node_status_map[node_name] = status
+        self.manage_index.update(node_name, status=status)
+        if local:
+            self.local_status_nodes.add(node_name)
+        else:
+            self.local_status_nodes.discard(node_name)
+
+    def format_commit_info(self, info):
+        if info is None:
+            return "-", "-"
+        if info.behind is None:
+            commits = "无上游"
+        else:
+            parts = []
+            if info.behind:
+                parts.append(f"落后 {info.behind}")
+            if info.ahead:
+                parts.append(f"领先 {info.ahead}")
+            commits = " / ".join(parts) if parts else "同步"
+        return commits, info.formatted_date
+
+    def format_size(self, num_bytes):
+        size = float(num_bytes)
+        for unit in ("B", "KB", "MB", "GB"):
+            if size < 1024:
+                return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+            size /= 1024
+        return f"{size:.2f} TB"
+
+    def format_node_size(self, usage):
+        if usage is None:
+            return "-"
+        if usage.git:
+            return f"{self.format_size(usage.total)} (.git {self.format_size(usage.git)})"
+        return self.format_size(usage.total)
+
+    def start_node_size_thread(self, nodes=None):
+        nodes = list(self.current_nodes if nodes is None else nodes)
+        threading.Thread(target=self.node_size_logic, args=(nodes,), daemon=True).start()
+
+    def node_size_logic(self, nodes):
+        # Unchanged directories are served from the mtime cache, so refreshing only re-stats folders
+        by_path = {n.path: n.name for n in nodes}
+        
+        def progress(usage):
+            name = by_path[usage.path]
+            self.node_size_map[name] = usage
+            self.after(0, self.update_node_size_ui, name)
+        
+        self.disk_usage.measure_many(list(by_path), progress=progress)
+
+    def update_node_size_ui(self, node_name):
+        item_id = self.find_manage_item(node_name)
+        if item_id:
+            self.manage_tree.set(item_id, column="size", value=self.format_node_size(self.node_size_map.get(node_name)))
+
+    def start_commit_info_thread(self, nodes=None):
+        nodes = list(self.current_nodes if nodes is None else nodes)
+        threading.Thread(target=self.commit_info_logic, args=(nodes,), daemon=True).start()
+
+    def commit_info_logic(self, nodes):
+        # Cache hits only read ref files, misses cost one cat-file read and one rev-list count.
+        # The same pass derives an offline status from the refs and the index, no fetch involved.
+        git_nodes = [n for n in nodes if os.path.exists(os.path.join(n.path, '.git'))]
+        start = time.perf_counter()
+
+        def _read(node):
+            info = self.manager.get_commit_info(node.path)
+            return info, local_status(node.path, info)
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for node, (info, status) in zip(git_nodes, pool.map(_read, git_nodes)):
+                self.commit_info_map[node.name] = info
+                self.after(0, self.update_commit_info_ui, node.name)
+                # Results of a network check stay until the next check
+                current = self.node_status_map.get(node.name, "未知")
+                if status and (current == "未知" or node.name in self.local_status_nodes):
+                    self.set_node_status(node.name, status.label, local=True)
+                    self.after(0, self.update_single_node_ui, node.name)
+        self.manager.commit_cache.save()
+        if git_nodes:
+            self.log(f"本地状态已读取: {len(git_nodes)} 个 Git 节点, 用时 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def update_commit_info_ui(self, node_name):
+        info = self.commit_info_map.get(node_name)
+        self.manage_index.update(node_name, committed=info.formatted_date if info else None)
+        item_id = self.find_manage_item(node_name)
+        if item_id:
+            commits_val, date_val = self.format_commit_info(self.commit_info_map.get(node_name))
+            self.manage_tree.set(item_id, column="commits", value=commits_val)
+            self.manage_tree.set(item_id, column="commit_date", value=date_val)
+
     def update_manage_list(self):
         self.manage_tree.delete(*self.manage_tree.get_children())
         self.manage_checked.clear()
         
-        filter_name = self.manage_filter_name_var.get().lower()
-        filter_type = self.manage_filter_type_var.get()
-        filter_status = self.manage_filter_status_var.get()
-        
+        matches = self.manage_search()
+        shown = 0
         for node in self.current_nodes:
-            # 1. Name Filter
-            if filter_name and filter_name not in node.name.lower():
+            values = self.manage_row_values(node, matches)
+            if values is None:
                 continue
+            # Use cached status
+            tag = 'even' if shown and shown % 2 == 0 else 'odd'
+            self.manage_tree.insert("", END, values=values, tags=(tag,))
+            shown += 1
+
+    def find_manage_item(self, node_name):
+        for item_id in self.manage_tree.get_children():
+            if self.manage_tree.item(item_id, "values")[1] == node_name:
+                return item_id
+        return None
+
+    def toggle_node_watcher(self):
+        if self.watch_nodes_var.get():
+            self.start_node_watcher()
+        else:
+            self.stop_node_watcher()
+
+    def start_node_watcher(self):
+        self.stop_node_watcher()
+        path = self.custom_nodes_path_var.get()
+        if not path or not os.path.isdir(path):
+            return
+        # Callbacks arrive on the watcher thread, hand them over to the Tk loop
+        self.node_watcher = NodeWatcher(path, lambda names: self.after(0, self.apply_node_changes, names))
+        try:
+            self.node_watcher.start()
+            self.log(f"正在监视 {path} ({self.node_watcher.backend_name})")
+        except Exception as e:
+            self.node_watcher = None
+            self.log(f"无法启动目录监视: {e}")
+
+    def stop_node_watcher(self):
+        if self.node_watcher:
+            self.node_watcher.stop()
+            self.node_watcher = None
+
+    def apply_node_changes(self, names):
+        """
+        Rescan only the node folders reported by the watcher and patch the list in place.
+        """
+        root = self.custom_nodes_path_var.get()
+        by_name = {node.name: i for i, node in enumerate(self.current_nodes)}
+        rescanned = []
+        for name in sorted(names):
+            node = self.manager.scan_node(os.path.join(root, name))
+            item_id = self.find_manage_item(name)
             
-            # 2. Type Filter
-            is_git = node.is_git_repo
-            # Check if it has a manual URL - although now node.is_git_repo might be True for manual ones too
-            # We can rely on is_git_repo being True now
-            
-            node_type_str = "Git" if is_git else "文件夹"
-            if filter_type != "全部" and filter_type != node_type_str:
+            if node is None:
+                # Folder deleted or moved away
+                if name in by_name:
+                    self.current_nodes[by_name[name]] = None
+                    self.node_status_map.pop(name, None)
+                    self.manage_index.remove(name)
+                    self.commit_info_map.pop(name, None)
+                    self.node_size_map.pop(name, None)
+                    self.log(f"节点已移除: {name}")
+                if item_id:
+                    self.manage_checked.discard(item_id)
+                    self.manage_tree.delete(item_id)
                 continue
-                
-            # 3. Status Filter
-            status = self.node_status_map.get(node.name, "未知")
-            # If checking in progress, we might have stored it or not. 
-            # If status not in map, it defaults to "未知".
-            if filter_status != "全部" and filter_status != status:
-                 continue
-                
-            msg_val = ""
-            if node.last_update_time:
-                msg_val = f"最后更新: {node.last_update_time}"
-            elif node.install_time:
-                msg_val = f"安装时间: {node.install_time}"
             
-            # Use cached status
-            tag = 'even' if self.manage_tree.get_children() and len(self.manage_tree.get_children()) % 2 == 0 else 'odd'
-            self.manage_tree.insert("", END, values=(
-                "☐",
-                node.name,
-                node_type_str,
-                node.remote_url if node.remote_url else "-",
-                status,
-                msg_val
-            ), tags=(tag,))
+            rescanned.append(node)
+            if name in by_name:
+                self.current_nodes[by_name[name]] = node
+                # An external pull may have applied the pending update
+                if self.node_status_map.get(name) == "有更新":
+                    self.node_status_map[name] = "未知"
+            else:
+                self.current_nodes.append(node)
+                self.log(f"发现新节点: {name}")
+            self.index_manage_node(node)
+            
+            values = self.manage_row_values(node)
+            if values is None:
+                if item_id:
+                    self.manage_checked.discard(item_id)
+                    self.manage_tree.delete(item_id)
+            elif item_id:
+                # Keep the checkbox state of the existing row
+                self.manage_tree.item(item_id, values=(self.manage_tree.set(item_id, 'select'),) + values[1:])
+            else:
+                idx = len(self.manage_tree.get_children())
+                tag = 'even' if idx % 2 == 0 else 'odd'
+                self.manage_tree.insert("", END, values=values, tags=(tag,))
+        self.current_nodes = [node for node in self.current_nodes if node is not None]
+        if rescanned:
+            self.start_commit_info_thread(rescanned)
+            self.start_node_size_thread(rescanned)
+        self.start_migration_target_thread(list(self.current_nodes))
 
     def sort_treeview(self, tree, col, reverse):
-        l = [(tree.set(k, col), k) for k in tree.get_children('')]
+        if tree is self.manage_tree and col == "size":
+            # Sort by bytes, not by the formatted text
+            sizes = {name: usage.total for name, usage in self.node_size_map.items()}
+            l = [(sizes.get(tree.set(k, "name"), -1), k) for k in tree.get_children('')]
+        elif tree is self.manage_tree and col in ("import_time", "memory"):
+            attr = "wall" if col == "import_time" else "rss_delta"
+            values = {name: getattr(result, attr) for name, result in self.profile_map.items()}
+            l = [(values.get(tree.set(k, "name"), -1), k) for k in tree.get_children('')]
+        else:
+            l = [(tree.set(k, col), k) for k in tree.get_children('')]
         l.sort(reverse=reverse)
 
         # rearrange items in sorted positions
@@ -873,12 +1353,12 @@ class App(ttk.Window):
         
         for node in self.current_nodes:
             if not node.is_git_repo:
-                self.node_status_map[node.name] = "不适用"
+                self.set_node_status(node.name, "不适用")
                 continue
                 
             count += 1
             # Update status to checking...
-            self.node_status_map[node.name] = "检查中..."
+            self.set_node_status(node.name, "检查中...")
             # Try to update UI row if exists
             self.update_single_node_ui(node.name)
             
@@ -886,21 +1366,95 @@ class App(ttk.Window):
             try:
                 has_update = self.manager.check_update(node_path, proxy=proxy if proxy else None)
                 status = "有更新" if has_update else "已是最新"
-                self.node_status_map[node.name] = status
+                self.set_node_status(node.name, status)
+                self.commit_info_map[node.name] = self.manager.get_commit_info(node_path)
+                self.update_commit_info_ui(node.name)
             except Exception as e:
-                self.node_status_map[node.name] = "检查失败"
+                self.set_node_status(node.name, "检查失败")
             
             self.update_single_node_ui(node.name)
             
+        self.manager.commit_cache.save()
         self.log("Update check finished.")
 
     def update_single_node_ui(self, node_name):
         # Find item in treeview
-        for item_id in self.manage_tree.get_children():
-            if self.manage_tree.item(item_id, "values")[1] == node_name:
-                status = self.node_status_map.get(node_name, "未知")
-                self.manage_tree.set(item_id, column="status", value=status)
-                break
+        item_id = self.find_manage_item(node_name)
+        if item_id:
+            status = self.node_status_map.get(node_name, "未知")
+            self.manage_tree.set(item_id, column="status", value=status)
+
+    def preflight_local_changes(self, node_paths, action, choices):
+        """
+        Check the repos an action is about to touch for local changes, all at once and in
+        parallel. When some have changes, list them and ask once for the whole batch.
+        Returns (choice, {path: WorktreeChanges}) with choice None when cancelled.
+        """
+        if not node_paths:
+            return CHANGES_OVERWRITE, {}
+        start = time.perf_counter()
+        results = scan_worktree_changes(node_paths)
+        for r in results:
+            if r.error:
+                self.log(f"无法检查本地修改 {r.name}: {r.error}")
+        dirty = {r.path: r for r in results if r.has_changes}
+        self.log(f"本地修改检查: {len(node_paths)} 个仓库, {len(dirty)} 个有修改, "
+                 f"用时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        if not dirty:
+            return CHANGES_OVERWRITE, {}
+        answer = {}
+        done = threading.Event()
+
+        def ask():
+            try:
+                answer["choice"] = self.ask_local_changes(action, list(dirty.values()), choices)
+            finally:
+                done.set()
+
+        self.after(0, ask)
+        done.wait()
+        return answer.get("choice"), dirty
+
+    def ask_local_changes(self, action, changes, choices):
+        win = ttk.Toplevel(self)
+        win.title(f"{action}前发现本地修改")
+        win.geometry("800x450")
+        win.transient(self)
+        result = {"choice": None}
+
+        ttk.Label(win, text=f"{len(changes)} 个节点有本地修改或未跟踪文件，请选择本次{action}如何处理它们：",
+                  padding=5).pack(fill=X)
+        tree = ttk.Treeview(win, columns=("kind",), show="tree headings")
+        tree.heading("#0", text="节点 / 文件")
+        tree.heading("kind", text="类型")
+        tree.column("#0", width=600)
+        tree.column("kind", width=120)
+        for c in changes:
+            node = tree.insert("", END, text=c.name, open=len(changes) <= 5,
+                               values=(f"修改 {len(c.modified)} / 未跟踪 {len(c.untracked)}",))
+            for path in c.modified[:200]:
+                tree.insert(node, END, text=path, values=("已修改",))
+            for path in c.untracked[:200]:
+                tree.insert(node, END, text=path, values=("未跟踪",))
+
+        def choose(value):
+            result["choice"] = value
+            win.destroy()
+
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(side=BOTTOM, fill=X)
+        ttk.Button(toolbar, text="取消", command=win.destroy, bootstyle="secondary-outline").pack(side=RIGHT, padx=5)
+        styles = {CHANGES_STASH: "success", CHANGES_SKIP: "info", CHANGES_OVERWRITE: "danger"}
+        for value, label in reversed(choices):
+            ttk.Button(toolbar, text=label, command=lambda v=value: choose(v),
+                       bootstyle=styles.get(value, "primary")).pack(side=RIGHT, padx=5)
+        scrollbar = ttk.Scrollbar(win, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        win.grab_set()
+        self.wait_window(win)
+        return result["choice"]
 
     def start_update_selected_thread(self):
         threading.Thread(target=self.update_selected_logic, daemon=True).start()
@@ -923,11 +1477,25 @@ class App(ttk.Window):
         if not root:
             self.log("Custom nodes path not set.")
             return
+        git_paths = [os.path.join(root, self.manage_tree.item(i)['values'][1]) for i in items
+                     if self.manage_tree.item(i)['values'][2] == "Git"]
+        choice, dirty = self.preflight_local_changes(git_paths, "删除", (
+            (CHANGES_STASH, "备份修改后删除"), (CHANGES_SKIP, "跳过这些节点"), (CHANGES_OVERWRITE, "直接删除")))
+        if choice is None:
+            self.log("Delete cancelled.")
+            return
+        backup_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), CHANGES_BACKUP_DIR)
         for item_id in items:
             values = self.manage_tree.item(item_id)['values']
             name = values[1]
             node_path = os.path.join(root, name)
+            changes = dirty.get(node_path)
+            if changes and choice == CHANGES_SKIP:
+                self.log(f"跳过 {name}: 有本地修改。")
+                continue
             try:
+                if changes and choice == CHANGES_STASH:
+                    self.log(f"本地修改已备份到 {backup_changes(changes, backup_root)}")
                 self.log(f"Deleting {name}...")
                 self.manager.delete_node(node_path)
                 self.manager.remove_node_metadata(name)
@@ -935,6 +1503,7 @@ class App(ttk.Window):
                 self.log(f"Deleted {name}.")
             except Exception as e:
                 self.log(f"Failed to delete {name}: {e}")
+        self.refresh_migration_target()
 
     def update_selected_logic(self):
         checked = list(self.manage_checked)
@@ -945,7 +1514,16 @@ class App(ttk.Window):
             return
             
         proxy = self.get_proxy_url()
-        self.log(f"Starting update for {len(selected)} node(s)...")
+        git_paths = [os.path.join(self.custom_nodes_path_var.get(), self.manage_tree.item(i)['values'][1])
+                     for i in items if self.manage_tree.item(i)['values'][2] == "Git"]
+        choice, dirty = self.preflight_local_changes(git_paths, "更新", (
+            (CHANGES_STASH, "暂存修改，更新后恢复"), (CHANGES_SKIP, "跳过这些节点"), (CHANGES_OVERWRITE, "丢弃修改")))
+        if choice is None:
+            self.log("Update cancelled.")
+            return
+        self.take_snapshot(self.custom_nodes_path_var.get(), "更新前")
+        self.log(f"Starting update for {len(items)} node(s)...")
+        updated = []
         
         for item_id in items:
             values = self.manage_tree.item(item_id)['values']
@@ -953,26 +1531,50 @@ class App(ttk.Window):
             node_path = os.path.join(self.custom_nodes_path_var.get(), name)
             
             if values[2] == "Git":
+                changes = dirty.get(node_path)
+                if changes and choice == CHANGES_SKIP:
+                    self.log(f"Skipping {name}: 有本地修改。")
+                    continue
                 self.log(f"Updating {name}...")
+                stashed = False
                 try:
+                    if changes and choice == CHANGES_STASH:
+                        stashed = stash_changes(node_path, f"ComfyNode Sync update {time.strftime('%Y-%m-%d %H:%M:%S')}")
+                    elif changes and choice == CHANGES_OVERWRITE:
+                        discard_changes(node_path)
+                        self.log(f"  {name}: 已丢弃 {len(changes.modified)} 个本地修改")
                     summary = self.manager.pull_node(node_path, proxy=proxy if proxy else None)
+                    if stashed:
+                        error = pop_stash(node_path)
+                        stashed = False
+                        summary += ("\n本地修改已恢复" if error is None else
+                                    f"\n本地修改与更新冲突，仍保存在 git stash 中: {error}")
                     
                     # Get additional info
                     commit_info = self.manager.get_last_commit_info(node_path)
                     
                     # Update timestamp
                     timestamp = self.manager.update_node_timestamp(node_path)
+                    self.manage_index.update(name, updated=timestamp)
                     
                     new_status = "已更新"
-                    self.node_status_map[name] = new_status
+                    self.set_node_status(name, new_status)
                     self.manage_tree.set(item_id, column="status", value=new_status)
                     self.manage_tree.set(item_id, column="msg", value=f"最后更新: {timestamp}")
+                    self.commit_info_map[name] = self.manager.get_commit_info(node_path)
+                    self.update_commit_info_ui(name)
                     self.log(f"Updated {name}:\n{summary}\n\n[Current Version Info]\n{commit_info}\n" + "-"*40)
+                    updated.append(node_path)
                 except Exception as e:
                     self.log(f"Failed to update {name}: {e}")
                     self.manage_tree.set(item_id, column="msg", value="更新失败")
+                    if stashed:
+                        # The pull did not happen, put the changes back where they were
+                        error = pop_stash(node_path)
+                        self.log(f"  {name}: " + ("本地修改已恢复" if error is None else f"本地修改仍在 git stash 中: {error}"))
             else:
                 self.log(f"Skipping {name}: Not a git repository.")
+        self.precompile_nodes(updated)
 
     def start_install_reqs_thread(self):
         threading.Thread(target=self.install_reqs_logic, daemon=True).start()
@@ -988,13 +1590,24 @@ class App(ttk.Window):
             self.log("没有选择节点。")
             return
 
-        if not messagebox.askyesno("确认修复", f"将尝试重新安装选中的 {len(items)} 个节点。\n这将删除现有文件夹并重新克隆。\n是否继续？"):
+        if not messagebox.askyesno("确认修复", f"将尝试修复选中的 {len(items)} 个节点。\n"
+                                               f"先检查完整性并从本地对象还原，必要时补全缺失对象，最后才重新克隆。\n"
+                                               f"有本地修改的节点会先列出并询问处理方式。是否继续？"):
             return
 
         target_root = self.custom_nodes_path_var.get()
         proxy = self.get_proxy_url()
+        git_paths = [os.path.join(target_root, self.manage_tree.item(i)['values'][1]) for i in items
+                     if self.manage_tree.item(i)['values'][2] == "Git"]
+        choice, dirty = self.preflight_local_changes(git_paths, "修复", (
+            (CHANGES_STASH, "保存到 git stash"), (CHANGES_SKIP, "跳过这些节点"), (CHANGES_OVERWRITE, "丢弃修改")))
+        if choice is None:
+            return
+        repairer = NodeRepairer(self.manager, LOCAL_DISCARD if choice == CHANGES_OVERWRITE else LOCAL_STASH,
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), REPAIR_BACKUP_DIR))
 
         self.log(f"开始修复 {len(items)} 个节点...")
+        repaired = []
 
         for item_id in items:
             values = self.manage_tree.item(item_id)['values']
@@ -1004,27 +1617,34 @@ class App(ttk.Window):
             
             node_path = os.path.join(target_root, name)
 
-            if node_type != "Git" or not remote_url or remote_url == "-":
-                self.log(f"跳过 {name}: 不是 Git 仓库或无远程地址，无法自动修复。")
+            if node_type != "Git":
+                self.log(f"跳过 {name}: 不是 Git 仓库，无法自动修复。")
+                continue
+            if node_path in dirty and choice == CHANGES_SKIP:
+                self.log(f"跳过 {name}: 有本地修改。")
                 continue
 
-            self.log(f"正在修复 {name} (重新安装)...")
-            try:
-                # 1. Delete
-                self.log(f"  正在删除 {name}...")
-                self.manager.delete_node(node_path)
-                
-                # 2. Clone
-                self.log(f"  正在重新克隆 {name}...")
-                summary = self.manager.clone_node(remote_url, node_path, proxy=proxy if proxy else None)
-                
-                # 3. Update UI
+            self.log(f"正在修复 {name}...")
+            result = repairer.repair(node_path, remote_url, proxy=proxy if proxy else None, progress=self.log)
+            if result.ok:
+                self.manager.commit_cache.invalidate(node_path)
                 self.manage_tree.set(item_id, column="status", value="已修复")
-                self.manage_tree.set(item_id, column="msg", value="重新安装成功")
-                self.log(f"修复成功 {name}:\n{summary}\n" + "-"*40)
-            except Exception as e:
-                self.log(f"修复失败 {name}: {e}")
+                self.manage_tree.set(item_id, column="msg", value=result.tier)
+                extra = ""
+                if result.stash:
+                    extra += f"\n  本地修改已保存到 {result.stash} (git stash pop 可恢复)"
+                if result.backup_path:
+                    extra += f"\n  原目录已保留: {result.backup_path}"
+                self.log(f"修复成功 {name} ({result.tier}){extra}\n" + "-"*40)
+                repaired.append(node_path)
+            else:
                 self.manage_tree.set(item_id, column="msg", value="修复失败")
+                self.log(f"修复失败 {name}: {result.message}")
+                if result.backup_path:
+                    self.log(f"  原目录位于: {result.backup_path}")
+                for path in result.local_changes[:20]:
+                    self.log(f"  本地修改: {path}")
+        self.precompile_nodes(repaired)
     
     def install_reqs_logic(self):
         selected = self.manage_tree.selection()
@@ -1039,15 +1659,21 @@ class App(ttk.Window):
             return
 
         proxy = self.get_proxy_url()
+        self.apply_wheelhouse_settings()
 
         for item_id in selected:
             values = self.manage_tree.item(item_id)['values']
             name = values[0]
             node_path = os.path.join(self.custom_nodes_path_var.get(), name)
             
+            if not os.path.exists(os.path.join(node_path, "requirements.txt")):
+                self.manage_tree.set(item_id, column="msg", value="无 requirements.txt")
+                continue
             try:
-                self.manager.install_requirements(node_path, python_path, proxy=proxy if proxy else None)
-                self.manage_tree.set(item_id, column="msg", value="Deps Installed")
+                if self.manager.install_requirements(node_path, python_path, proxy=proxy if proxy else None):
+                    self.manage_tree.set(item_id, column="msg", value="Deps Installed")
+                else:
+                    self.manage_tree.set(item_id, column="msg", value="依赖已满足")
             except Exception as e:
                 self.manage_tree.set(item_id, column="msg", value="Deps Failed")
 
@@ -1078,6 +1704,7 @@ class App(ttk.Window):
             
             self.log(f"Installed {name} at {install_time}:\n{summary}\n" + "-"*40)
             self.new_node_url.set("") # Clear input
+            self.precompile_nodes([target_path])
             self.refresh_current_nodes() # Refresh list
             
             messagebox.showinfo("安装成功", f"节点 {name} 安装成功！\n时间: {install_time}")
@@ -1092,55 +1719,96 @@ class App(ttk.Window):
             return
             
         self.migration_nodes = []
+        self.migration_plan = {}
+        self.migration_source = None
         
         try:
             nodes = self.manager.scan_directory(path)
             self.migration_nodes = nodes
-            self.filter_migrate_list()
+            self.build_migration_plan()
             self.log(f"Scanned {len(nodes)} old nodes.")
         except Exception as e:
             self.log(f"Scan failed: {e}")
 
+    def build_migration_plan(self):
+        # Scan both environments once, filtering then works on the plan only
+        source = self.planner.build_index(self.old_nodes_path_var.get(), self.migration_nodes)
+        target = self.planner.build_index(self.custom_nodes_path_var.get())
+        with self.migration_lock:
+            self.migration_source = source
+            self.migration_plan = {item.node.name: item for item in self.planner.plan(source, target)}
+            self.migrate_index.clear()
+            for item in self.migration_plan.values():
+                self.index_migrate_item(item)
+        self.filter_migrate_list()
+
+    def refresh_migration_target(self, target_nodes=None):
+        """
+        Re-classify the plan against the target folder as it is now, e.g. after the ComfyUI
+        root changed or nodes were installed or deleted from the manage tab. Rows and their
+        checkboxes stay, only the statuses change. target_nodes skips the rescan.
+        """
+        with self.migration_lock:
+            if self.migration_source is None:
+                return
+            target = self.planner.build_index(self.custom_nodes_path_var.get(), target_nodes)
+            for item in self.planner.plan(self.migration_source, target):
+                self.migration_plan[item.node.name] = item
+                self.index_migrate_item(item)
+                if self.migrate_tree.exists(item.node.name):
+                    self.migrate_tree.set(item.node.name, column="target_status", value=item.display_status)
+
+    def start_migration_target_thread(self, target_nodes=None):
+        if self.migration_source is not None:
+            threading.Thread(target=self.refresh_migration_target, args=(target_nodes,), daemon=True).start()
+
+    def on_custom_nodes_path_changed(self, *args):
+        # Typing fires on every keystroke, rebuild once the path has settled
+        if self.migration_target_job:
+            self.after_cancel(self.migration_target_job)
+        self.migration_target_job = self.after(800, self.start_migration_target_thread)
+
+    def index_migrate_item(self, item):
+        self.migrate_index.set(
+            item.node.name,
+            name=item.node.name,
+            url=item.node.remote_url,
+            type="Git" if item.node.is_git_repo else "文件夹",
+            status=item.display_status,
+        )
+
+    def set_migrate_status(self, item_id, status):
+        item = self.migration_plan.get(item_id)
+        if item:
+            item.status = status
+            self.index_migrate_item(item)
+        self.migrate_tree.set(item_id, column="target_status", value=status)
+
     def filter_migrate_list(self):
         self.migrate_tree.delete(*self.migrate_tree.get_children())
         self.migrate_checked.clear()
-        current_target_root = self.custom_nodes_path_var.get()
         hide_existing = self.hide_existing_var.get()
-        filter_text = self.migrate_filter_var.get().lower()
         filter_status = self.migrate_filter_status_var.get()
+        matches = self.migrate_index.search(self.migrate_filter_var.get())
 
-        for node in self.migration_nodes:
-            if filter_text and filter_text not in node.name.lower():
+        for item in self.migration_plan.values():
+            node = item.node
+            if node.name not in matches:
                 continue
 
-            status = "未知"
-            is_existing = False
-            
-            if current_target_root:
-                if os.path.exists(os.path.join(current_target_root, node.name)):
-                    status = "已存在（跳过）"
-                    is_existing = True
-                else:
-                    status = "可迁移"
-            
-            # Existing logic
-            if hide_existing and is_existing:
+            status = item.display_status
+            if hide_existing and item.exists_in_target:
                 continue
                 
-            # New Status Filter
-            # Status can be "已存在（跳过）", "可迁移", "已迁移（Git）", "已跳过（非Git）", "已复制"
-            # Simplify mapping for user convenience? 
-            # Dropdown values: ["全部", "可迁移", "已存在", "已迁移"]
-            
+            # Dropdown values map onto status substrings, "已迁移" also covers copied nodes
             if filter_status != "全部":
-                if filter_status == "可迁移" and status != "可迁移":
-                    continue
-                elif filter_status == "已存在" and "已存在" not in status:
-                    continue
-                elif filter_status == "已迁移" and ("已迁移" not in status and "已复制" not in status):
+                if filter_status == "已迁移":
+                    if item.status not in (STATUS_MIGRATED_GIT, STATUS_COPIED):
+                        continue
+                elif filter_status not in status:
                     continue
 
-            self.migrate_tree.insert("", END, values=(
+            self.migrate_tree.insert("", END, iid=node.name, values=(
                 "☐",
                 node.name,
                 node.remote_url if node.remote_url else "Local Dir",
@@ -1177,18 +1845,19 @@ class App(ttk.Window):
             return
 
         items_to_process = checked if checked else (selected if selected else self.migrate_tree.get_children())
+        # Decide on the target as it is now, not as it was when the old folder was scanned
+        self.refresh_migration_target()
+        migrated = []
         
         for item_id in items_to_process:
             values = self.migrate_tree.item(item_id)['values']
             name = values[1]
-            status = values[3]
             
-            if "Exists" in status or "已存在" in status:
-                continue
-                
             # Find node object
-            node = next((n for n in self.migration_nodes if n.name == name), None)
-            if not node: continue
+            plan_item = self.migration_plan.get(name)
+            if not plan_item or plan_item.exists_in_target:
+                continue
+            node = plan_item.node
             
             target_path = os.path.join(target_root, name)
             
@@ -1196,13 +1865,15 @@ class App(ttk.Window):
                 self.log(f"Migrating {name} (Git Clone)...")
                 try:
                     summary = self.manager.clone_node(node.remote_url, target_path, proxy=proxy if proxy else None)
-                    self.migrate_tree.set(item_id, column="target_status", value="已迁移（Git）")
+                    self.set_migrate_status(item_id, STATUS_MIGRATED_GIT)
                     self.log(f"Migrated {name}:\n{summary}\n" + "-"*40)
+                    migrated.append(target_path)
                 except Exception as e:
                     self.log(f"Migration failed for {name}: {e}")
             else:
-                self.migrate_tree.set(item_id, column="target_status", value="已跳过（非Git）")
+                self.set_migrate_status(item_id, STATUS_SKIPPED_NON_GIT)
                 self.log(f"Skipping {name}: Non-Git or no remote. Migration only supports Git clone.")
+        self.precompile_nodes(migrated)
 
     def copy_selected_logic(self):
         checked = list(self.migrate_checked)
@@ -1219,13 +1890,15 @@ class App(ttk.Window):
         if not target_root or not source_root:
             self.log("目标或源路径未设置。")
             return
+        self.refresh_migration_target()
+        copied = []
 
         for item_id in items:
             values = self.migrate_tree.item(item_id)['values']
             name = values[1]
-            status = values[3]
+            plan_item = self.migration_plan.get(name)
             
-            if "已存在" in status or "已迁移" in status or "已复制" in status:
+            if plan_item is None or plan_item.exists_in_target:
                 self.log(f"跳过 {name}: 目标已存在。")
                 continue
                 
@@ -1239,14 +1912,17 @@ class App(ttk.Window):
             self.log(f"正在复制 {name} ...")
             try:
                 if os.path.isdir(source_path):
-                    shutil.copytree(source_path, target_path)
+                    self.manager.copy_node(source_path, target_path)
                 else:
                     shutil.copy2(source_path, target_path) # Should be dirs usually, but just in case
                     
-                self.migrate_tree.set(item_id, column="target_status", value="已复制")
+                self.set_migrate_status(item_id, STATUS_COPIED)
                 self.log(f"已复制 {name}")
+                if os.path.isdir(target_path):
+                    copied.append(target_path)
             except Exception as e:
                 self.log(f"复制失败 {name}: {e}")
+        self.precompile_nodes(copied)
 
     def delete_migrate_logic(self):
         checked = list(self.migrate_checked)
@@ -1271,10 +1947,10 @@ class App(ttk.Window):
                     self.log(f"Deleting {name} from target...")
                     self.manager.delete_node(target_path)
                     self.manager.remove_node_metadata(name)
-                    self.migrate_tree.set(item_id, column="target_status", value="可迁移")
+                    self.set_migrate_status(item_id, STATUS_MISSING)
                     self.log(f"Deleted {name}.")
                 else:
-                    self.migrate_tree.set(item_id, column="target_status", value="可迁移")
+                    self.set_migrate_status(item_id, STATUS_MISSING)
                     self.log(f"Target node {name} not found. Marked as 可迁移.")
             except Exception as e:
                 self.log(f"Failed to delete {name}: {e}")
@@ -1291,6 +1967,16 @@ class App(ttk.Window):
         target_frame.columnconfigure(1, weight=1)
         
         self.symlink_target_var.trace("w", self.on_target_root_change)
+        
+        # Link Options
+        opt_frame = ttk.Labelframe(self.tab_symlink, text="链接选项", padding=10)
+        opt_frame.pack(fill=X, padx=5, pady=5)
+        
+        ttk.Checkbutton(opt_frame, text="模型按子目录链接 (checkpoints、loras 等分别链接)", variable=self.link_merge_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(opt_frame, text="同时应用到多实例页的所有实例", variable=self.link_all_instances_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(opt_frame, text="仅预览计划", variable=self.link_dry_run_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Checkbutton(opt_frame, text="已有模型并入源目录", variable=self.link_keep_existing_var, bootstyle="round-toggle").pack(side=LEFT, padx=5)
+        ttk.Button(opt_frame, text="回滚合并...", command=self.start_merge_rollback_thread, bootstyle="secondary-outline").pack(side=RIGHT, padx=5)
 
         # Source (Shared Models)
         src_frame = ttk.Labelframe(self.tab_symlink, text="大模型共享 (Shared Models)", padding=10)
@@ -1323,6 +2009,22 @@ class App(ttk.Window):
         ttk.Button(wf_frame, text="创建工作流软链", command=self.start_workflow_symlink_thread, bootstyle="info").grid(row=0, column=3, rowspan=2, padx=5, sticky=NS)
         
         wf_frame.columnconfigure(1, weight=1)
+        
+        # Duplicate Models
+        dedup_frame = ttk.Labelframe(self.tab_symlink, text="重复模型清理", padding=10)
+        dedup_frame.pack(fill=X, padx=5, pady=5)
+        
+        ttk.Label(dedup_frame, text="在源模型、目标模型及所有实例的 models 中查找内容相同的文件").pack(side=LEFT, padx=5)
+        ttk.Button(dedup_frame, text="扫描重复", command=self.start_dedup_scan_thread, bootstyle="warning").pack(side=RIGHT, padx=5)
+        ttk.Combobox(dedup_frame, textvariable=self.dedup_mode_var, values=["硬链接", "软链接"], state="readonly", width=8).pack(side=RIGHT, padx=5)
+        ttk.Label(dedup_frame, text="替换为:").pack(side=RIGHT, padx=2)
+        
+        # Disk Usage
+        usage_frame = ttk.Labelframe(self.tab_symlink, text="磁盘占用", padding=10)
+        usage_frame.pack(fill=X, padx=5, pady=5)
+        
+        ttk.Label(usage_frame, text="按子目录统计源模型、目标模型及所有实例 models 的占用（链接的目录只计一次）").pack(side=LEFT, padx=5)
+        ttk.Button(usage_frame, text="统计占用", command=self.start_models_usage_thread, bootstyle="info-outline").pack(side=RIGHT, padx=5)
 
         # Tutorial / Info
         info_frame = ttk.Labelframe(self.tab_symlink, text="说明与教程", padding=10)
@@ -1334,7 +2036,10 @@ class App(ttk.Window):
 
 2. 工作流共享：将工作流文件夹链接到指定目标位置，方便统一管理。
    - 默认目标：[ComfyUI 实例路径]\\user\\default\\workflows
-   
+
+3. 按子目录链接：目标 models 保持为普通文件夹，源目录下的 checkpoints、loras 等子目录分别链接进去。
+
+Windows 下无软链权限时自动改用目录联接 (Junction)，无需管理员权限。
 注意：创建软链会移除目标位置原有的同名文件夹，请提前备份重要数据！
 """
         lbl = tk.Label(info_frame, text=info_text, justify=LEFT, anchor="nw", bg="#2b2b2b", fg="#cccccc", font=("Microsoft YaHei", 10))
@@ -1384,6 +2089,61 @@ class App(ttk.Window):
     def start_workflow_symlink_thread(self):
         threading.Thread(target=self.workflow_symlink_logic, daemon=True).start()
 
+    def get_link_targets(self, target, sub_path):
+        """
+        The configured target plus, in batch mode, the same sub path of every fleet instance.
+        """
+        targets = [target] if target else []
+        if self.link_all_instances_var.get():
+            for inst in self.fleet.instances.values():
+                comfy_dir = os.path.dirname(inst.custom_nodes_path)
+                targets.append(os.path.join(comfy_dir, *sub_path))
+        unique = []
+        for t in targets:
+            if not any(os.path.normcase(os.path.normpath(t)) == os.path.normcase(os.path.normpath(u)) for u in unique):
+                unique.append(t)
+        return unique
+
+    def get_link_protected_paths(self):
+        protect = [self.symlink_target_var.get()]
+        for inst in self.fleet.instances.values():
+            protect.extend([inst.root, os.path.dirname(inst.custom_nodes_path), inst.custom_nodes_path])
+        return [p for p in protect if p]
+
+    def run_link_plan(self, ops, label):
+        for op in ops:
+            detail = f" ({op.detail})" if op.detail else ""
+            self.log(f"[计划] {op.action}: {op.target} -> {op.source}{detail}")
+        
+        todo = [op for op in ops if op.action not in (ACTION_OK, ACTION_CONFLICT)]
+        conflicts = [op for op in ops if op.action == ACTION_CONFLICT]
+        self.log(f"{label}计划: {len(todo)} 项待执行, {len(ops) - len(todo) - len(conflicts)} 项已链接, {len(conflicts)} 项冲突")
+        if self.link_dry_run_var.get() or not todo:
+            return
+        
+        to_confirm = [op for op in todo if op.needs_confirm]
+        if to_confirm:
+            listing = "\n".join(op.target for op in to_confirm[:10])
+            if len(to_confirm) > 10:
+                listing += f"\n... 共 {len(to_confirm)} 个"
+            if not messagebox.askyesno("确认操作", f"以下文件夹非空，创建链接需要删除它们：\n{listing}\n\n确认删除吗？(建议先备份重要文件)"):
+                self.log("操作取消")
+                return
+        
+        def progress(result):
+            if result.ok:
+                self.log(f"已链接 ({result.message}): {result.op.target}")
+            else:
+                self.log(f"链接失败 {result.op.target}: {result.message}")
+        
+        results = apply_plan(todo, progress=progress)
+        failed = sum(1 for r in results if not r.ok)
+        self.log(f"{label}完成。成功: {len(results) - failed} 失败: {failed}")
+        if failed:
+            messagebox.showwarning("部分失败", f"{label}: {failed} 项失败，详情见日志。")
+        else:
+            messagebox.showinfo("成功", f"{label}创建成功！")
+
     def workflow_symlink_logic(self):
         source = self.workflow_source_var.get()
         target_workflows = self.workflow_target_var.get()
@@ -1392,148 +2152,1031 @@ class App(ttk.Window):
             self.log("错误: 源工作流路径无效")
             return
         
-        if not target_workflows:
+        targets = self.get_link_targets(target_workflows, ("user", "default", "workflows"))
+        if not targets:
             self.log("错误: 目标工作流路径无效")
             return
         
-        # Safety Check
-        comfy_root = self.symlink_target_var.get()
-        if comfy_root and os.path.normpath(target_workflows) == os.path.normpath(comfy_root):
-            self.log("错误: 目标路径不能是 ComfyUI 根目录！请指定到 workflows 子目录。")
-            messagebox.showerror("错误", "目标路径不能是 ComfyUI 根目录！\n请修改为例如: ...\\user\\default\\workflows")
+        ops = plan_batch(source, targets, merge=False, protect=self.get_link_protected_paths())
+        self.run_link_plan(ops, "工作流软链")
+
+    def symlink_logic(self):
+        source = self.symlink_source_var.get()
+        target_models = self.model_target_var.get()
+        
+        if not source or not os.path.exists(source):
+            self.log("错误: 源模型路径无效")
+            return
+        
+        targets = self.get_link_targets(target_models, ("models",))
+        if not targets:
+            self.log("错误: 目标模型路径无效")
             return
-            
-        # Target path: e.g. .../user/default/workflows
-        target_parent = os.path.dirname(target_workflows)
         
-        # Ensure parent dirs exist
-        if not os.path.exists(target_parent):
+        ops = plan_batch(source, targets, merge=self.link_merge_var.get(), protect=self.get_link_protected_paths())
+        if self.link_keep_existing_var.get():
+            # Non-empty model folders are merged into the source instead of deleted
+            merges = [op for op in ops if op.action == ACTION_REPLACE and op.needs_confirm]
+            ops = [op for op in ops if op not in merges]
+            if merges and not self.merge_existing_models(merges):
+                return
+        self.run_link_plan(ops, "模型软链")
+
+    def merge_existing_models(self, link_ops):
+        """
+        Move the files of existing model folders into the shared source, then link them.
+        Returns False if the user cancelled.
+        """
+        journal_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), MERGE_JOURNAL_DIR)
+        plans = []
+        for op in link_ops:
+            plan = plan_models_merge(op.target, op.source, journal_dir)
+            if plan.error:
+                self.log(f"[合并计划] 无法合并 {op.target}: {plan.error}")
+                continue
+            counts = {}
+            for m in plan.ops:
+                counts[m.action] = counts.get(m.action, 0) + 1
+            summary = ", ".join(f"{k} {v}" for k, v in counts.items()) or "无文件"
+            self.log(f"[合并计划] {plan.target} -> {plan.source}: {summary}, "
+                     f"移动 {self.format_size(plan.moved_bytes)}, 重复 {self.format_size(plan.duplicate_bytes)}")
+            for m in plan.ops:
+                if m.action != MERGE_MOVE:
+                    self.log(f"    {m.action}: {m.rel} -> {m.dest}")
+            plans.append(plan)
+        if self.link_dry_run_var.get() or not plans:
+            return True
+        
+        moved = sum(p.moved_bytes for p in plans)
+        if not messagebox.askyesno("确认合并", f"将 {len(plans)} 个已有模型目录中的文件移动到源目录（同盘重命名，不复制，共 {self.format_size(moved)}），"
+                                               f"然后替换为链接。\n回滚日志保存在 {journal_dir}。\n确认继续吗？"):
+            self.log("操作取消")
+            return False
+        
+        done = []
+        for plan in plans:
             try:
-                os.makedirs(target_parent)
+                execute_merge(plan)
+                done.append(plan)
+                self.log(f"已合并并链接: {plan.target} (日志: {plan.journal_path})")
             except Exception as e:
-                self.log(f"无法创建目录 {target_parent}: {e}")
-                return
+                self.log(f"合并失败 {plan.target}: {e}，可使用“回滚合并”恢复 (日志: {plan.journal_path})")
+        
+        duplicate = sum(p.duplicate_bytes for p in done)
+        if done and duplicate and messagebox.askyesno("清理重复文件", f"源目录中已有相同文件的副本共 {self.format_size(duplicate)}，"
+                                                                  f"暂存在 *.merged_* 文件夹中。\n是否删除以释放空间？"):
+            freed = sum(purge_holding(p.journal_path) for p in done)
+            self.log(f"已删除重复副本, 释放 {self.format_size(freed)}")
+        return True
+
+    def start_merge_rollback_thread(self):
+        journal_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), MERGE_JOURNAL_DIR)
+        path = filedialog.askopenfilename(initialdir=journal_dir, filetypes=[("Merge Journal", "*.jsonl")])
+        if path:
+            threading.Thread(target=self.merge_rollback_logic, args=(path,), daemon=True).start()
 
-        # Check if target exists
-        if os.path.exists(target_workflows):
-            if os.path.islink(target_workflows):
-                 self.log(f"提示: 目标 {target_workflows} 已经是一个软链接。")
-            else:
-                if os.path.isdir(target_workflows):
-                    confirm = messagebox.askyesno("确认操作", f"目标位置存在 workflows 文件夹：\n{target_workflows}\n\n创建软链需要删除此文件夹。\n确认删除吗？")
-                    if not confirm:
-                        self.log("操作取消")
-                        return
-                    try:
-                        shutil.rmtree(target_workflows)
-                    except Exception as e:
-                        self.log(f"删除失败: {e}")
-                        return
+    def merge_rollback_logic(self, journal_path):
+        try:
+            rollback_merge(journal_path, progress=self.log)
+            self.log(f"合并已回滚: {journal_path}")
+        except Exception as e:
+            self.log(f"回滚失败: {e}")
+
+    # --- Disk Usage ---
+    def start_models_usage_thread(self):
+        threading.Thread(target=self.models_usage_logic, daemon=True).start()
+
+    def models_usage_logic(self):
+        roots = self.get_model_roots()
+        if not roots:
+            self.log("没有可统计的模型目录。")
+            return
+        start = time.perf_counter()
+        results = []
+        for root in roots:
+            usages, total = self.disk_usage.measure_children(root)
+            results.append((root, usages, total))
+            self.log(f"{root}: {self.format_size(total)}")
+        self.log(f"占用统计完成, 用时 {time.perf_counter() - start:.2f}s")
+        self.after(0, self.show_models_usage, results)
+
+    def show_models_usage(self, results):
+        win = ttk.Toplevel(self)
+        win.title("模型目录占用")
+        win.geometry("900x600")
+        
+        columns = ("size", "files", "link")
+        tree = ttk.Treeview(win, columns=columns, show="tree headings")
+        tree.heading("#0", text="目录")
+        tree.column("#0", width=400)
+        for col, text, width in zip(columns, ("占用", "文件数", "链接到"), (120, 80, 300)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width)
+        
+        for root, usages, total in results:
+            parent = tree.insert("", END, text=root, values=(self.format_size(total), "", ""), open=True)
+            for usage in usages:
+                tree.insert(parent, END, text=os.path.basename(usage.path),
+                            values=(self.format_size(usage.total), usage.files, usage.link_target or ""))
+        
+        scrollbar = ttk.Scrollbar(win, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+    # --- Duplicate Models ---
+    def get_model_roots(self):
+        roots = [self.symlink_source_var.get(), self.model_target_var.get()]
+        for inst in self.fleet.instances.values():
+            roots.append(os.path.join(os.path.dirname(inst.custom_nodes_path), "models"))
+        return [r for r in roots if r and os.path.isdir(r)]
+
+    def start_dedup_scan_thread(self):
+        threading.Thread(target=self.dedup_scan_logic, daemon=True).start()
+
+    def dedup_scan_logic(self):
+        roots = self.get_model_roots()
+        if not roots:
+            self.log("没有可扫描的模型目录。")
+            return
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        scanner = DedupScanner(os.path.join(base_dir, HASH_CACHE_FILE))
+        self.log(f"开始扫描重复模型: {', '.join(roots)}")
+        start = time.perf_counter()
+        report = scanner.scan(roots, progress=lambda msg: self.log(f"[去重] {msg}"))
+        self.log(f"扫描完成: {report.files_scanned} 个文件 ({self.format_size(report.bytes_scanned)}), "
+                 f"{len(report.groups)} 组重复, 可回收 {self.format_size(report.reclaimable)}, "
+                 f"完整哈希读取 {self.format_size(report.bytes_hashed)}, 缓存命中 {report.cache_hits}, "
+                 f"用时 {time.perf_counter() - start:.1f}s")
+        if report.groups:
+            self.after(0, self.show_dedup_report, report)
+
+    def show_dedup_report(self, report):
+        win = ttk.Toplevel(self)
+        win.title("重复模型")
+        win.geometry("1000x600")
+        
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        summary = f"{len(report.groups)} 组重复 · 可回收 {self.format_size(report.reclaimable)}"
+        ttk.Label(toolbar, text=summary).pack(side=LEFT, padx=5)
+        
+        columns = ("size", "count", "reclaimable", "paths")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("文件大小", "份数", "可回收", "路径"), (100, 60, 100, 700)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width)
+        for group in report.groups:
+            tree.insert("", END, values=(self.format_size(group.size), len(group.files),
+                                         self.format_size(group.reclaimable), " | ".join(f.path for f in group.files)))
+        
+        ttk.Button(toolbar, text=f"全部替换为{self.dedup_mode_var.get()}",
+                   command=lambda: threading.Thread(target=self.dedup_replace_logic, args=(report,), daemon=True).start(),
+                   bootstyle="danger").pack(side=RIGHT, padx=5)
+        scrollbar = ttk.Scrollbar(win, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+    def dedup_replace_logic(self, report):
+        mode = MODE_HARDLINK if self.dedup_mode_var.get() == "硬链接" else MODE_SYMLINK
+        if not messagebox.askyesno("确认操作", f"将 {len(report.groups)} 组重复文件替换为{self.dedup_mode_var.get()}，"
+                                               f"每组保留一份（优先保留源模型目录中的文件）。\n确认继续吗？"):
+            return
+        ok = failed = 0
+        reclaimed = 0
+        for group in report.groups:
+            for path, success, msg in replace_duplicates(group, mode, prefer_roots=[self.symlink_source_var.get()]):
+                if success:
+                    ok += 1
+                    reclaimed += group.size
                 else:
-                    self.log(f"错误: 目标位置存在同名文件: {target_workflows}")
-                    return
+                    failed += 1
+                    self.log(f"替换失败 {path}: {msg}")
+        if ok:
+            # The kept files gained links without their folders' mtimes changing, cached sizes are stale
+            self.disk_usage.clear()
+        self.log(f"重复文件替换完成。成功: {ok} 失败: {failed}, 回收 {self.format_size(reclaimed)}")
+
+    # --- Import Profiling ---
+    def format_profile(self, result):
+        if result is None:
+            return "-", "-"
+        if not result.ok:
+            return "失败", self.format_size(result.rss_delta)
+        return f"{result.wall:.2f}s", self.format_size(result.rss_delta)
+
+    def update_profile_ui(self, node_name):
+        item_id = self.find_manage_item(node_name)
+        if item_id:
+            import_time, memory = self.format_profile(self.profile_map.get(node_name))
+            self.manage_tree.set(item_id, column="import_time", value=import_time)
+            self.manage_tree.set(item_id, column="memory", value=memory)
+
+    def start_maintenance_thread(self):
+        threading.Thread(target=self.maintenance_logic, daemon=True).start()
+
+    def maintenance_targets(self):
+        checked = [self.manage_tree.set(i, "name") for i in self.manage_checked]
+        by_name = {n.name: n for n in self.current_nodes if n and n.is_git_repo}
+        return [by_name[name].path for name in checked if name in by_name] or [n.path for n in by_name.values()]
+
+    def maintenance_logic(self, node_paths=None, idle=False):
+        if self.maintenance_running:
+            if not idle:
+                self.log("Git 仓库维护已在进行中。")
+            return
+        node_paths = self.maintenance_targets() if node_paths is None else node_paths
+        if not node_paths:
+            if not idle:
+                self.log("没有可维护的 Git 节点。")
+            return
+        self.maintenance_running = True
+        try:
+            # Long-lived cat-file processes keep packs open, which blocks gc from deleting them on Windows
+            self.manager.commit_cache.close()
+            # Idle runs use fewer workers so the machine stays responsive
+            workers = 2 if idle else None
+            if not idle:
+                self.log(f"正在并行维护 {len(node_paths)} 个 Git 仓库 (打包松散对象、合并 pack、写入 commit-graph)...")
+            start = time.perf_counter()
+
+            def progress(result):
+                if result.steps or not result.ok:
+                    # print, not log: idle runs must not count as user activity
+                    print(f"{'维护' if result.ok else '维护失败'} {result.name}: {result.describe()}")
+
+            results = self.maintainer.maintain_many(node_paths, max_workers=workers, progress=progress)
+            maintained = [r for r in results if r.ok and r.steps]
+            failed = sum(1 for r in results if not r.ok)
+            reclaimed = sum(r.reclaimed for r in maintained)
+            print(f"{'空闲' if idle else ''}Git 仓库维护完成: 维护 {len(maintained)} 个, "
+                  f"无需维护 {len(results) - len(maintained) - failed} 个, 失败 {failed} 个, "
+                  f"共回收 {reclaimed / 1024 ** 2:.1f} MB, 用时 {time.perf_counter() - start:.1f}s")
+        finally:
+            self.maintenance_running = False
 
-        # Create Symlink
-        cmd = f'mklink /D "{target_workflows}" "{source}"'
-        self.log(f"执行命令: {cmd}")
+    def check_idle_maintenance(self):
+        try:
+            if (self.idle_maintenance_var.get() and not self.maintenance_running
+                    and time.time() - self.last_activity >= IDLE_SECONDS):
+                git_paths = [n.path for n in self.current_nodes if n and n.is_git_repo]
+                due = self.maintainer.due(git_paths, MAINTENANCE_INTERVAL)
+                if due:
+                    threading.Thread(target=self.maintenance_logic, args=(due, True), daemon=True).start()
+        finally:
+            self.after(60 * 1000, self.check_idle_maintenance)
+
+    def start_profile_thread(self):
+        threading.Thread(target=self.profile_logic, daemon=True).start()
+
+    def profile_logic(self):
+        python_path = self.python_path_var.get()
+        if not python_path or not os.path.exists(python_path):
+            self.log("请先设置 ComfyUI 的 Python 解释器。")
+            return
+        checked = [self.manage_tree.set(i, "name") for i in self.manage_checked]
+        by_name = {n.name: n for n in self.current_nodes if n}
+        nodes = [by_name[name] for name in checked if name in by_name] or list(by_name.values())
+        nodes = [n for n in nodes if os.path.exists(os.path.join(n.path, "__init__.py"))]
+        if not nodes:
+            self.log("没有可分析的节点。")
+            return
         
+        targets = [(n.path, profile_key(n.path, self.manager.get_head_sha(n.path))) for n in nodes]
+        self.log(f"正在分析 {len(targets)} 个节点的加载耗时 (并行 {self.profiler.max_workers} 个进程，未变化的节点使用缓存)...")
+        start = time.perf_counter()
+        reused = 0
+        
+        def progress(result, from_cache):
+            nonlocal reused
+            reused += from_cache
+            self.profile_map[result.name] = result
+            self.after(0, self.update_profile_ui, result.name)
+            if not from_cache and not result.ok:
+                error_lines = (result.error or "").strip().splitlines()
+                self.log(f"  {result.name} 加载失败: {error_lines[-1] if error_lines else '未知错误'}")
+        
+        # The folder holding folder_paths.py and nodes.py, not the portable root above it
+        comfy_dir = os.path.dirname(os.path.normpath(self.custom_nodes_path_var.get()))
+        results = self.profiler.profile_many(targets, python_path, comfy_dir, progress=progress)
+        self.log(f"加载耗时分析完成: {len(results)} 个节点，{reused} 个来自缓存，用时 {time.perf_counter() - start:.1f}s")
+        slowest = sorted(results.values(), key=lambda r: r.wall, reverse=True)[:10]
+        for result in slowest:
+            heavy = ", ".join(f"{pkg} {sec:.2f}s" for pkg, sec in result.top_imports[:3]) or "-"
+            self.log(f"  {result.name}: {result.wall:.2f}s, 内存 +{self.format_size(result.rss_delta)}，主要导入: {heavy}")
+
+    # --- Node Registry ---
+    def choose_registry_files(self):
+        files = filedialog.askopenfilenames(title="选择节点注册表 (如 custom-node-list.json)",
+                                            filetypes=[("JSON", "*.json"), ("All Files", "*.*")])
+        if files:
+            self.registry_files = list(files)
+            self.registry = None
+            self.save_config()
+        return bool(files)
+
+    def start_registry_match_thread(self):
+        if not self.registry_files and not self.choose_registry_files():
+            return
+        threading.Thread(target=self.registry_match_logic, daemon=True).start()
+
+    def registry_match_logic(self):
+        folder_nodes = [n.name for n in self.current_nodes if n and not n.is_git_repo]
+        if not folder_nodes:
+            self.log("没有未设置 Git 地址的文件夹节点。")
+            return
+        start = time.perf_counter()
         try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                self.log("工作流软链创建成功！")
-                messagebox.showinfo("成功", "工作流软链创建成功！")
+            cache_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), REGISTRY_CACHE_FILE)
+            if self.registry is None:
+                self.registry = NodeRegistry.load([f for f in self.registry_files if os.path.exists(f)], cache_file)
+        except Exception as e:
+            self.log(f"加载注册表失败: {e}")
+            return
+        loaded = time.perf_counter()
+        suggestions = self.registry.suggest(folder_nodes)
+        self.log(f"注册表 {len(self.registry)} 个条目 (加载 {loaded - start:.3f}s)，"
+                 f"{len(folder_nodes)} 个文件夹节点中 {len(suggestions)} 个找到匹配 "
+                 f"(匹配 {time.perf_counter() - loaded:.3f}s)")
+        self.after(0, lambda: self.show_registry_matches(suggestions))
+
+    def show_registry_matches(self, suggestions):
+        win = ttk.Toplevel(self)
+        win.title("匹配 Git 地址")
+        win.geometry("1000x500")
+        
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        ttk.Label(toolbar, text=f"{len(suggestions)} 个建议 · 点击“选择”列切换").pack(side=LEFT, padx=5)
+        
+        columns = ("select", "name", "url", "score", "how", "title")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("选择", "节点名称", "Git 地址", "相似度", "匹配方式", "注册表名称"),
+                                    (60, 220, 380, 70, 80, 200)):
+            tree.heading(col, text=text)
+            tree.column(col, width=width)
+        checked = set()
+        for name, match in sorted(suggestions.items(), key=lambda kv: -kv[1].score):
+            # Exact name matches are selected by default, fuzzy ones need a look first
+            exact = match.score >= 1.0
+            iid = tree.insert("", END, values=("☑" if exact else "☐", name, match.entry.url,
+                                               f"{match.score:.0%}", match.how, match.entry.title))
+            if exact:
+                checked.add(iid)
+        
+        def on_click(event):
+            iid = tree.identify_row(event.y)
+            if not iid or tree.identify_column(event.x) != '#1':
+                return
+            if iid in checked:
+                checked.discard(iid)
+                tree.set(iid, 'select', '☐')
             else:
-                self.log(f"创建失败 (Exit Code {result.returncode}):\n{result.stderr}\n{result.stdout}")
-                if "privilege" in result.stderr.lower() or "权限" in result.stderr:
-                    if messagebox.askyesno("权限不足", "需要管理员权限。是否尝试以管理员身份执行？"):
-                         self.run_as_admin(cmd)
+                checked.add(iid)
+                tree.set(iid, 'select', '☑')
+        
+        def apply():
+            for iid in checked:
+                name, url = tree.set(iid, 'name'), tree.set(iid, 'url')
+                self.manager.set_node_git_url(name, url)
+                self.log(f"Git 地址已设置: {name} -> {url}")
+            self.log(f"已为 {len(checked)} 个节点设置 Git 地址。")
+            win.destroy()
+            self.refresh_current_nodes()
+        
+        def change_registry():
+            if self.choose_registry_files():
+                win.destroy()
+                self.start_registry_match_thread()
+        
+        ttk.Button(toolbar, text="应用选中", command=apply, bootstyle="success").pack(side=RIGHT, padx=5)
+        ttk.Button(toolbar, text="更换注册表", command=change_registry, bootstyle="secondary-outline").pack(side=RIGHT, padx=5)
+        tree.bind('<Button-1>', on_click)
+        scrollbar = ttk.Scrollbar(win, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=RIGHT, fill=Y)
+
+    # --- Version Snapshots ---
+    def take_snapshot(self, root, name, auto=True):
+        urls = {n.name: n.remote_url for n in self.current_nodes if n and n.remote_url}
+        try:
+            snapshot = self.snapshots.create(root, name, auto=auto, urls=urls)
         except Exception as e:
-            self.log(f"执行出错: {e}")
+            self.log(f"无法创建版本快照: {e}")
+            return None
+        self.log(f"已创建版本快照 “{snapshot.name}” ({len(snapshot.nodes)} 个 Git 节点)")
+        if self.snapshot_window:
+            self.after(0, self.refresh_snapshot_panel)
+        return snapshot
+
+    def show_snapshot_panel(self):
+        if self.snapshot_window and self.snapshot_window.winfo_exists():
+            self.snapshot_window.lift()
+            self.refresh_snapshot_panel()
+            return
+        
+        win = ttk.Toplevel(self)
+        win.title("版本快照")
+        win.geometry("960x600")
+        self.snapshot_window = win
+        
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        ttk.Button(toolbar, text="创建快照", command=self.create_named_snapshot, bootstyle="success").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="回滚到选中快照", command=self.start_rollback_thread, bootstyle="warning").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="删除快照", command=self.delete_selected_snapshot, bootstyle="danger-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="刷新", command=self.refresh_snapshot_panel, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        
+        panes = ttk.Panedwindow(win, orient=VERTICAL)
+        panes.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        columns = ("name", "created", "nodes", "changed")
+        self.snapshot_tree = ttk.Treeview(panes, columns=columns, show="headings", selectmode="browse", height=8)
+        for col, text, width in zip(columns, ("名称", "时间", "节点数", "与当前不同"), (360, 180, 80, 100)):
+            self.snapshot_tree.heading(col, text=text)
+            self.snapshot_tree.column(col, width=width)
+        self.snapshot_tree.bind("<<TreeviewSelect>>", lambda e: self.show_snapshot_diff())
+        panes.add(self.snapshot_tree, weight=1)
+        
+        columns = ("name", "kind", "old", "new")
+        self.snapshot_diff_tree = ttk.Treeview(panes, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("节点名称", "对比", "快照中的提交", "当前提交"), (300, 100, 160, 160)):
+            self.snapshot_diff_tree.heading(col, text=text)
+            self.snapshot_diff_tree.column(col, width=width)
+        panes.add(self.snapshot_diff_tree, weight=2)
+        self.refresh_snapshot_panel()
+
+    def refresh_snapshot_panel(self):
+        if not self.snapshot_window or not self.snapshot_window.winfo_exists():
+            return
+        selected = self.snapshot_tree.selection()
+        self.snapshot_tree.delete(*self.snapshot_tree.get_children())
+        for snapshot in self.snapshots.snapshots(self.custom_nodes_path_var.get()):
+            changed = sum(1 for d in self.snapshots.diff(snapshot) if d.kind != DIFF_SAME)
+            self.snapshot_tree.insert("", END, iid=snapshot.id, values=(
+                snapshot.name + (" (自动)" if snapshot.auto else ""), snapshot.formatted_date,
+                len(snapshot.nodes), changed))
+        if selected and self.snapshot_tree.exists(selected[0]):
+            self.snapshot_tree.selection_set(selected[0])
+        self.show_snapshot_diff()
+
+    def show_snapshot_diff(self):
+        self.snapshot_diff_tree.delete(*self.snapshot_diff_tree.get_children())
+        selected = self.snapshot_tree.selection()
+        if not selected:
+            return
+        try:
+            snapshot = self.snapshots.load(selected[0])
+        except Exception as e:
+            self.log(f"无法读取快照: {e}")
+            return
+        # Differences first, unchanged nodes after them
+        diffs = sorted(self.snapshots.diff(snapshot), key=lambda d: d.kind == DIFF_SAME)
+        for d in diffs:
+            self.snapshot_diff_tree.insert("", END, values=(d.name, d.kind, (d.old_sha or "-")[:10],
+                                                           (d.new_sha or "-")[:10]))
 
-    def symlink_logic(self):
-        source = self.symlink_source_var.get()
-        target_models = self.model_target_var.get()
+    def create_named_snapshot(self):
+        root = self.custom_nodes_path_var.get()
+        if not root or not os.path.isdir(root):
+            self.log("Custom nodes path not set.")
+            return
+        name = simpledialog.askstring("创建快照", "快照名称:", initialvalue=time.strftime("快照 %Y-%m-%d %H:%M"),
+                                      parent=self.snapshot_window)
+        if name:
+            self.take_snapshot(root, name.strip(), auto=False)
+
+    def delete_selected_snapshot(self):
+        selected = self.snapshot_tree.selection()
+        if not selected:
+            return
+        if messagebox.askyesno("删除快照", "确认删除选中的快照？", parent=self.snapshot_window):
+            self.snapshots.delete(selected[0])
+            self.refresh_snapshot_panel()
+
+    def start_rollback_thread(self):
+        selected = self.snapshot_tree.selection()
+        if not selected:
+            self.log("请先选择一个快照。")
+            return
+        snapshot = self.snapshots.load(selected[0])
+        changed = sum(1 for d in self.snapshots.diff(snapshot) if d.kind == DIFF_CHANGED)
+        if not changed:
+            messagebox.showinfo("版本快照", "所有节点都与该快照一致，无需回滚。", parent=self.snapshot_window)
+            return
+        if not messagebox.askyesno("回滚", f"将把 {changed} 个节点切换回快照 “{snapshot.name}” 中的提交。\n"
+                                           f"只使用本地已有的提交，不联网；回滚前会自动保存当前状态。是否继续？",
+                                   parent=self.snapshot_window):
+            return
+        threading.Thread(target=self.rollback_logic, args=(snapshot,), daemon=True).start()
+
+    def rollback_logic(self, snapshot):
+        self.take_snapshot(snapshot.root, "回滚前")
+        self.log(f"正在并行回滚到快照 “{snapshot.name}” ...")
+        start = time.perf_counter()
+        
+        def progress(result):
+            self.log(f"{'已回滚' if result.ok else '回滚失败'} {result.name}: {result.message}")
+        
+        results = self.snapshots.rollback(snapshot, progress=progress)
+        failed = sum(1 for r in results if not r.ok)
+        self.log(f"回滚完成: 成功 {len(results) - failed} 个, 失败 {failed} 个, 用时 {time.perf_counter() - start:.1f}s")
+        for r in results:
+            self.manager.commit_cache.invalidate(os.path.join(snapshot.root, r.name))
+        if os.path.normpath(snapshot.root) == os.path.normpath(self.custom_nodes_path_var.get()):
+            self.precompile_nodes([os.path.join(snapshot.root, r.name) for r in results if r.ok])
+            self.after(0, self.refresh_current_nodes)
+        self.after(0, self.refresh_snapshot_panel)
+
+    # --- Requirements Analysis ---
+    def start_analyze_reqs_thread(self):
+        threading.Thread(target=self.analyze_reqs_logic, daemon=True).start()
+
+    def analyze_reqs_logic(self):
+        if not self.current_nodes:
+            self.log("当前没有加载任何节点，请先刷新列表。")
+            return
         
-        if not source or not os.path.exists(source):
-            self.log("错误: 源模型路径无效")
+        probe = None
+        python_path = self.python_path_var.get()
+        if python_path and os.path.exists(python_path):
+            try:
+                probe = self.manager.package_snapshots.get(python_path)
+            except Exception as e:
+                self.log(f"读取 Python 环境失败，将只分析版本约束: {e}")
+        else:
+            self.log("未设置 Python 解释器，将只分析版本约束。")
+        
+        start = time.perf_counter()
+        result = RequirementsAnalyzer().analyze([n.path for n in self.current_nodes], probe)
+        elapsed = time.perf_counter() - start
+        self.log(f"依赖分析完成: {result.node_count} 个节点, {len(result.packages)} 个包, "
+                 f"{len(result.problems)} 个问题, 用时 {elapsed:.3f}s")
+        for entry in result.errors:
+            self.log(f"  无法解析 {entry.node}: {entry.raw or entry.source} ({entry.error})")
+        self.after(0, self.show_reqs_report, result)
+
+    def show_reqs_report(self, result):
+        win = ttk.Toplevel(self)
+        win.title("依赖分析")
+        win.geometry("1000x600")
+        
+        only_problems_var = tk.BooleanVar(value=True)
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        summary = f"{result.node_count} 个节点 · {len(result.packages)} 个包 · {len(result.problems)} 个问题"
+        ttk.Label(toolbar, text=summary).pack(side=LEFT, padx=5)
+        
+        columns = ("package", "status", "installed", "requirements")
+        tree = ttk.Treeview(win, columns=columns, show="headings")
+        for col, text, width in zip(columns, ("包名", "状态", "已安装版本", "节点要求"), (200, 80, 120, 600)):
+            tree.heading(col, text=text, command=lambda c=col: self.sort_treeview(tree, c, False))
+            tree.column(col, width=width)
+        tree.tag_configure('problem', foreground='#f0ad4e')
+        
+        def fill():
+            tree.delete(*tree.get_children())
+            for report in sorted(result.packages.values(), key=lambda r: (r.status == "正常", r.name)):
+                if only_problems_var.get() and report.status == "正常":
+                    continue
+                reqs = "; ".join([f"{e.node}: {e.url or e.specifier or '任意版本'}" for e in report.entries]
+                                 + [f"{e.node} (约束): {e.specifier}" for e in report.constraints if e.specifier])
+                tree.insert("", END, values=(report.name, report.status, report.installed or "-", reqs),
+                            tags=('problem',) if report.status != "正常" else ())
+        
+        ttk.Checkbutton(toolbar, text="只显示问题", variable=only_problems_var, command=fill).pack(side=LEFT, padx=10)
+        scrollbar = ttk.Scrollbar(win, orient=VERTICAL, command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        tree.pack(side=LEFT, fill=BOTH, expand=True, padx=5, pady=5)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        fill()
+
+    # --- Perf Panel ---
+    def show_perf_panel(self):
+        if self.perf_window and self.perf_window.winfo_exists():
+            self.perf_window.lift()
             return
         
-        if not target_models:
-            self.log("错误: 目标模型路径无效")
+        win = ttk.Toplevel(self)
+        win.title("性能统计")
+        win.geometry("900x560")
+        self.perf_window = win
+        
+        toolbar = ttk.Frame(win, padding=5)
+        toolbar.pack(fill=X)
+        ttk.Button(toolbar, text="刷新", command=self.refresh_perf_panel, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="导出 JSON", command=lambda: self.export_metrics("json"), bootstyle="primary").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="导出 Prometheus", command=lambda: self.export_metrics("prom"), bootstyle="primary").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="清空", command=self.reset_metrics, bootstyle="danger-outline").pack(side=LEFT, padx=5)
+        
+        columns = ("phase", "count", "errors", "p50", "p90", "p99", "max", "total")
+        headings = ("阶段", "次数", "失败", "P50 (s)", "P90 (s)", "P99 (s)", "最大 (s)", "累计 (s)")
+        self.perf_tree = ttk.Treeview(win, columns=columns, show="headings", height=8)
+        for col, text in zip(columns, headings):
+            self.perf_tree.heading(col, text=text)
+            self.perf_tree.column(col, width=90, anchor=E if col != "phase" else W)
+        self.perf_tree.pack(fill=X, padx=5, pady=5)
+        
+        recent_frame = ttk.Labelframe(win, text="最近操作", padding=5)
+        recent_frame.pack(fill=BOTH, expand=True, padx=5, pady=5)
+        columns = ("time", "phase", "node", "duration", "ok")
+        headings = ("时间", "阶段", "节点", "耗时 (s)", "结果")
+        self.perf_recent_tree = ttk.Treeview(recent_frame, columns=columns, show="headings")
+        for col, text in zip(columns, headings):
+            self.perf_recent_tree.heading(col, text=text, command=lambda c=col: self.sort_treeview(self.perf_recent_tree, c, False))
+            self.perf_recent_tree.column(col, width=120)
+        self.perf_recent_tree.column("node", width=300)
+        scrollbar = ttk.Scrollbar(recent_frame, orient=VERTICAL, command=self.perf_recent_tree.yview)
+        self.perf_recent_tree.configure(yscroll=scrollbar.set)
+        self.perf_recent_tree.pack(side=LEFT, fill=BOTH, expand=True)
+        scrollbar.pack(side=RIGHT, fill=Y)
+        
+        self.auto_refresh_perf_panel()
+
+    def refresh_perf_panel(self):
+        if not self.perf_window or not self.perf_window.winfo_exists():
             return
+        self.perf_tree.delete(*self.perf_tree.get_children())
+        for phase, entry in sorted(REGISTRY.summary().items()):
+            self.perf_tree.insert("", END, values=(
+                phase, entry["count"], entry["errors"],
+                f"{entry['p50']:.3f}", f"{entry['p90']:.3f}", f"{entry['p99']:.3f}",
+                f"{entry['max']:.3f}", f"{entry['total']:.3f}"
+            ))
+        
+        self.perf_recent_tree.delete(*self.perf_recent_tree.get_children())
+        for sp in reversed(REGISTRY.recent_spans()):
+            started = datetime.datetime.fromtimestamp(sp.started_at).strftime("%H:%M:%S")
+            self.perf_recent_tree.insert("", END, values=(
+                started, sp.phase, sp.node or "-", f"{sp.duration:.3f}", "成功" if sp.ok else "失败"
+            ))
+
+    def auto_refresh_perf_panel(self):
+        # Keep the panel live while it is open
+        if self.perf_window and self.perf_window.winfo_exists():
+            self.refresh_perf_panel()
+            self.perf_window.after(2000, self.auto_refresh_perf_panel)
+
+    def export_metrics(self, fmt):
+        if fmt == "json":
+            file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON Files", "*.json")])
+        else:
+            file_path = filedialog.asksaveasfilename(defaultextension=".prom", filetypes=[("Prometheus Text", "*.prom"), ("All Files", "*.*")])
+        if not file_path:
+            return
+        try:
+            content = REGISTRY.to_json() if fmt == "json" else REGISTRY.to_prometheus()
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.log(f"性能报告已导出: {file_path}")
+        except Exception as e:
+            self.log(f"导出失败: {e}")
+
+    def reset_metrics(self):
+        REGISTRY.reset()
+        self.refresh_perf_panel()
+
+    # --- Fleet Tab Logic ---
+    def setup_fleet_tab(self):
+        # Instance Registration
+        inst_frame = ttk.Labelframe(self.tab_fleet, text="ComfyUI 实例", padding=10)
+        inst_frame.pack(fill=X, padx=5, pady=5)
+        
+        ttk.Label(inst_frame, text="实例根目录:").grid(row=0, column=0, sticky=W, padx=5)
+        ttk.Entry(inst_frame, textvariable=self.fleet_root_var).grid(row=0, column=1, sticky=EW, padx=5)
+        ttk.Button(inst_frame, text="浏览", command=self.browse_fleet_root, bootstyle="outline").grid(row=0, column=2, padx=5)
+        ttk.Button(inst_frame, text="添加实例", command=self.add_fleet_instance, bootstyle="success").grid(row=0, column=3, padx=5)
+        ttk.Button(inst_frame, text="移除选中实例", command=self.remove_fleet_instance, bootstyle="danger-outline").grid(row=0, column=4, padx=5)
+        
+        self.fleet_inst_tree = ttk.Treeview(inst_frame, columns=("name", "custom_nodes", "python"), show="headings", height=4)
+        self.fleet_inst_tree.heading("name", text="实例")
+        self.fleet_inst_tree.heading("custom_nodes", text="custom_nodes 路径")
+        self.fleet_inst_tree.heading("python", text="Python")
+        self.fleet_inst_tree.column("name", width=150)
+        self.fleet_inst_tree.column("custom_nodes", width=350)
+        self.fleet_inst_tree.column("python", width=250)
+        self.fleet_inst_tree.grid(row=1, column=0, columnspan=5, sticky=EW, pady=5)
+        inst_frame.columnconfigure(1, weight=1)
+        
+        # Shared Wheelhouse
+        wheel_frame = ttk.Labelframe(self.tab_fleet, text="共享 Wheel 仓库", padding=10)
+        wheel_frame.pack(fill=X, padx=5, pady=5)
+        
+        ttk.Checkbutton(wheel_frame, text="安装依赖时使用", variable=self.use_wheelhouse_var,
+                        command=self.apply_wheelhouse_settings, bootstyle="round-toggle").grid(row=0, column=0, sticky=W, padx=5)
+        ttk.Entry(wheel_frame, textvariable=self.wheelhouse_dir_var).grid(row=0, column=1, sticky=EW, padx=5)
+        ttk.Button(wheel_frame, text="浏览", command=self.browse_wheelhouse_dir, bootstyle="outline").grid(row=0, column=2, padx=5)
+        ttk.Label(wheel_frame, text="上限 (GB):").grid(row=0, column=3, padx=5)
+        ttk.Entry(wheel_frame, textvariable=self.wheelhouse_max_gb_var, width=6).grid(row=0, column=4, padx=5)
+        ttk.Button(wheel_frame, text="预取全部依赖", command=self.start_prefetch_wheels_thread, bootstyle="info").grid(row=0, column=5, padx=5)
+        self.wheelhouse_size_label = ttk.Label(wheel_frame, text="")
+        self.wheelhouse_size_label.grid(row=0, column=6, padx=5)
+        wheel_frame.columnconfigure(1, weight=1)
+        
+        # Toolbar
+        toolbar = ttk.Frame(self.tab_fleet)
+        toolbar.pack(fill=X, pady=5)
+        
+        ttk.Button(toolbar, text="扫描全部", command=self.start_fleet_scan_thread, bootstyle="info-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="检查更新", command=self.start_fleet_check_thread, bootstyle="primary").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="更新选中", command=self.start_fleet_update_thread, bootstyle="success").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="安装依赖", command=self.start_fleet_install_reqs_thread, bootstyle="warning").pack(side=LEFT, padx=5)
+        
+        ttk.Separator(toolbar, orient=VERTICAL).pack(side=LEFT, padx=10, fill=Y)
+        
+        ttk.Label(toolbar, text="名称:").pack(side=LEFT, padx=2)
+        ttk.Entry(toolbar, textvariable=self.fleet_filter_var, width=15).pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="全选", command=self.select_all_fleet, bootstyle="secondary-outline").pack(side=LEFT, padx=5)
+        ttk.Button(toolbar, text="全不选", command=self.deselect_all_fleet, bootstyle="secondary-outline").pack(side=LEFT, padx=5)
+        
+        # Node x Instance Matrix
+        tree_frame = ttk.Frame(self.tab_fleet)
+        tree_frame.pack(fill=BOTH, expand=True)
+        
+        self.fleet_tree = ttk.Treeview(tree_frame, columns=("select", "name"), show="headings", selectmode="extended")
+        v_scrollbar = ttk.Scrollbar(tree_frame, orient=VERTICAL, command=self.fleet_tree.yview)
+        h_scrollbar = ttk.Scrollbar(tree_frame, orient=HORIZONTAL, command=self.fleet_tree.xview)
+        self.fleet_tree.configure(yscroll=v_scrollbar.set, xscroll=h_scrollbar.set)
         
-        # Safety Check 1: Do not delete root
-        comfy_root = self.symlink_target_var.get()
-        if comfy_root and os.path.normpath(target_models) == os.path.normpath(comfy_root):
-            self.log("错误: 目标路径不能是 ComfyUI 根目录！请指定到 models 子目录。")
-            messagebox.showerror("错误", "目标路径不能是 ComfyUI 根目录！\n请修改为例如: ...\\ComfyUI\\models")
+        self.fleet_tree.grid(row=0, column=0, sticky='nsew')
+        v_scrollbar.grid(row=0, column=1, sticky='ns')
+        h_scrollbar.grid(row=1, column=0, sticky='ew')
+        tree_frame.rowconfigure(0, weight=1)
+        tree_frame.columnconfigure(0, weight=1)
+        
+        self.fleet_tree.tag_configure('checked', background='#5bc0de', foreground='#000000')
+        self.fleet_tree.bind('<Button-1>', self.on_fleet_click)
+        
+        self.refresh_fleet_instances()
+
+    def browse_fleet_root(self):
+        path = filedialog.askdirectory()
+        if path:
+            self.fleet_root_var.set(path)
+
+    def add_fleet_instance(self):
+        root = self.fleet_root_var.get().strip()
+        if not root:
             return
+        try:
+            inst = self.fleet.add_instance(root)
+            self.log(f"已添加实例 {inst.name}: {inst.custom_nodes_path}")
+            self.fleet_root_var.set("")
+            self.refresh_fleet_instances()
+            self.save_config()
+        except Exception as e:
+            self.log(f"添加实例失败: {e}")
 
-        # Safety Check 2: Do not delete if .git exists in root (double check)
-        if os.path.exists(os.path.join(target_models, ".git")):
-             self.log("错误: 目标目录包含 .git 文件夹，可能是代码仓库根目录，禁止删除！")
-             messagebox.showerror("错误", "目标目录看起来像是一个 Git 仓库根目录 (包含 .git)，禁止删除！\n请检查路径是否正确。")
-             return
+    def remove_fleet_instance(self):
+        for iid in self.fleet_inst_tree.selection():
+            self.fleet.remove_instance(iid)
+            self.log(f"已移除实例 {iid}")
+        self.refresh_fleet_instances()
+        self.save_config()
 
-        # Check if target models exists
-        if os.path.exists(target_models):
-            # Check if it is already a symlink
-            if os.path.islink(target_models):
-                 self.log(f"提示: 目标 {target_models} 已经是一个软链接。")
-            else:
-                if os.path.isdir(target_models):
-                    confirm = messagebox.askyesno("确认操作", f"目标位置存在 models 文件夹：\n{target_models}\n\n创建软链需要删除此文件夹。\n确认删除吗？(建议先备份重要文件)")
-                    if not confirm:
-                        self.log("操作取消")
-                        return
-                    
-                    try:
-                        self.log(f"正在删除原有 models 文件夹: {target_models}")
-                        
-                        # Handle read-only files (like git objects)
-                        def onerror(func, path, exc_info):
-                            import stat
-                            if not os.access(path, os.W_OK):
-                                os.chmod(path, stat.S_IWUSR)
-                                func(path)
-                            else:
-                                raise
-
-                        shutil.rmtree(target_models, onerror=onerror)
-                    except Exception as e:
-                        self.log(f"删除失败: {e}")
-                        return
-                else:
-                    self.log(f"错误: 目标位置存在同名文件: {target_models}")
-                    return
+    def refresh_fleet_instances(self):
+        self.fleet_inst_tree.delete(*self.fleet_inst_tree.get_children())
+        for inst in self.fleet.instances.values():
+            self.fleet_inst_tree.insert("", END, iid=inst.name, values=(inst.name, inst.custom_nodes_path, inst.python_path or "-"))
+        
+        # One matrix column per instance
+        instance_names = list(self.fleet.instances)
+        self.fleet_tree.configure(columns=["select", "name"] + instance_names)
+        self.fleet_tree.heading("select", text="选择")
+        self.fleet_tree.heading("name", text="节点名称", command=lambda: self.sort_treeview(self.fleet_tree, "name", False))
+        self.fleet_tree.column("select", width=60, anchor=CENTER, stretch=False)
+        self.fleet_tree.column("name", width=220, minwidth=100)
+        for inst_name in instance_names:
+            self.fleet_tree.heading(inst_name, text=inst_name, command=lambda c=inst_name: self.sort_treeview(self.fleet_tree, c, False))
+            self.fleet_tree.column(inst_name, width=160, minwidth=100)
+        self.update_fleet_matrix()
+
+    def format_fleet_cell(self, entry):
+        if entry is None:
+            return "—"
+        if not entry.head_sha:
+            return "文件夹"
+        return f"{entry.head_sha[:7]} {entry.status}"
+
+    def update_fleet_matrix(self):
+        self.fleet_tree.delete(*self.fleet_tree.get_children())
+        self.fleet_checked.clear()
+        matches = self.fleet_index.search(self.fleet_filter_var.get())
+        
+        for name, cells in self.fleet.matrix():
+            if name not in matches:
+                continue
+            values = ["☐", name] + [self.format_fleet_cell(entry) for entry in cells.values()]
+            self.fleet_tree.insert("", END, iid=name, values=values)
+
+    def update_fleet_cell(self, node_name, instance_name):
+        self.fleet_index.update(node_name, status=[e.status for e in self.fleet.entries_for(node_name).values()])
+        if self.fleet_tree.exists(node_name):
+            entry = self.fleet.get(node_name, instance_name)
+            self.fleet_tree.set(node_name, column=instance_name, value=self.format_fleet_cell(entry))
 
-        # Create Symlink
-        cmd = f'mklink /D "{target_models}" "{source}"'
-        self.log(f"执行命令: {cmd}")
+    def on_fleet_click(self, event):
+        col = self.fleet_tree.identify_column(event.x)
+        if col != '#1':
+            return
+        iid = self.fleet_tree.identify_row(event.y)
+        if not iid:
+            return
+        val = self.fleet_tree.set(iid, 'select')
+        new_val = '☑' if val != '☑' else '☐'
+        self.fleet_tree.set(iid, 'select', new_val)
+        if new_val == '☑':
+            self.fleet_checked.add(iid)
+            self.fleet_tree.item(iid, tags=['checked'])
+        else:
+            self.fleet_checked.discard(iid)
+            self.fleet_tree.item(iid, tags=[])
+
+    def select_all_fleet(self):
+        for item_id in self.fleet_tree.get_children():
+            self.fleet_tree.set(item_id, "select", "☑")
+            self.fleet_checked.add(item_id)
+            self.fleet_tree.item(item_id, tags=['checked'])
+
+    def deselect_all_fleet(self):
+        for item_id in self.fleet_tree.get_children():
+            self.fleet_tree.set(item_id, "select", "☐")
+            self.fleet_checked.discard(item_id)
+            self.fleet_tree.item(item_id, tags=[])
+
+    def get_fleet_targets(self):
+        names = list(self.fleet_checked) or list(self.fleet_tree.selection())
+        return [(inst, name) for name in names for inst in self.fleet.instances if self.fleet.get(name, inst)]
+
+    def start_fleet_scan_thread(self):
+        threading.Thread(target=self.fleet_scan_logic, daemon=True).start()
+
+    def fleet_scan_logic(self):
+        if not self.fleet.instances:
+            self.log("请先添加至少一个 ComfyUI 实例。")
+            return
+        self.log(f"正在并行扫描 {len(self.fleet.instances)} 个实例...")
         
-        try:
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if result.returncode == 0:
-                self.log("软链创建成功！")
-                messagebox.showinfo("成功", "软链创建成功！")
+        def progress(inst_name, count, error):
+            if error:
+                self.log(f"扫描失败 {inst_name}: {error}")
             else:
-                self.log(f"创建失败 (Exit Code {result.returncode}):\n{result.stderr}\n{result.stdout}")
-                if "privilege" in result.stderr.lower() or "权限" in result.stderr:
-                    self.log("提示: 请尝试以管理员身份运行此程序")
-                    if messagebox.askyesno("权限不足", "创建软链需要管理员权限。是否尝试以管理员身份执行命令？"):
-                         self.run_as_admin(cmd)
-        except Exception as e:
-            self.log(f"执行出错: {e}")
+                self.log(f"已扫描 {inst_name}: {count} 个节点")
+        
+        total = self.fleet.scan_all(progress=progress)
+        self.log(f"扫描完成，共索引 {total} 个节点（{len(self.fleet.table.names())} 个不同节点）。")
+        self.fleet_index.clear()
+        for name, cells in self.fleet.matrix():
+            self.index_fleet_node(name, cells)
+        self.after(0, self.update_fleet_matrix)
+
+    def index_fleet_node(self, name, cells):
+        entries = [e for e in cells.values() if e is not None]
+        self.fleet_index.set(
+            name,
+            name=name,
+            url=next((e.node.remote_url for e in entries if e.node.remote_url), None),
+            type=["Git" if e.node.is_git_repo else "文件夹" for e in entries],
+            status=[e.status for e in entries],
+            instance=[e.instance for e in entries],
+        )
+
+    def start_fleet_check_thread(self):
+        threading.Thread(target=self.fleet_check_logic, daemon=True).start()
+
+    def fleet_check_logic(self):
+        proxy = self.get_proxy_url()
+        self.log("正在检查所有实例的更新...")
+        self.fleet.check_updates(proxy=proxy if proxy else None,
+                                 progress=lambda e: self.after(0, self.update_fleet_cell, e.node.name, e.instance))
+        self.log("多实例更新检查完成。")
+
+    def start_fleet_update_thread(self):
+        threading.Thread(target=self.fleet_update_logic, daemon=True).start()
+
+    def log_fleet_result(self, result):
+        if result.ok:
+            self.log(f"[{result.instance}] {result.node_name} 完成\n{result.message}\n" + "-"*40)
+        else:
+            self.log(f"[{result.instance}] {result.node_name} 失败: {result.message}")
+        self.after(0, self.update_fleet_cell, result.node_name, result.instance)
+
+    def fleet_update_logic(self):
+        targets = self.get_fleet_targets()
+        if not targets:
+            self.log("没有选择节点。")
+            return
+        proxy = self.get_proxy_url()
+        self.log(f"开始在各实例中并行更新 {len(targets)} 个节点...")
+        results = self.fleet.pull(targets, proxy=proxy if proxy else None, progress=self.log_fleet_result)
+        failed = sum(1 for r in results if not r.ok)
+        self.log(f"多实例更新完成。成功: {len(results) - failed} 失败: {failed}")
+        # Each instance compiles with its own interpreter
+        per_python = {}
+        for r in results:
+            inst = self.fleet.instances.get(r.instance)
+            entry = self.fleet.get(r.node_name, r.instance)
+            if r.ok and inst and inst.python_path and entry:
+                per_python.setdefault(inst.python_path, []).append(entry.node.path)
+        for python_path, paths in per_python.items():
+            self.precompile_nodes(paths, python_path)
+
+    def start_fleet_install_reqs_thread(self):
+        threading.Thread(target=self.fleet_install_reqs_logic, daemon=True).start()
+
+    def fleet_install_reqs_logic(self):
+        targets = self.get_fleet_targets()
+        if not targets:
+            self.log("没有选择节点。")
+            return
+        self.apply_wheelhouse_settings()
+        proxy = self.get_proxy_url()
+        self.log(f"开始在各实例中并行安装 {len(targets)} 个节点的依赖...")
+        results = self.fleet.install_requirements(targets, proxy=proxy if proxy else None, progress=self.log_fleet_result)
+        failed = sum(1 for r in results if not r.ok)
+        self.log(f"依赖安装完成。成功: {len(results) - failed} 失败: {failed}")
 
-    def run_as_admin(self, cmd):
+    # --- Shared Wheelhouse ---
+    def get_wheelhouse_max_gb(self):
         try:
-             ret = ctypes.windll.shell32.ShellExecuteW(None, "runas", "cmd.exe", f"/c {cmd} & pause", None, 1)
-             if ret > 32:
-                 self.log("已请求管理员权限执行命令，请查看弹出的 CMD 窗口。")
-             else:
-                 self.log(f"请求管理员权限失败 (Code {ret})")
-        except Exception as e:
-            self.log(f"Elevation failed: {e}")
+            return max(float(self.wheelhouse_max_gb_var.get()), 0.1)
+        except ValueError:
+            return 10.0
+
+    def apply_wheelhouse_settings(self):
+        if not self.use_wheelhouse_var.get() or not self.wheelhouse_dir_var.get():
+            self.manager.wheelhouse = None
+            return None
+        root = os.path.abspath(self.wheelhouse_dir_var.get())
+        max_bytes = int(self.get_wheelhouse_max_gb() * 1024 ** 3)
+        wheelhouse = self.manager.wheelhouse
+        if wheelhouse is None or wheelhouse.root != root:
+            try:
+                wheelhouse = Wheelhouse(root, max_bytes, snapshots=self.manager.package_snapshots)
+            except OSError as e:
+                self.log(f"无法使用 Wheel 仓库 {root}: {e}")
+                self.manager.wheelhouse = None
+                return None
+            self.manager.wheelhouse = wheelhouse
+        wheelhouse.max_bytes = max_bytes
+        return wheelhouse
+
+    def browse_wheelhouse_dir(self):
+        path = filedialog.askdirectory()
+        if path:
+            self.wheelhouse_dir_var.set(path)
+            self.apply_wheelhouse_settings()
+
+    def update_wheelhouse_size_label(self, wheelhouse):
+        wheels = wheelhouse.wheels()
+        size_mb = sum(wheels.values()) / 1024 ** 2
+        self.wheelhouse_size_label.configure(text=f"{len(wheels)} 个 wheel, {size_mb:.0f} MB")
+
+    def start_prefetch_wheels_thread(self):
+        threading.Thread(target=self.prefetch_wheels_logic, daemon=True).start()
+
+    def prefetch_wheels_logic(self):
+        # Prefetching is useful even before the toggle is on, so build the house directly
+        if not self.wheelhouse_dir_var.get():
+            self.log("未设置 Wheel 仓库目录。")
+            return
+        wheelhouse = self.manager.wheelhouse or Wheelhouse(self.wheelhouse_dir_var.get(), int(self.get_wheelhouse_max_gb() * 1024 ** 3),
+                                                           snapshots=self.manager.package_snapshots)
+        
+        jobs = []
+        python_path = self.python_path_var.get()
+        if python_path and os.path.exists(python_path):
+            jobs.extend((python_path, os.path.join(n.path, "requirements.txt")) for n in self.current_nodes)
+        for inst in self.fleet.instances.values():
+            if not inst.python_path:
+                continue
+            for row in self.fleet.table.instance_rows(inst.name):
+                jobs.append((inst.python_path, os.path.join(self.fleet.table.node(row).path, "requirements.txt")))
+        jobs = [(py, req) for py, req in jobs if os.path.exists(req)]
+        if not jobs:
+            self.log("没有找到需要预取的 requirements.txt。")
+            return
+        
+        env = os.environ.copy()
+        proxy = self.get_proxy_url()
+        if proxy:
+            env['http_proxy'] = proxy
+            env['https_proxy'] = proxy
+        
+        def progress(result):
+            node = os.path.basename(os.path.dirname(result.requirements_path))
+            if result.ok:
+                self.log(f"[预取] {node}: {result.message or f'{result.wheels} 个 wheel'}")
+            else:
+                self.log(f"[预取] {node} 失败: {result.message}")
+        
+        self.log(f"开始并行预取 {len(jobs)} 个依赖文件到 {wheelhouse.root} ...")
+        start = time.perf_counter()
+        results = wheelhouse.prefetch(jobs, env=env, progress=progress)
+        failed = sum(1 for r in results if not r.ok)
+        self.log(f"预取完成: {len(results)} 个不同的依赖文件, 失败 {failed}, 用时 {time.perf_counter() - start:.1f}s")
+        self.after(0, self.update_wheelhouse_size_label, wheelhouse)
 
 if __name__ == "__main__":
     try:
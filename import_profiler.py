@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Modules ComfyUI has loaded before any custom node, imported before timing starts
+DEFAULT_PRELOAD = ("torch", "numpy", "PIL.Image", "folder_paths", "nodes")
+
+_RESULT_PREFIX = "@@IMPORT_PROFILE@@"
+_START_MARKER = "@@IMPORT_PROFILE_START@@"
+
+# Runs inside the target interpreter with -X importtime: preload, then import the node the way ComfyUI does
+_PROFILE_SCRIPT = r"""
+import importlib, importlib.util, json, os, sys, time, traceback
+node_path, comfy_root, preload = sys.argv[1], sys.argv[2], [m for m in sys.argv[3].split(",") if m]
+
+def peak_rss():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+    except ImportError:
+        import ctypes
+        from ctypes import wintypes
+        class Counters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + \
+                       [(n, ctypes.c_size_t) for n in ("PeakWorkingSetSize", "WorkingSetSize",
+                        "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage", "QuotaPeakNonPagedPoolUsage",
+                        "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+        c = Counters()
+        c.cb = ctypes.sizeof(c)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(c), c.cb)
+        return c.PeakWorkingSetSize
+
+if comfy_root:
+    os.chdir(comfy_root)
+    sys.path.insert(0, comfy_root)
+for name in preload:
+    try:
+        importlib.import_module(name)
+    except BaseException:
+        pass
+baseline = peak_rss()
+sys.stderr.write("\n@@IMPORT_PROFILE_START@@\n")
+sys.stderr.flush()
+
+module_name = os.path.basename(os.path.normpath(node_path))
+error = None
+start = time.perf_counter()
+try:
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(node_path, "__init__.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+except BaseException:
+    error = traceback.format_exc(limit=3)
+wall = time.perf_counter() - start
+peak = peak_rss()
+sys.stdout.write("\n@@IMPORT_PROFILE@@" + json.dumps({"wall": wall, "peak_rss": peak,
+                                                     "rss_delta": max(0, peak - baseline), "error": error}) + "\n")
+"""
+
+
+@dataclass
+class ProfileResult:
+    path: str
+    key: str
+    ok: bool
+    wall: float = 0.0
+    peak_rss: int = 0
+    # Growth of the peak RSS over the preloaded baseline, i.e. what this node adds
+    rss_delta: int = 0
+    # (top-level package, seconds of import time spent in it)
+    top_imports: List[Tuple[str, float]] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(os.path.normpath(self.path))
+
+
+def profile_key(node_path: str, head_sha: Optional[str]) -> str:
+    """
+    Cache key of a node: its HEAD SHA, or the mtime of __init__.py for folder nodes.
+    """
+    if head_sha:
+        return head_sha
+    try:
+        return f"mtime:{os.stat(os.path.join(node_path, '__init__.py')).st_mtime_ns}"
+    except OSError:
+        return "missing"
+
+
+def parse_importtime(stderr: str, own_module: str, limit: int = 5) -> List[Tuple[str, float]]:
+    """
+    Sum the self time of every import logged after the start marker per top-level
+    package, leaving out the node's own modules. Returns the heaviest packages.
+    """
+    _, _, after = stderr.partition(_START_MARKER)
+    per_package: Dict[str, int] = {}
+    for line in after.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+        except ValueError:
+            # The header line
+            continue
+        module = parts[2].strip()
+        if module == own_module or module.startswith(own_module + "."):
+            continue
+        package = module.split(".")[0]
+        per_package[package] = per_package.get(package, 0) + self_us
+    heaviest = sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)[:limit]
+    return [(package, us / 1e6) for package, us in heaviest]
+
+
+class ImportProfiler:
+    """
+    Import each custom node in its own interpreter process, several at once, and record
+    wall time, peak memory and the packages that dominate its import time. Successful
+    results are cached per node until its HEAD SHA (or __init__.py for folder nodes), the
+    interpreter or the ComfyUI folder changes; failures are always profiled again, since a
+    missing dependency may have been installed since.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, max_workers: Optional[int] = None,
+                 timeout: float = 300, preload: Tuple[str, ...] = DEFAULT_PRELOAD):
+        self.cache_file = cache_file
+        # Each worker holds its own copy of torch and friends, keep the count modest
+        self.max_workers = max_workers or max(1, min(4, (os.cpu_count() or 2) // 2))
+        self.timeout = timeout
+        self.preload = preload
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Dict] = {}
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self._cache = json.load(f)
+            except Exception as e:
+                print(f"Error loading profile cache: {e}")
+
+    def save(self) -> None:
+        if not self.cache_file:
+            return
+        with self._lock:
+            data = dict(self._cache)
+        try:
+            with open(self.cache_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error saving profile cache: {e}")
+
+    def cached(self, node_path: str, key: str, python_path: str, comfy_root: str) -> Optional[ProfileResult]:
+        with self._lock:
+            entry = self._cache.get(os.path.abspath(node_path))
+        if not entry or entry.get("key") != key or entry.get("python_path") != python_path:
+            return None
+        if entry.get("comfy_root") != os.path.abspath(comfy_root) or not entry["result"].get("ok"):
+            return None
+        result = ProfileResult(**entry["result"])
+        result.top_imports = [tuple(item) for item in result.top_imports]
+        return result
+
+    def profile(self, node_path: str, key: str, python_path: str, comfy_root: str) -> ProfileResult:
+        result = ProfileResult(path=node_path, key=key, ok=False)
+        env = dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONDONTWRITEBYTECODE="1")
+        cmd = [python_path, "-X", "importtime", "-c", _PROFILE_SCRIPT, node_path, comfy_root or "",
+               ",".join(self.preload)]
+        try:
+            res = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8", errors="replace",
+                                 env=env, timeout=self.timeout, creationflags=_CREATE_NO_WINDOW)
+        except subprocess.TimeoutExpired:
+            result.error = f"导入超过 {self.timeout:.0f}s"
+            return result
+        payload = next((line[len(_RESULT_PREFIX):] for line in reversed(res.stdout.splitlines())
+                        if line.startswith(_RESULT_PREFIX)), None)
+        if payload is None:
+            # The interpreter died (segfault, os._exit) before reporting
+            result.error = (res.stderr.strip().splitlines() or [f"exit code {res.returncode}"])[-1]
+            return result
+        data = json.loads(payload)
+        result.wall = data["wall"]
+        result.peak_rss = data["peak_rss"]
+        result.rss_delta = data["rss_delta"]
+        result.error = data["error"]
+        result.ok = data["error"] is None
+        result.top_imports = parse_importtime(res.stderr, os.path.basename(os.path.normpath(node_path)))
+        return result
+
+    def profile_many(self, nodes: List[Tuple[str, str]], python_path: str, comfy_root: str,
+                     force: bool = False,
+                     progress: Optional[Callable[[ProfileResult, bool], None]] = None) -> Dict[str, ProfileResult]:
+        """
+        Profile (node_path, key) pairs. Cached results are reported right away with
+        from_cache=True, the rest run in parallel.
+        """
+        results = {}
+        pending = []
+        for node_path, key in nodes:
+            cached = None if force else self.cached(node_path, key, python_path, comfy_root)
+            if cached:
+                results[node_path] = cached
+                if progress:
+                    progress(cached, True)
+            else:
+                pending.append((node_path, key))
+
+        def _run(item: Tuple[str, str]) -> ProfileResult:
+            return self.profile(item[0], item[1], python_path, comfy_root)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for result in pool.map(_run, pending):
+                results[result.path] = result
+                with self._lock:
+                    if result.ok:
+                        self._cache[os.path.abspath(result.path)] = {
+                            "key": result.key, "python_path": python_path,
+                            "comfy_root": os.path.abspath(comfy_root), "profiled_at": time.time(),
+                            "result": asdict(result)}
+                    else:
+                        self._cache.pop(os.path.abspath(result.path), None)
+                if progress:
+                    progress(result, False)
+        self.save()
+        return results
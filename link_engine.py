@@ -0,0 +1,194 @@
+import os
+import stat
+import shutil
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional
+
+# Plan actions
+ACTION_CREATE = "创建"
+ACTION_REPLACE = "替换目录"
+ACTION_RELINK = "重新链接"
+ACTION_OK = "已链接"
+ACTION_CONFLICT = "冲突"
+
+# Windows reparse tag of a directory junction
+_IO_REPARSE_TAG_MOUNT_POINT = 0xA0000003
+
+
+@dataclass
+class LinkOp:
+    source: str
+    target: str
+    action: str
+    detail: str = ""
+    # Replacing a non-empty folder deletes data, the caller must confirm it
+    needs_confirm: bool = False
+
+
+@dataclass
+class LinkResult:
+    op: LinkOp
+    ok: bool
+    message: str = ""
+
+
+def is_junction(path: str) -> bool:
+    if hasattr(os.path, "isjunction"):
+        return os.path.isjunction(path)
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return getattr(st, "st_reparse_tag", None) == _IO_REPARSE_TAG_MOUNT_POINT
+
+
+def is_link(path: str) -> bool:
+    return os.path.islink(path) or is_junction(path)
+
+
+def read_link(path: str) -> Optional[str]:
+    try:
+        target = os.readlink(path)
+    except OSError:
+        return None
+    # Junctions and some symlinks come back in NT namespace form
+    if target.startswith("\\\\?\\"):
+        target = target[4:]
+    if not os.path.isabs(target):
+        target = os.path.join(os.path.dirname(path), target)
+    return os.path.normpath(target)
+
+
+def same_path(a: str, b: str) -> bool:
+    return os.path.normcase(os.path.normpath(a)) == os.path.normcase(os.path.normpath(b))
+
+
+def create_dir_link(source: str, target: str) -> str:
+    """
+    Link target -> source. Tries a real symlink first; on Windows without the symlink
+    privilege falls back to a directory junction, which needs no admin rights.
+    Returns the kind of link created.
+    """
+    source = os.path.abspath(source)
+    try:
+        os.symlink(source, target, target_is_directory=True)
+        return "symlink"
+    except OSError:
+        if os.name != "nt":
+            raise
+    import _winapi
+    _winapi.CreateJunction(source, target)
+    return "junction"
+
+
+def remove_link(path: str) -> None:
+    # Directory symlinks and junctions are removed with rmdir on Windows, unlink elsewhere
+    if os.name == "nt":
+        os.rmdir(path)
+    else:
+        os.unlink(path)
+
+
+def _force_rmtree(path: str) -> None:
+    def onerror(func, p, exc_info):
+        # Read-only files (like git objects)
+        if not os.access(p, os.W_OK):
+            os.chmod(p, stat.S_IWUSR)
+            func(p)
+        else:
+            raise
+    shutil.rmtree(path, onerror=onerror)
+
+
+def plan_link(source: str, target: str, protect: Iterable[str] = ()) -> LinkOp:
+    """
+    Decide what linking target -> source needs without touching the disk.
+    protect lists paths that must never be replaced (e.g. the ComfyUI root).
+    """
+    source = os.path.abspath(source)
+    target = os.path.abspath(target)
+    if not os.path.isdir(source):
+        return LinkOp(source, target, ACTION_CONFLICT, "源目录不存在")
+    if same_path(source, target):
+        return LinkOp(source, target, ACTION_CONFLICT, "源与目标相同")
+    if any(same_path(target, p) for p in protect if p):
+        return LinkOp(source, target, ACTION_CONFLICT, "目标是受保护的目录")
+
+    if is_link(target):
+        current = read_link(target)
+        if current and same_path(current, source):
+            return LinkOp(source, target, ACTION_OK)
+        return LinkOp(source, target, ACTION_RELINK, f"当前指向 {current}")
+    if not os.path.lexists(target):
+        return LinkOp(source, target, ACTION_CREATE)
+    if not os.path.isdir(target):
+        return LinkOp(source, target, ACTION_CONFLICT, "目标位置存在同名文件")
+    if os.path.exists(os.path.join(target, ".git")):
+        return LinkOp(source, target, ACTION_CONFLICT, "目标包含 .git，可能是代码仓库根目录")
+    with os.scandir(target) as it:
+        empty = next(it, None) is None
+    if empty:
+        return LinkOp(source, target, ACTION_REPLACE, "空目录")
+    return LinkOp(source, target, ACTION_REPLACE, "目录非空，原有内容将被删除", needs_confirm=True)
+
+
+def plan_merge(source: str, target: str, subfolders: Optional[List[str]] = None,
+               protect: Iterable[str] = ()) -> List[LinkOp]:
+    """
+    Per-subfolder mode: keep target as a real folder and link each subfolder of source
+    (checkpoints, loras, ...) into it individually.
+    """
+    source = os.path.abspath(source)
+    target = os.path.abspath(target)
+    if not os.path.isdir(source):
+        return [LinkOp(source, target, ACTION_CONFLICT, "源目录不存在")]
+    if is_link(target):
+        return [LinkOp(source, target, ACTION_CONFLICT, "目标本身是链接，请先改为普通目录")]
+    if os.path.exists(target) and not os.path.isdir(target):
+        return [LinkOp(source, target, ACTION_CONFLICT, "目标位置存在同名文件")]
+
+    if subfolders is None:
+        with os.scandir(source) as it:
+            subfolders = sorted(e.name for e in it if e.is_dir())
+    protect = list(protect)
+    return [plan_link(os.path.join(source, name), os.path.join(target, name), protect) for name in subfolders]
+
+
+def plan_batch(source: str, targets: List[str], merge: bool = False,
+               subfolders: Optional[List[str]] = None, protect: Iterable[str] = ()) -> List[LinkOp]:
+    """
+    Plan the same source for many targets, e.g. the models folder of every registered instance.
+    """
+    protect = list(protect)
+    ops = []
+    for target in targets:
+        if merge:
+            ops.extend(plan_merge(source, target, subfolders, protect))
+        else:
+            ops.append(plan_link(source, target, protect))
+    return ops
+
+
+def apply_op(op: LinkOp) -> LinkResult:
+    if op.action in (ACTION_OK, ACTION_CONFLICT):
+        return LinkResult(op, op.action == ACTION_OK, op.detail)
+    try:
+        if op.action == ACTION_RELINK:
+            remove_link(op.target)
+        elif op.action == ACTION_REPLACE:
+            _force_rmtree(op.target)
+        os.makedirs(os.path.dirname(op.target), exist_ok=True)
+        kind = create_dir_link(op.source, op.target)
+        return LinkResult(op, True, kind)
+    except Exception as e:
+        return LinkResult(op, False, str(e))
+
+
+def apply_plan(ops: List[LinkOp], progress: Optional[Callable[[LinkResult], None]] = None) -> List[LinkResult]:
+    results = []
+    for op in ops:
+        result = apply_op(op)
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
@@ -0,0 +1,323 @@
+import os
+import time
+import shutil
+import struct
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional, Set, Tuple
+
+from git_refs import CommitInfo, resolve_git_dir, read_head, read_config, read_upstream, read_ref
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Statuses known without network access, all relative to the last fetch
+LOCAL_BEHIND = "落后(上次获取)"
+LOCAL_AHEAD = "领先远程"
+LOCAL_SYNCED = "同步(上次获取)"
+LOCAL_DIRTY = "本地修改"
+LOCAL_DETACHED = "分离 HEAD"
+LOCAL_NO_UPSTREAM = "无上游"
+
+_ENTRY_HEADER = struct.Struct(">10I")
+_MODE_GITLINK = 0o160000
+_FLAG_ASSUME_VALID = 0x8000
+_FLAG_EXTENDED = 0x4000
+_XFLAG_SKIP_WORKTREE = 0x4000
+_XFLAG_INTENT_TO_ADD = 0x2000
+
+
+class _Undecided(Exception):
+    """
+    The index cannot tell clean from dirty by itself; ask git.
+    """
+
+
+def _decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    # The offset encoding of index v4 path prefixes (each continuation adds one)
+    byte = data[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+
+def _read_index(data: bytes, hash_size: int) -> Tuple[List[Tuple[bytes, Tuple[int, ...], int, int]], Set[bytes]]:
+    """
+    ([(path, stat fields, flags, extended flags)], extension signatures) for index versions 2 to 4.
+    """
+    if data[:4] != b"DIRC":
+        raise _Undecided("not an index file")
+    version, count = struct.unpack(">II", data[4:12])
+    if version not in (2, 3, 4):
+        raise _Undecided(f"index version {version}")
+    pos = 12
+    previous = b""
+    entries = []
+    for _ in range(count):
+        start = pos
+        stat = _ENTRY_HEADER.unpack_from(data, pos)
+        pos += 40 + hash_size
+        flags = struct.unpack_from(">H", data, pos)[0]
+        pos += 2
+        xflags = 0
+        if version >= 3 and flags & _FLAG_EXTENDED:
+            xflags = struct.unpack_from(">H", data, pos)[0]
+            pos += 2
+        if version == 4:
+            strip, pos = _decode_varint(data, pos)
+            end = data.index(b"\0", pos)
+            path = previous[:len(previous) - strip] + data[pos:end]
+            pos = end + 1
+        else:
+            end = data.index(b"\0", pos)
+            path = data[pos:end]
+            # Entries are NUL padded to a multiple of eight bytes
+            pos = start + ((end - start) // 8 + 1) * 8
+        previous = path
+        entries.append((path, stat, flags, xflags))
+    extensions = set()
+    while pos + 8 <= len(data) - hash_size:
+        signature, size = data[pos:pos + 4], struct.unpack_from(">I", data, pos + 4)[0]
+        extensions.add(signature)
+        pos += 8 + size
+    return entries, extensions
+
+
+def index_says_clean(node_path: str, git_dir: str) -> bool:
+    """
+    Compare the stat data cached in the index with the working tree, like git does before
+    it reads any file contents. Returns True when every tracked file is unchanged, False
+    on a definite change (deleted file, unmerged entry) and raises _Undecided when only
+    the contents can tell (stat mismatch, racily clean entries, split index).
+    """
+    index_path = os.path.join(git_dir, "index")
+    try:
+        index_mtime_ns = os.stat(index_path).st_mtime_ns
+        with open(index_path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        # Nothing staged or checked out yet
+        return True
+    except OSError as e:
+        raise _Undecided(str(e))
+    objectformat = read_config(git_dir).get("extensions", {}).get("objectformat", "sha1")
+    hash_size = 32 if objectformat == "sha256" else 20
+    try:
+        entries, extensions = _read_index(data, hash_size)
+    except (struct.error, ValueError, IndexError) as e:
+        raise _Undecided(f"index parse error: {e}")
+    # The split index keeps most entries in a shared file, leave that to git
+    if b"link" in extensions:
+        raise _Undecided("split index")
+    for path, stat, flags, xflags in entries:
+        if (flags >> 12) & 0x3:
+            # Conflict stages
+            return False
+        if flags & _FLAG_ASSUME_VALID or xflags & _XFLAG_SKIP_WORKTREE:
+            continue
+        if xflags & _XFLAG_INTENT_TO_ADD:
+            raise _Undecided("intent-to-add entry")
+        _, _, mtime_s, mtime_ns, _, _, mode, _, _, size = stat
+        if mode == _MODE_GITLINK:
+            continue
+        try:
+            st = os.lstat(os.path.join(node_path, os.fsdecode(path)))
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            raise _Undecided(str(e))
+        if (st.st_size & 0xFFFFFFFF) != size or int(st.st_mtime) & 0xFFFFFFFF != mtime_s:
+            raise _Undecided(os.fsdecode(path))
+        # Builds without nanosecond support store 0
+        if mtime_ns and st.st_mtime_ns % 1_000_000_000 != mtime_ns:
+            raise _Undecided(os.fsdecode(path))
+        # Racily clean: modified no earlier than the index was written, could have changed unnoticed
+        if (mtime_s * 1_000_000_000 + mtime_ns if mtime_ns else mtime_s * 1_000_000_000 + 999_999_999) >= index_mtime_ns:
+            raise _Undecided(os.fsdecode(path))
+    return True
+
+
+def is_dirty(node_path: str, git_dir: Optional[str] = None) -> Optional[bool]:
+    """
+    Whether tracked files have local modifications. Most clean repos are answered from the
+    index alone; the rest run one read-only 'git status'. None if neither works.
+    """
+    git_dir = git_dir or resolve_git_dir(node_path)
+    if not git_dir:
+        return None
+    try:
+        return not index_says_clean(node_path, git_dir)
+    except _Undecided:
+        pass
+    # --no-optional-locks: never write the refreshed index, another operation may own it
+    res = subprocess.run(["git", "--no-optional-locks", "status", "--porcelain", "-uno"], cwd=node_path,
+                         capture_output=True, text=True, creationflags=_CREATE_NO_WINDOW)
+    if res.returncode != 0:
+        return None
+    return bool(res.stdout.strip())
+
+
+@dataclass
+class LocalStatus:
+    branch: Optional[str]
+    detached: bool
+    upstream: Optional[str]
+    ahead: Optional[int]
+    behind: Optional[int]
+    dirty: Optional[bool]
+
+    @property
+    def label(self) -> str:
+        parts = []
+        if self.detached:
+            parts.append(LOCAL_DETACHED)
+        elif not self.upstream:
+            parts.append(LOCAL_NO_UPSTREAM)
+        elif self.behind:
+            parts.append(f"{LOCAL_BEHIND} {self.behind}")
+        elif self.ahead:
+            parts.append(LOCAL_AHEAD)
+        elif self.behind == 0:
+            parts.append(LOCAL_SYNCED)
+        if self.dirty:
+            parts.append(LOCAL_DIRTY)
+        return " / ".join(parts) or "未知"
+
+
+def local_status(node_path: str, info: Optional[CommitInfo] = None) -> Optional[LocalStatus]:
+    """
+    Status of a Git node from HEAD, the branch config, the last fetched remote-tracking ref
+    and the index, without touching the network. Pass the node's CommitInfo to reuse its
+    ahead/behind counts.
+    """
+    git_dir = resolve_git_dir(node_path)
+    if not git_dir:
+        return None
+    branch, head_sha = read_head(git_dir)
+    upstream = read_upstream(git_dir, branch)
+    ahead = behind = None
+    if upstream and info is not None and info.head_sha == head_sha:
+        upstream_sha = read_ref(git_dir, upstream)
+        if upstream_sha and info.upstream_sha == upstream_sha:
+            ahead, behind = info.ahead, info.behind
+    if upstream and not read_ref(git_dir, upstream):
+        # Configured but never fetched
+        upstream = None
+    return LocalStatus(branch=branch, detached=branch is None and head_sha is not None, upstream=upstream,
+                       ahead=ahead, behind=behind, dirty=is_dirty(node_path, git_dir))
+
+
+# What to do with nodes that have local changes before a destructive batch action
+CHANGES_STASH = "stash"
+CHANGES_SKIP = "skip"
+CHANGES_OVERWRITE = "overwrite"
+
+
+@dataclass
+class WorktreeChanges:
+    path: str
+    modified: List[str] = field(default_factory=list)
+    untracked: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(os.path.normpath(self.path))
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.modified or self.untracked)
+
+
+def worktree_changes(node_path: str) -> WorktreeChanges:
+    """
+    Modified and untracked files of one repo. The untracked cache lets git skip unchanged
+    directories, and status stores it in the index for the next run.
+    """
+    result = WorktreeChanges(path=node_path)
+    res = subprocess.run(["git", "-c", "core.untrackedCache=true", "status", "--porcelain", "-z",
+                          "--untracked-files=normal"], cwd=node_path, capture_output=True,
+                         creationflags=_CREATE_NO_WINDOW)
+    if res.returncode != 0:
+        result.error = res.stderr.decode("utf-8", "replace").strip() or f"exit code {res.returncode}"
+        return result
+    fields = res.stdout.split(b"\0")
+    i = 0
+    while i < len(fields):
+        entry = fields[i]
+        i += 1
+        if len(entry) < 4:
+            continue
+        code, path = entry[:2], entry[3:].decode("utf-8", "replace")
+        if code == b"??":
+            result.untracked.append(path)
+        elif code != b"!!":
+            result.modified.append(path)
+            if b"R" in code or b"C" in code:
+                # Renames and copies are followed by their source path
+                i += 1
+    return result
+
+
+def scan_worktree_changes(node_paths: List[str], max_workers: int = 8) -> List[WorktreeChanges]:
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(worktree_changes, node_paths))
+
+
+def _git_checked(node_path: str, *args: str) -> subprocess.CompletedProcess:
+    res = subprocess.run(["git", *args], cwd=node_path, capture_output=True, text=True,
+                         creationflags=_CREATE_NO_WINDOW)
+    if res.returncode != 0:
+        raise Exception(res.stderr.strip() or f"git {args[0]} exit code {res.returncode}")
+    return res
+
+
+def stash_changes(node_path: str, message: str) -> bool:
+    """
+    Stash tracked modifications. Untracked files stay in place: they rarely block a pull
+    and are often large downloads that do not belong in the object store.
+    Returns False when there was nothing to stash.
+    """
+    before = _git_checked(node_path, "stash", "list").stdout
+    _git_checked(node_path, "-c", "user.name=ComfyNode Sync", "-c", "user.email=sync@localhost",
+                 "stash", "push", "-m", message)
+    return _git_checked(node_path, "stash", "list").stdout != before
+
+
+def pop_stash(node_path: str) -> Optional[str]:
+    """
+    Re-apply the newest stash. Returns an error message and keeps the stash when it conflicts.
+    """
+    try:
+        _git_checked(node_path, "stash", "pop")
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def discard_changes(node_path: str) -> None:
+    """
+    Reset tracked files to HEAD. Untracked files are left alone.
+    """
+    _git_checked(node_path, "reset", "-q", "--hard", "HEAD")
+
+
+def backup_changes(changes: WorktreeChanges, backup_root: str) -> str:
+    """
+    Copy the changed and untracked files of a repo that is about to be deleted, keeping
+    their relative paths. Returns the backup folder.
+    """
+    target = os.path.join(backup_root, f"{changes.name}-{time.strftime('%Y%m%d-%H%M%S')}")
+    for rel in changes.modified + changes.untracked:
+        source = os.path.join(changes.path, rel)
+        dest = os.path.join(target, rel)
+        if os.path.isdir(source):
+            shutil.copytree(source, dest, symlinks=True, dirs_exist_ok=True)
+        elif os.path.lexists(source):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copy2(source, dest, follow_symlinks=False)
+    return target
@@ -0,0 +1,150 @@
+import json
+import math
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Deque, Dict, List, Optional
+
+# Phases recorded by NodeManager
+PHASES = ("scan", "fetch", "pull", "clone", "pip", "wheel", "copy", "delete", "repair")
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+@dataclass
+class Span:
+    phase: str
+    node: Optional[str]
+    duration: float
+    ok: bool
+    started_at: float
+
+
+class _PhaseStats:
+    """
+    Running totals for one phase plus a bounded window of recent durations for percentiles.
+    """
+    __slots__ = ("count", "errors", "total", "max", "window")
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.window: Deque[float] = deque(maxlen=window)
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank on the sorted window
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class MetricsRegistry:
+    """
+    In-process registry of operation timings.
+    Recording is a lock plus a few arithmetic ops; percentiles are only computed when a report is built.
+    """
+
+    def __init__(self, window: int = 1024, recent: int = 200):
+        self._lock = threading.Lock()
+        self._window = window
+        self._phases: Dict[str, _PhaseStats] = {}
+        self._recent: Deque[Span] = deque(maxlen=recent)
+
+    def record(self, phase: str, duration: float, node: Optional[str] = None, ok: bool = True,
+               started_at: Optional[float] = None) -> None:
+        with self._lock:
+            stats = self._phases.get(phase)
+            if stats is None:
+                stats = self._phases[phase] = _PhaseStats(self._window)
+            stats.count += 1
+            stats.total += duration
+            if duration > stats.max:
+                stats.max = duration
+            if not ok:
+                stats.errors += 1
+            stats.window.append(duration)
+            self._recent.append(Span(phase, node, duration, ok, started_at or time.time() - duration))
+
+    @contextmanager
+    def span(self, phase: str, node: Optional[str] = None):
+        started_at = time.time()
+        start = time.perf_counter()
+        ok = True
+        try:
+            yield
+        except BaseException:
+            ok = False
+            raise
+        finally:
+            self.record(phase, time.perf_counter() - start, node=node, ok=ok, started_at=started_at)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._phases.clear()
+            self._recent.clear()
+
+    def recent_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._recent)
+
+    def summary(self) -> Dict[str, Dict]:
+        """
+        Per-phase count, errors, total, mean, max and percentiles (seconds).
+        """
+        with self._lock:
+            snapshot = {phase: (s.count, s.errors, s.total, s.max, sorted(s.window))
+                        for phase, s in self._phases.items()}
+        result = {}
+        for phase, (count, errors, total, max_, window) in snapshot.items():
+            entry = {
+                "count": count,
+                "errors": errors,
+                "total": total,
+                "mean": total / count if count else 0.0,
+                "max": max_,
+            }
+            for q in QUANTILES:
+                entry[f"p{int(q * 100)}"] = _percentile(window, q)
+            result[phase] = entry
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "phases": self.summary(),
+            "recent": [asdict(s) for s in self.recent_spans()],
+        }, indent=4, ensure_ascii=False)
+
+    def to_prometheus(self, prefix: str = "comfynode") -> str:
+        name = f"{prefix}_operation_duration_seconds"
+        lines = [
+            f"# HELP {name} Duration of NodeManager operations by phase.",
+            f"# TYPE {name} summary",
+        ]
+        summary = self.summary()
+        for phase in sorted(summary):
+            entry = summary[phase]
+            for q in QUANTILES:
+                lines.append(f'{name}{{phase="{phase}",quantile="{q}"}} {entry[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'{name}_sum{{phase="{phase}"}} {entry["total"]:.6f}')
+            lines.append(f'{name}_count{{phase="{phase}"}} {entry["count"]}')
+        errors = f"{prefix}_operation_errors_total"
+        lines.append(f"# HELP {errors} Failed NodeManager operations by phase.")
+        lines.append(f"# TYPE {errors} counter")
+        for phase in sorted(summary):
+            lines.append(f'{errors}{{phase="{phase}"}} {summary[phase]["errors"]}')
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry used by NodeManager and the perf panel
+REGISTRY = MetricsRegistry()
+
+
+def span(phase: str, node: Optional[str] = None):
+    return REGISTRY.span(phase, node)
@@ -0,0 +1,150 @@
+import os
+import git
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from node_manager import NodeManager, Node, normalize_remote_url
+
+# Plan statuses, shown as-is in the migrate tab's "目标状态" column
+STATUS_MISSING = "可迁移"
+STATUS_EXISTS = "已存在（跳过）"
+STATUS_IDENTICAL = "已存在（相同）"
+STATUS_BEHIND = "已存在（目标落后）"
+STATUS_AHEAD = "已存在（目标领先）"
+STATUS_DIVERGED = "已存在（版本不同）"
+STATUS_DIFFERENT_REMOTE = "已存在（远程不同）"
+STATUS_RENAMED = "已存在（重命名）"
+STATUS_MIGRATED_GIT = "已迁移（Git）"
+STATUS_COPIED = "已复制"
+STATUS_SKIPPED_NON_GIT = "已跳过（非Git）"
+
+
+@dataclass
+class EnvIndex:
+    """
+    One scan of a custom_nodes directory, indexed by folder name and normalized remote URL.
+    """
+    root: str
+    by_name: Dict[str, Node] = field(default_factory=dict)
+    # Case-folded name -> nodes, only consulted when the exact name is missing
+    by_folded: Dict[str, List[Node]] = field(default_factory=dict)
+    by_url: Dict[str, List[Node]] = field(default_factory=dict)
+    shas: Dict[str, Optional[str]] = field(default_factory=dict)
+
+    def find(self, name: str) -> Optional[Node]:
+        """
+        The node with exactly this folder name, else one differing only in case (the same
+        folder on case-insensitive file systems).
+        """
+        node = self.by_name.get(name)
+        if node is not None:
+            return node
+        candidates = self.by_folded.get(name.casefold())
+        return candidates[0] if candidates else None
+
+
+@dataclass
+class MigrationPlanItem:
+    node: Node
+    status: str
+    source_sha: Optional[str] = None
+    target_sha: Optional[str] = None
+    target_name: Optional[str] = None
+    target_url: Optional[str] = None
+
+    @property
+    def exists_in_target(self) -> bool:
+        return self.status.startswith("已存在")
+
+    @property
+    def display_status(self) -> str:
+        if self.status == STATUS_RENAMED and self.target_name:
+            return f"{self.status} → {self.target_name}"
+        return self.status
+
+
+class MigrationPlanner:
+    """
+    Diff an old environment against a new one in a single pass.
+    Both sides are scanned once; every source node is then classified against the
+    target index so filtering never touches the filesystem again.
+    """
+
+    def __init__(self, manager: NodeManager):
+        self.manager = manager
+
+    def build_index(self, root: str, nodes: Optional[List[Node]] = None) -> EnvIndex:
+        index = EnvIndex(root=root)
+        if nodes is None:
+            nodes = self.manager.scan_directory(root) if root and os.path.exists(root) else []
+        for node in nodes:
+            index.by_name[node.name] = node
+            index.by_folded.setdefault(node.name.casefold(), []).append(node)
+            url = normalize_remote_url(node.remote_url)
+            if url:
+                index.by_url.setdefault(url, []).append(node)
+            has_git_dir = os.path.exists(os.path.join(node.path, '.git'))
+            index.shas[node.name] = self.manager.get_head_sha(node.path) if has_git_dir else None
+        return index
+
+    def plan(self, source: EnvIndex, target: EnvIndex) -> List[MigrationPlanItem]:
+        items = []
+        for node in source.by_name.values():
+            items.append(self.classify(node, source, target))
+        items.sort(key=lambda item: item.node.name.lower())
+        return items
+
+    def classify(self, node: Node, source: EnvIndex, target: EnvIndex) -> MigrationPlanItem:
+        source_url = normalize_remote_url(node.remote_url)
+        source_sha = source.shas.get(node.name)
+        item = MigrationPlanItem(node=node, status=STATUS_MISSING, source_sha=source_sha)
+
+        target_node = target.find(node.name)
+        if target_node is None:
+            # Same repository installed under another folder name?
+            candidates = target.by_url.get(source_url, []) if source_url else []
+            # Prefer a folder that is not already matched by its own name
+            candidates = sorted(candidates, key=lambda n: source.find(n.name) is not None)
+            renamed = candidates[0] if candidates else None
+            if renamed is not None:
+                item.status = STATUS_RENAMED
+                item.target_name = renamed.name
+                item.target_url = renamed.remote_url
+                item.target_sha = target.shas.get(renamed.name)
+            return item
+
+        item.target_name = target_node.name
+        item.target_url = target_node.remote_url
+        item.target_sha = target.shas.get(target_node.name)
+        target_url = normalize_remote_url(target_node.remote_url)
+
+        if not source_url or not target_url:
+            item.status = STATUS_EXISTS
+        elif source_url != target_url:
+            item.status = STATUS_DIFFERENT_REMOTE
+        elif not source_sha or not item.target_sha:
+            item.status = STATUS_EXISTS
+        elif source_sha == item.target_sha:
+            item.status = STATUS_IDENTICAL
+        else:
+            item.status = self._compare_history(node.path, source_sha, target_node.path, item.target_sha)
+        return item
+
+    def _compare_history(self, source_path: str, source_sha: str, target_path: str, target_sha: str) -> str:
+        """
+        Decide whether the target checkout is behind or ahead of the source one.
+        Each repo can only answer for commits it already has locally, so ask both.
+        """
+        if self._is_ancestor(source_path, target_sha, source_sha):
+            return STATUS_BEHIND
+        if self._is_ancestor(target_path, source_sha, target_sha):
+            return STATUS_AHEAD
+        return STATUS_DIVERGED
+
+    def _is_ancestor(self, repo_path: str, ancestor: str, descendant: str) -> bool:
+        try:
+            repo = git.Repo(repo_path)
+            return repo.is_ancestor(ancestor, descendant)
+        except Exception:
+            # Commit unknown to this repo
+            return False
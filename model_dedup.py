@@ -0,0 +1,270 @@
+import os
+import json
+import mmap
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from link_engine import same_path
+
+PARTIAL_BYTES = 64 * 1024
+CHUNK_BYTES = 8 * 1024 * 1024
+DEFAULT_MIN_SIZE = 1024 * 1024
+
+MODE_HARDLINK = "hardlink"
+MODE_SYMLINK = "symlink"
+
+
+@dataclass
+class ModelFile:
+    path: str
+    size: int
+    mtime_ns: int
+    dev: int
+    ino: int
+
+
+@dataclass
+class DuplicateGroup:
+    size: int
+    digest: str
+    files: List[ModelFile] = field(default_factory=list)
+
+    @property
+    def reclaimable(self) -> int:
+        return self.size * (len(self.files) - 1)
+
+
+@dataclass
+class DedupReport:
+    groups: List[DuplicateGroup]
+    files_scanned: int = 0
+    bytes_scanned: int = 0
+    bytes_hashed: int = 0
+    cache_hits: int = 0
+
+    @property
+    def reclaimable(self) -> int:
+        return sum(g.reclaimable for g in self.groups)
+
+
+def _partial_hash(path: str, size: int) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(size.to_bytes(8, "little"))
+    with open(path, "rb") as f:
+        h.update(f.read(PARTIAL_BYTES))
+        if size > PARTIAL_BYTES:
+            f.seek(max(size - PARTIAL_BYTES, PARTIAL_BYTES))
+            h.update(f.read(PARTIAL_BYTES))
+    return h.hexdigest()
+
+
+def _full_hash(path: str, size: int) -> str:
+    h = hashlib.sha256()
+    if size == 0:
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            # hashlib drops the GIL for large buffers, so pool workers hash in parallel
+            for offset in range(0, size, CHUNK_BYTES):
+                h.update(view[offset:offset + CHUNK_BYTES])
+    return h.hexdigest()
+
+
+class HashCache:
+    """
+    Persisted partial/full hashes keyed by path, valid while size and mtime are unchanged.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None):
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._dirty = False
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except Exception as e:
+                print(f"Error loading hash cache: {e}")
+
+    def get(self, mf: ModelFile, kind: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(mf.path)
+        if entry and entry["size"] == mf.size and entry["mtime_ns"] == mf.mtime_ns:
+            return entry.get(kind)
+        return None
+
+    def put(self, mf: ModelFile, kind: str, digest: str) -> None:
+        with self._lock:
+            entry = self._entries.get(mf.path)
+            if not entry or entry["size"] != mf.size or entry["mtime_ns"] != mf.mtime_ns:
+                entry = self._entries[mf.path] = {"size": mf.size, "mtime_ns": mf.mtime_ns}
+            entry[kind] = digest
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self.cache_file or not self._dirty:
+            return
+        with self._lock:
+            # Drop entries for files that no longer exist
+            data = {p: e for p, e in self._entries.items() if os.path.exists(p)}
+            self._entries = data
+            self._dirty = False
+        try:
+            with open(self.cache_file, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+        except Exception as e:
+            print(f"Error saving hash cache: {e}")
+
+
+def collect_files(roots: List[str], min_size: int = DEFAULT_MIN_SIZE) -> List[ModelFile]:
+    """
+    All regular files of at least min_size under the roots. Symlinks are not followed and
+    hardlinks to an inode already seen are skipped, so every physical file is counted once.
+    """
+    files = []
+    seen = set()
+    stack = [r for r in roots if r and os.path.isdir(r)]
+    visited = set()
+    while stack:
+        path = stack.pop()
+        try:
+            real = os.path.realpath(path)
+            if real in visited:
+                continue
+            visited.add(real)
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_symlink():
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False):
+                            continue
+                        if entry.stat(follow_symlinks=False).st_size < min_size:
+                            continue
+                        # On Windows DirEntry.stat() leaves st_dev/st_ino/st_nlink at 0, lstat fills them in
+                        st = os.lstat(entry.path)
+                    except OSError:
+                        continue
+                    key = (st.st_dev, st.st_ino)
+                    if st.st_ino and key in seen:
+                        continue
+                    seen.add(key)
+                    files.append(ModelFile(entry.path, st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino))
+        except OSError:
+            continue
+    return files
+
+
+class DedupScanner:
+    """
+    Staged duplicate detection: group by size, then by a head/tail hash, and only
+    hash full contents of files that still collide.
+    """
+
+    def __init__(self, cache_file: Optional[str] = None, max_workers: int = 4, min_size: int = DEFAULT_MIN_SIZE):
+        self.cache = HashCache(cache_file)
+        self.max_workers = max_workers
+        self.min_size = min_size
+
+    def _hash_all(self, files: List[ModelFile], kind: str, fn: Callable[[str, int], str],
+                  report: DedupReport) -> Dict[str, List[ModelFile]]:
+        def _one(mf: ModelFile) -> Tuple[ModelFile, Optional[str], bool]:
+            cached = self.cache.get(mf, kind)
+            if cached:
+                return mf, cached, True
+            try:
+                digest = fn(mf.path, mf.size)
+            except (OSError, ValueError) as e:
+                print(f"Error hashing {mf.path}: {e}")
+                return mf, None, False
+            self.cache.put(mf, kind, digest)
+            return mf, digest, False
+
+        buckets: Dict[str, List[ModelFile]] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for mf, digest, hit in pool.map(_one, files):
+                if digest is None:
+                    continue
+                if hit:
+                    report.cache_hits += 1
+                elif kind == "full":
+                    report.bytes_hashed += mf.size
+                buckets.setdefault(digest, []).append(mf)
+        return {d: g for d, g in buckets.items() if len(g) > 1}
+
+    def scan(self, roots: List[str], progress: Optional[Callable[[str], None]] = None) -> DedupReport:
+        files = collect_files(roots, self.min_size)
+        report = DedupReport(groups=[], files_scanned=len(files), bytes_scanned=sum(f.size for f in files))
+
+        by_size: Dict[int, List[ModelFile]] = {}
+        for mf in files:
+            by_size.setdefault(mf.size, []).append(mf)
+        candidates = [mf for group in by_size.values() if len(group) > 1 for mf in group]
+        if progress:
+            progress(f"{len(files)} 个文件, {len(candidates)} 个大小相同")
+
+        partial = self._hash_all(candidates, "partial", _partial_hash, report)
+        candidates = [mf for group in partial.values() for mf in group]
+        if progress:
+            progress(f"{len(candidates)} 个文件头尾哈希相同, 计算完整哈希...")
+
+        full = self._hash_all(candidates, "full", _full_hash, report)
+        report.groups = sorted(
+            (DuplicateGroup(g[0].size, digest, sorted(g, key=lambda f: f.path)) for digest, g in full.items()),
+            key=lambda g: g.reclaimable, reverse=True)
+        self.cache.save()
+        return report
+
+
+def _pick_keeper(group: DuplicateGroup, prefer_roots: List[str]) -> ModelFile:
+    for root in prefer_roots:
+        if not root:
+            continue
+        root = os.path.normcase(os.path.abspath(root)) + os.sep
+        for mf in group.files:
+            if os.path.normcase(os.path.abspath(mf.path)).startswith(root):
+                return mf
+    return group.files[0]
+
+
+def replace_duplicates(group: DuplicateGroup, mode: str = MODE_HARDLINK,
+                       prefer_roots: Optional[List[str]] = None) -> List[Tuple[str, bool, str]]:
+    """
+    Keep one copy (preferably under one of prefer_roots, e.g. the shared models folder)
+    and replace the others with a hardlink or symlink to it. Each replacement is
+    created beside the duplicate and renamed over it, so a failure never loses the file.
+    """
+    keeper = _pick_keeper(group, prefer_roots or [])
+    results = []
+    for mf in group.files:
+        if mf is keeper or same_path(mf.path, keeper.path):
+            continue
+        try:
+            st = os.stat(mf.path, follow_symlinks=False)
+            if st.st_size != mf.size or st.st_mtime_ns != mf.mtime_ns:
+                results.append((mf.path, False, "文件在扫描后被修改"))
+                continue
+            if mode == MODE_HARDLINK and st.st_dev != keeper.dev:
+                results.append((mf.path, False, "不在同一磁盘，无法硬链接"))
+                continue
+            tmp = mf.path + ".dedup_tmp"
+            if mode == MODE_HARDLINK:
+                os.link(keeper.path, tmp)
+            else:
+                os.symlink(os.path.abspath(keeper.path), tmp)
+            try:
+                os.replace(tmp, mf.path)
+            except OSError:
+                os.unlink(tmp)
+                raise
+            results.append((mf.path, True, keeper.path))
+        except OSError as e:
+            results.append((mf.path, False, str(e)))
+    return results
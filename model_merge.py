@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import shutil
+import filecmp
+from dataclasses import dataclass, field, asdict
+from typing import Callable, List, Optional
+
+from link_engine import create_dir_link, remove_link, is_link
+
+# Merge actions
+MERGE_MOVE = "移动"
+MERGE_RENAME = "重命名移动"
+MERGE_DUPLICATE = "相同跳过"
+
+
+@dataclass
+class MergeOp:
+    rel: str
+    action: str
+    dest: str
+    size: int = 0
+
+
+@dataclass
+class MergePlan:
+    target: str
+    source: str
+    holding: str
+    journal_path: str
+    ops: List[MergeOp] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @property
+    def moved_bytes(self) -> int:
+        return sum(op.size for op in self.ops if op.action != MERGE_DUPLICATE)
+
+    @property
+    def duplicate_bytes(self) -> int:
+        return sum(op.size for op in self.ops if op.action == MERGE_DUPLICATE)
+
+
+def _same_content(a: str, b: str) -> bool:
+    if os.path.islink(a) or os.path.islink(b):
+        return os.path.islink(a) and os.path.islink(b) and os.readlink(a) == os.readlink(b)
+    sa, sb = os.stat(a), os.stat(b)
+    if sa.st_size != sb.st_size:
+        return False
+    if (sa.st_dev, sa.st_ino) == (sb.st_dev, sb.st_ino):
+        return True
+    return filecmp.cmp(a, b, shallow=False)
+
+
+def _free_name(path: str, taken: set) -> str:
+    stem, ext = os.path.splitext(path)
+    i = 1
+    while True:
+        candidate = f"{stem}_{i}{ext}"
+        if candidate not in taken and not os.path.lexists(candidate):
+            return candidate
+        i += 1
+
+
+def plan_models_merge(target: str, source: str, journal_dir: str) -> MergePlan:
+    """
+    Plan moving the files of an existing target folder into the shared source so the
+    target can be replaced by a link without losing anything. Files missing from source
+    are moved as-is, identical ones are dropped, different ones with the same name are
+    moved under a new name. Nothing is changed on disk.
+    """
+    target = os.path.abspath(target)
+    source = os.path.abspath(source)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    plan = MergePlan(
+        target=target,
+        source=source,
+        holding=f"{target}.merged_{stamp}",
+        journal_path=os.path.join(journal_dir, f"merge_{stamp}_{os.path.basename(target)}.jsonl"),
+    )
+    if not os.path.isdir(target) or is_link(target):
+        plan.error = "目标不是普通目录"
+        return plan
+    if not os.path.isdir(source):
+        plan.error = "源目录不存在"
+        return plan
+    if os.stat(target).st_dev != os.stat(source).st_dev:
+        plan.error = "源与目标不在同一磁盘，无法零拷贝移动"
+        return plan
+
+    taken = set()
+    for dirpath, dirnames, filenames in os.walk(target):
+        # Symlinked folders are moved like files, never descended into
+        for name in list(dirnames):
+            if os.path.islink(os.path.join(dirpath, name)):
+                dirnames.remove(name)
+                filenames.append(name)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, target)
+            dest = os.path.join(source, rel)
+            size = os.lstat(path).st_size
+            if not os.path.lexists(dest) and dest not in taken:
+                plan.ops.append(MergeOp(rel, MERGE_MOVE, dest, size))
+            elif os.path.lexists(dest) and _same_content(path, dest):
+                plan.ops.append(MergeOp(rel, MERGE_DUPLICATE, dest, size))
+            else:
+                dest = _free_name(dest, taken)
+                plan.ops.append(MergeOp(rel, MERGE_RENAME, dest, size))
+            taken.add(dest)
+    return plan
+
+
+class _Journal:
+    def __init__(self, path: str):
+        self.path = path
+
+    def write_header(self, plan: MergePlan) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        header = {"target": plan.target, "source": plan.source, "holding": plan.holding,
+                  "ops": [asdict(op) for op in plan.ops]}
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(header, ensure_ascii=False) + "\n")
+
+    def event(self, **data) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def load_journal(path: str):
+    """
+    Return (header, events) of a merge journal.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    return lines[0], lines[1:]
+
+
+def execute_merge(plan: MergePlan, progress: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Move files into source by rename, park the rest of the target in the holding folder
+    and link target -> source. Every step is journaled before the next one starts.
+    """
+    if plan.error:
+        raise Exception(plan.error)
+    journal = _Journal(plan.journal_path)
+    journal.write_header(plan)
+
+    for i, op in enumerate(plan.ops):
+        if op.action == MERGE_DUPLICATE:
+            continue
+        src = os.path.join(plan.target, op.rel)
+        if os.path.lexists(op.dest):
+            raise Exception(f"目标文件已存在: {op.dest}")
+        os.makedirs(os.path.dirname(op.dest), exist_ok=True)
+        # Same volume, so this is a metadata-only rename
+        os.rename(src, op.dest)
+        journal.event(moved=i)
+        if progress:
+            progress(f"{op.action}: {op.rel} -> {op.dest}")
+
+    os.rename(plan.target, plan.holding)
+    journal.event(step="holding")
+    create_dir_link(plan.source, plan.target)
+    journal.event(step="linked")
+
+
+def rollback_merge(journal_path: str, progress: Optional[Callable[[str], None]] = None) -> None:
+    """
+    Undo a (possibly interrupted) merge: remove the link, restore the target folder and move files back.
+    Duplicates are copied back from source if the holding folder was already purged.
+    """
+    header, events = load_journal(journal_path)
+    if any(e.get("step") == "rolled_back" for e in events):
+        raise Exception("该合并已回滚")
+    target, holding = header["target"], header["holding"]
+    ops = [MergeOp(**op) for op in header["ops"]]
+    steps = {e.get("step") for e in events}
+    moved = [e["moved"] for e in events if "moved" in e]
+
+    if "linked" in steps and is_link(target):
+        remove_link(target)
+    if "holding" in steps:
+        if os.path.isdir(holding):
+            os.rename(holding, target)
+        else:
+            os.makedirs(target, exist_ok=True)
+    for i in reversed(moved):
+        op = ops[i]
+        dest = os.path.join(target, op.rel)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.rename(op.dest, dest)
+        if progress:
+            progress(f"还原: {op.rel}")
+    if "purged" in steps:
+        for op in ops:
+            if op.action == MERGE_DUPLICATE:
+                dest = os.path.join(target, op.rel)
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                shutil.copy2(op.dest, dest)
+    _Journal(journal_path).event(step="rolled_back")
+
+
+def purge_holding(journal_path: str) -> int:
+    """
+    Delete the parked duplicates of a finished merge to free their space. Returns bytes freed.
+    """
+    header, events = load_journal(journal_path)
+    steps = {e.get("step") for e in events}
+    if "linked" not in steps or "rolled_back" in steps or "purged" in steps:
+        return 0
+    freed = sum(op["size"] for op in header["ops"] if op["action"] == MERGE_DUPLICATE)
+    shutil.rmtree(header["holding"], ignore_errors=True)
+    _Journal(journal_path).event(step="purged")
+    return freed
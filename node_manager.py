@@ -3,14 +3,70 @@ import git
 import json
 import shutil
 import datetime
-from typing import List, Optional, Dict
+import threading
+from typing import Callable, List, Optional, Dict, TypeVar
 from dataclasses import dataclass
 
+from metrics import span
+from git_refs import CommitInfoCache, CommitInfo, resolve_git_dir, read_head, read_config
+from git_retry import RetryPolicy, TransferReport, classify_error, object_store_size, ERR_LOCAL
+from requirements_analyzer import PackageSnapshotCache, parse_requirements_file, unmet_requirements
+
 # Use absolute path for metadata file to avoid issues with CWD
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 META_FILE = os.path.join(BASE_DIR, "nodes_meta.json")
+COMMIT_CACHE_FILE = os.path.join(BASE_DIR, "commit_cache.json")
+# Written into the git dir while clone_node fetches the history, an interrupted clone keeps it
+CLONE_INCOMPLETE_MARKER = "sync-clone-incomplete"
+
+def resolve_custom_nodes_path(comfy_root: str) -> str:
+    """
+    Infer the custom_nodes directory of a ComfyUI root.
+    Standard installs keep it under ComfyUI/, portable roots may be the ComfyUI folder itself.
+    """
+    cn_path = os.path.join(comfy_root, "ComfyUI", "custom_nodes")
+    if not os.path.exists(cn_path):
+        cn_path = os.path.join(comfy_root, "custom_nodes")
+    return cn_path
+
+def resolve_python_path(comfy_root: str) -> Optional[str]:
+    """
+    Return the embedded python of a portable ComfyUI root, if present.
+    """
+    py_path = os.path.join(comfy_root, "python_embeded", "python.exe")
+    if os.path.exists(py_path):
+        return py_path
+    return None
 
-@dataclass
+def normalize_remote_url(url: Optional[str]) -> Optional[str]:
+    """
+    Normalize a git remote URL so different spellings of the same repository compare equal.
+    e.g. 'git@github.com:Owner/Repo.git' and 'https://github.com/owner/repo/' -> 'github.com/owner/repo'
+    """
+    if not url:
+        return None
+    url = url.strip()
+    if not url or url == "-":
+        return None
+    # scp-like syntax: user@host:owner/repo (but not a Windows drive path like C:\repos)
+    is_drive_path = len(url) > 2 and url[1] == ":" and url[2] in "\\/"
+    if is_drive_path:
+        url = url.replace("\\", "/")
+    elif "://" not in url and ":" in url.split("/")[0]:
+        host, _, rest = url.partition(":")
+        url = f"{host.split('@')[-1]}/{rest}"
+    else:
+        url = url.split("://", 1)[-1]
+        # Drop credentials
+        head, sep, tail = url.partition("/")
+        url = head.split("@")[-1] + sep + tail
+    url = url.rstrip("/")
+    if url.endswith(".git"):
+        url = url[:-4]
+    return url.lower()
+
+# Slotted: fleets index tens of thousands of these, see node_table.NodeTable for bulk storage
+@dataclass(slots=True)
 class Node:
     name: str
     path: str
@@ -22,9 +78,20 @@ class Node:
     def __repr__(self):
         return f"Node(name='{self.name}', is_git={self.is_git_repo}, url='{self.remote_url}', last_update='{self.last_update_time}', install_time='{self.install_time}')"
 
+T = TypeVar("T")
+
 class NodeManager:
     def __init__(self):
         self.metadata = self.load_metadata()
+        # Bulk actions run in worker threads, serialize writes to the metadata file
+        self._meta_lock = threading.RLock()
+        self.commit_cache = CommitInfoCache(COMMIT_CACHE_FILE)
+        self.package_snapshots = PackageSnapshotCache()
+        # Optional shared wheelhouse.Wheelhouse, installs go through it when set
+        self.wheelhouse = None
+        # Optional git_mirrors.MirrorSelector, clone/fetch/pull try the fastest endpoint first
+        self.mirrors = None
+        self.retry_policy = RetryPolicy()
 
     def load_metadata(self) -> Dict[str, Dict]:
         if os.path.exists(META_FILE):
@@ -36,11 +103,12 @@ class NodeManager:
         return {}
 
     def save_metadata(self):
-        try:
-            with open(META_FILE, 'w') as f:
-                json.dump(self.metadata, f, indent=4)
-        except Exception as e:
-            print(f"Error saving metadata: {e}")
+        with self._meta_lock:
+            try:
+                with open(META_FILE, 'w') as f:
+                    json.dump(self.metadata, f, indent=4)
+            except Exception as e:
+                print(f"Error saving metadata: {e}")
 
     def remove_node_metadata(self, node_name: str) -> None:
         if node_name in self.metadata:
@@ -54,21 +122,23 @@ class NodeManager:
         node_name = os.path.basename(node_path)
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        if node_name not in self.metadata:
-            self.metadata[node_name] = {}
-        
-        self.metadata[node_name]["last_updated"] = now
-        self.save_metadata()
+        with self._meta_lock:
+            if node_name not in self.metadata:
+                self.metadata[node_name] = {}
+            
+            self.metadata[node_name]["last_updated"] = now
+            self.save_metadata()
         return now
 
     def set_node_install_time(self, node_name: str):
         now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        if node_name not in self.metadata:
-            self.metadata[node_name] = {}
-            
-        self.metadata[node_name]["install_time"] = now
-        self.save_metadata()
+        with self._meta_lock:
+            if node_name not in self.metadata:
+                self.metadata[node_name] = {}
+                
+            self.metadata[node_name]["install_time"] = now
+            self.save_metadata()
         return now
 
     def set_node_git_url(self, node_name: str, url: str):
@@ -90,6 +160,48 @@ class NodeManager:
             env['no_proxy'] = 'localhost,127.0.0.1'
         return env
 
+    def _on_best_endpoint(self, url: Optional[str], proxy: Optional[str], op: Callable[[Dict[str, str]], T],
+                          report: Optional[TransferReport] = None) -> T:
+        """
+        Run op(extra_env) against the mirror endpoints of url, best ranked first, until one succeeds.
+        extra_env only rewrites the transfer URL, the remote stays pointing upstream.
+        Transient failures are retried with backoff on the same endpoint before moving on;
+        local failures (conflicts, dirty tree) are raised at once.
+        """
+        endpoints = self.mirrors.rank(url, env=self._get_git_env(proxy)) if self.mirrors and url else []
+        last_error = None
+        for endpoint in endpoints or [None]:
+            extra_env = endpoint.git_env() if endpoint else {}
+            try:
+                result = self.retry_policy.run(lambda: op(extra_env), report)
+            except Exception as e:
+                last_error = e
+                if endpoint is None:
+                    raise
+                self.mirrors.record(endpoint, False)
+                print(f"Endpoint {endpoint.prefix} failed for {url}: {e}")
+                if classify_error(e) == ERR_LOCAL:
+                    break
+                continue
+            if endpoint is not None:
+                self.mirrors.record(endpoint, True)
+                self.mirrors.save()
+            return result
+        self.mirrors.save()
+        raise last_error
+
+    def is_partial_clone(self, target_dir: str, url: str) -> bool:
+        """
+        True when target_dir holds an interrupted clone of url that clone_node can resume.
+        Only clones started by clone_node carry the marker; a repo the user cloned with
+        --depth on purpose is shallow too but must not have its full history fetched.
+        """
+        git_dir = resolve_git_dir(target_dir)
+        if not git_dir or not os.path.exists(os.path.join(git_dir, CLONE_INCOMPLETE_MARKER)):
+            return False
+        origin = read_config(git_dir).get('remote "origin"', {}).get("url")
+        return normalize_remote_url(origin) == normalize_remote_url(url)
+
     def scan_directory(self, path: str) -> List[Node]:
         """
         Scan the directory for ComfyUI nodes.
@@ -99,49 +211,75 @@ class NodeManager:
             raise FileNotFoundError(f"The path {path} does not exist.")
 
         nodes = []
-        # List all subdirectories in the given path
-        for item in os.listdir(path):
-            item_path = os.path.join(path, item)
-            if os.path.isdir(item_path) and not item.startswith('.'):
-                if item == "__pycache__":
-                    continue
-                # Check if it's a git repository
-                is_git = False
-                remote_url = None
-                
-                try:
-                    # Check for .git directory explicitly or try initializing Repo object
-                    if os.path.exists(os.path.join(item_path, '.git')):
-                        repo = git.Repo(item_path)
-                        is_git = True
-                        try:
-                            remote_url = repo.remotes.origin.url
-                        except (AttributeError, IndexError):
-                            # Handle cases where origin might not exist
-                            pass
-                except git.InvalidGitRepositoryError:
-                    is_git = False
-                except Exception as e:
-                    print(f"Error scanning {item}: {e}")
-
-                # If not a git repo, check metadata for manually set URL
-                if not is_git:
-                    manual_url = self.metadata.get(item, {}).get("git_url")
-                    if manual_url:
-                        remote_url = manual_url
-                        # Treat as Git repo for migration purposes if URL is present
-                        is_git = True 
-
-                nodes.append(Node(
-                    name=item,
-                    path=item_path,
-                    is_git_repo=is_git,
-                    remote_url=remote_url,
-                    last_update_time=self.metadata.get(item, {}).get("last_updated"),
-                    install_time=self.metadata.get(item, {}).get("install_time")
-                ))
+        with span("scan", node=os.path.basename(os.path.normpath(path))):
+            # List all subdirectories in the given path
+            for item in os.listdir(path):
+                node = self.scan_node(os.path.join(path, item))
+                if node:
+                    nodes.append(node)
         return nodes
 
+    def scan_node(self, item_path: str) -> Optional[Node]:
+        """
+        Scan a single node directory.
+        Returns None if the path is not a node folder (missing, hidden or __pycache__).
+        """
+        item = os.path.basename(item_path)
+        if not os.path.isdir(item_path) or item.startswith('.') or item == "__pycache__":
+            return None
+
+        # Check if it's a git repository
+        is_git = False
+        remote_url = None
+        
+        try:
+            # Check for .git directory explicitly or try initializing Repo object
+            if os.path.exists(os.path.join(item_path, '.git')):
+                repo = git.Repo(item_path)
+                is_git = True
+                try:
+                    remote_url = repo.remotes.origin.url
+                except (AttributeError, IndexError):
+                    # Handle cases where origin might not exist
+                    pass
+        except git.InvalidGitRepositoryError:
+            is_git = False
+        except Exception as e:
+            print(f"Error scanning {item}: {e}")
+
+        # If not a git repo, check metadata for manually set URL
+        if not is_git:
+            manual_url = self.metadata.get(item, {}).get("git_url")
+            if manual_url:
+                remote_url = manual_url
+                # Treat as Git repo for migration purposes if URL is present
+                is_git = True 
+
+        return Node(
+            name=item,
+            path=item_path,
+            is_git_repo=is_git,
+            remote_url=remote_url,
+            last_update_time=self.metadata.get(item, {}).get("last_updated"),
+            install_time=self.metadata.get(item, {}).get("install_time")
+        )
+
+    def get_head_sha(self, node_path: str) -> Optional[str]:
+        """
+        Get the HEAD commit SHA of a git repository at node_path.
+        """
+        git_dir = resolve_git_dir(node_path)
+        if not git_dir:
+            return None
+        return read_head(git_dir)[1]
+
+    def get_commit_info(self, node_path: str) -> Optional[CommitInfo]:
+        """
+        Get cached commit summary, author, date and ahead/behind counts for a node.
+        Only re-queried when HEAD or the remote-tracking ref moved.
+        """
+        return self.commit_cache.get(node_path)
+
     def get_git_url(self, node_path: str) -> Optional[str]:
         """
         Get the remote URL of a git repository at node_path.
@@ -153,30 +291,73 @@ class NodeManager:
             return None
 
     def clone_node(self, url: str, target_dir: str, proxy: Optional[str] = None) -> str:
+        """
+        Clone in two stages, the checked-out tip first and then the rest of the history.
+        A failure in the second stage keeps what was downloaded; calling clone_node again
+        on the same folder resumes from there instead of starting over.
+        """
+        report = TransferReport()
         if os.path.exists(target_dir) and os.listdir(target_dir):
-            raise FileExistsError(f"Target directory {target_dir} is not empty.")
+            if not self.is_partial_clone(target_dir, url):
+                raise FileExistsError(f"Target directory {target_dir} is not empty.")
+            report.resumed = True
         import subprocess
         env = os.environ.copy()
         if proxy:
             env['http_proxy'] = proxy
             env['https_proxy'] = proxy
             env['no_proxy'] = 'localhost,127.0.0.1'
-        cmd = ['git', 'clone', url, target_dir]
-        try:
-            res = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
-            output = ""
-            if res.stdout:
-                output += res.stdout + "\n"
-            if res.stderr:
-                output += res.stderr + "\n"
-            return output.strip()
-        except subprocess.CalledProcessError as e:
-            msg = ""
-            if e.stdout:
-                msg += e.stdout + "\n"
-            if e.stderr:
-                msg += e.stderr + "\n"
-            raise Exception(msg.strip() or str(e))
+        node = os.path.basename(os.path.normpath(target_dir))
+        outputs = []
+
+        def _run(cmd: List[str], extra_env: Dict[str, str]) -> None:
+            try:
+                res = subprocess.run(cmd, env={**env, **extra_env}, check=True, capture_output=True, text=True)
+                if res.stdout:
+                    outputs.append(res.stdout.strip())
+                if res.stderr:
+                    outputs.append(res.stderr.strip())
+            except subprocess.CalledProcessError as e:
+                msg = ""
+                if e.stdout:
+                    msg += e.stdout + "\n"
+                if e.stderr:
+                    msg += e.stderr + "\n"
+                raise Exception(msg.strip() or str(e))
+
+        def _clone_tip(extra_env: Dict[str, str]) -> None:
+            # git removes the folder when this fails, only the small tip download is lost
+            _run(['git', 'clone', '--depth', '1', '--no-single-branch', url, target_dir], extra_env)
+
+        attempts = 0
+
+        def _fetch_history(extra_env: Dict[str, str]) -> None:
+            nonlocal attempts
+            if attempts or report.resumed:
+                report.bytes_saved += object_store_size(resolve_git_dir(target_dir))
+            attempts += 1
+            _run(['git', '-C', target_dir, 'fetch', '--unshallow', '--tags', 'origin'], extra_env)
+
+        with span("clone", node=node):
+            if not report.resumed:
+                self._on_best_endpoint(url, proxy, _clone_tip, report)
+            marker = os.path.join(resolve_git_dir(target_dir), CLONE_INCOMPLETE_MARKER)
+            try:
+                # Local-path clones and single-commit histories are complete after the first stage
+                if os.path.exists(os.path.join(resolve_git_dir(target_dir), "shallow")):
+                    with open(marker, "w", encoding="utf-8") as f:
+                        f.write(url + "\n")
+                    self._on_best_endpoint(url, proxy, _fetch_history, report)
+                if os.path.exists(marker):
+                    os.remove(marker)
+            except Exception as e:
+                note = report.describe()
+                raise Exception(f"{e}\n历史记录未下载完整，已下载的部分保留在 {target_dir}，再次安装/恢复时将续传"
+                                + (f"\n{note}" if note else ""))
+        note = report.describe()
+        if note:
+            outputs.append(note)
+        return "\n".join(outputs)
 
     def copy_node(self, source_path: str, target_path: str) -> None:
         """
@@ -185,7 +366,8 @@ class NodeManager:
         if os.path.exists(target_path):
              raise FileExistsError(f"Target directory {target_path} already exists.")
         
-        shutil.copytree(source_path, target_path)
+        with span("copy", node=os.path.basename(os.path.normpath(source_path))):
+            shutil.copytree(source_path, target_path)
 
     def delete_node(self, node_path: str) -> None:
         if not os.path.exists(node_path):
@@ -199,10 +381,11 @@ class NodeManager:
                 func(path)
             except Exception:
                 pass
-        if os.path.isdir(node_path):
-            shutil.rmtree(node_path, onerror=onerror)
-        else:
-            os.remove(node_path)
+        with span("delete", node=os.path.basename(os.path.normpath(node_path))):
+            if os.path.isdir(node_path):
+                shutil.rmtree(node_path, onerror=onerror)
+            else:
+                os.remove(node_path)
 
 
     def check_update(self, node_path: str, proxy: Optional[str] = None) -> bool:
@@ -224,25 +407,19 @@ class NodeManager:
                 env_args['https_proxy'] = proxy
                 env_args['no_proxy'] = 'localhost,127.0.0.1'
 
-            with repo.git.custom_environment(**env_args):
-                 repo.remotes.origin.fetch()
+            def _fetch(extra_env: Dict[str, str]) -> None:
+                with repo.git.custom_environment(**env_args, **extra_env), span("fetch", node=os.path.basename(node_path)):
+                    repo.remotes.origin.fetch()
 
-            # Check if main/master branch is behind origin
-            # This logic assumes the current branch is tracking a remote branch.
-            
-            if repo.head.is_detached:
-                return False # Cannot check update easily for detached head without more context
-            
-            active_branch = repo.active_branch
-            tracking_branch = active_branch.tracking_branch()
-            
-            if not tracking_branch:
-                return False
-            
-            # Compare commits
-            # if remote has commits that local doesn't have
-            commits_behind = list(repo.iter_commits(f'{active_branch.name}..{tracking_branch.name}'))
-            return len(commits_behind) > 0
+            report = TransferReport()
+            self._on_best_endpoint(repo.remotes.origin.url, proxy, _fetch, report)
+            if report.retries:
+                print(f"{os.path.basename(node_path)}: {report.describe()}")
+
+            # Check if the current branch is behind its remote-tracking branch.
+            # Detached HEADs and branches without upstream have no ahead/behind counts.
+            info = self.commit_cache.get(node_path)
+            return bool(info and info.behind)
 
         except Exception as e:
             print(f"Error checking update for {node_path}: {e}")
@@ -254,19 +431,15 @@ class NodeManager:
         Returns a formatted string with hash, author, date, and message.
         """
         try:
-            repo = git.Repo(node_path)
-            commit = repo.head.commit
-            
-            # Format time
-            import datetime
-            dt = datetime.datetime.fromtimestamp(commit.committed_date)
-            formatted_time = dt.strftime("%Y-%m-%d %H:%M:%S")
+            commit = self.commit_cache.get(node_path)
+            if commit is None:
+                return "Could not get commit info: no commit found"
             
             info = (
-                f"Last Commit: {commit.hexsha[:7]}\n"
-                f"Author: {commit.author.name}\n"
-                f"Date: {formatted_time}\n"
-                f"Message: {commit.message.strip()}"
+                f"Last Commit: {commit.head_sha[:7]}\n"
+                f"Author: {commit.author}\n"
+                f"Date: {commit.formatted_date}\n"
+                f"Message: {commit.summary}"
             )
             return info
         except Exception as e:
@@ -286,34 +459,62 @@ class NodeManager:
                 env_args['https_proxy'] = proxy
                 env_args['no_proxy'] = 'localhost,127.0.0.1'
 
-            with repo.git.custom_environment(**env_args):
-                # Use execute to capture both stdout and stderr
-                # with_extended_output=True returns (status, stdout, stderr)
-                ret = repo.git.execute(['git', 'pull'], with_extended_output=True)
-                _, stdout, stderr = ret
-                
-                # Combine stdout and stderr for full feedback
-                output = ""
-                if stdout:
-                    output += f"{stdout}\n"
-                if stderr:
-                    output += f"{stderr}\n"
-                
-                return output.strip()
-            
+            def _pull(extra_env: Dict[str, str]) -> str:
+                with repo.git.custom_environment(**env_args, **extra_env):
+                    # Use execute to capture both stdout and stderr
+                    # with_extended_output=True returns (status, stdout, stderr)
+                    with span("pull", node=os.path.basename(node_path)):
+                        ret = repo.git.execute(['git', 'pull'], with_extended_output=True)
+                    _, stdout, stderr = ret
+
+                    # Combine stdout and stderr for full feedback
+                    output = ""
+                    if stdout:
+                        output += f"{stdout}\n"
+                    if stderr:
+                        output += f"{stderr}\n"
+
+                    return output.strip()
+
+            report = TransferReport()
+            output = self._on_best_endpoint(repo.remotes.origin.url, proxy, _pull, report)
+            note = report.describe()
+            return f"{output}\n{note}" if note else output
+
          except Exception as e:
              error_msg = f"Error pulling {node_path}: {e}"
              print(error_msg)
              raise Exception(error_msg)
 
-    def install_requirements(self, node_path: str, python_path: str, proxy: Optional[str] = None) -> None:
+    def requirements_satisfied(self, node_path: str, python_path: str) -> bool:
+        """
+        Check a node's requirements.txt against the cached package snapshot of the interpreter.
+        """
+        requirements_path = os.path.join(node_path, "requirements.txt")
+        if not os.path.exists(requirements_path):
+            return True
+        probe = self.package_snapshots.get(python_path)
+        entries = parse_requirements_file(requirements_path, os.path.basename(node_path))
+        return not unmet_requirements(entries, probe)
+
+    def install_requirements(self, node_path: str, python_path: str, proxy: Optional[str] = None,
+                             skip_satisfied: bool = True) -> bool:
         """
         Install requirements.txt for a node using the specified python executable.
+        Returns False when pip was not run because nothing needed to change.
         """
         requirements_path = os.path.join(node_path, "requirements.txt")
         if not os.path.exists(requirements_path):
             print(f"No requirements.txt found in {node_path}")
-            return
+            return False
+
+        if skip_satisfied:
+            try:
+                if self.requirements_satisfied(node_path, python_path):
+                    print(f"Requirements already satisfied for {os.path.basename(node_path)}, skipping pip")
+                    return False
+            except Exception as e:
+                print(f"Could not check installed packages, running pip: {e}")
 
         import subprocess
         
@@ -329,11 +530,19 @@ class NodeManager:
         try:
             # using shell=False is safer, but on Windows with complex paths sometimes shell=True helps. 
             # Sticking to shell=False with full paths.
-            subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+            with span("pip", node=os.path.basename(node_path)):
+                if self.wheelhouse and self.wheelhouse.install(requirements_path, python_path, env):
+                    print(f"Installed {os.path.basename(node_path)} from wheelhouse")
+                else:
+                    subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
             print(f"Successfully installed requirements for {os.path.basename(node_path)}")
+            return True
         except subprocess.CalledProcessError as e:
             print(f"Failed to install requirements for {node_path}. Error: {e.stderr}")
             raise
+        finally:
+            # pip may have changed packages even on failure
+            self.package_snapshots.invalidate(python_path)
 
     def create_backup(self, nodes: List[Node], output_path: str):
         """
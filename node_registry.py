@@ -0,0 +1,227 @@
+import os
+import re
+import json
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Tuple
+
+from node_manager import normalize_remote_url
+
+# Bump when the cached index layout changes
+_CACHE_VERSION = 3
+
+# How a registry entry was matched to a folder
+MATCH_FOLDER = "目录名"
+MATCH_FUZZY = "模糊"
+
+# Trigrams shared by more than this share of entries (e.g. from "comfyui") only add noise
+_COMMON_TRIGRAM_RATIO = 0.1
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+# Folders unpacked from a GitHub zip download carry the branch name
+_BRANCH_SUFFIX_RE = re.compile(r"[-_](main|master)$", re.IGNORECASE)
+
+
+@dataclass
+class RegistryEntry:
+    title: str
+    url: str
+    folder: str
+    author: str = ""
+    description: str = ""
+
+
+@dataclass
+class RegistryMatch:
+    entry: RegistryEntry
+    score: float
+    how: str
+
+
+def name_key(name: str) -> str:
+    """
+    Folder/repo name reduced to lowercase alphanumerics, so 'ComfyUI_IPAdapter_plus'
+    and 'comfyui-ipadapter-plus-main' share a key.
+    """
+    name = _BRANCH_SUFFIX_RE.sub("", name.strip())
+    if name.lower().endswith(".git"):
+        name = name[:-4]
+    return _NON_ALNUM_RE.sub("", name.lower())
+
+
+def trigrams(key: str) -> frozenset:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def _folder_of(url: str) -> str:
+    name = url.rstrip("/").split("/")[-1]
+    return name[:-4] if name.endswith(".git") else name
+
+
+def _parse_entries(data) -> List[RegistryEntry]:
+    """
+    ComfyUI-Manager custom-node-list.json ({"custom_nodes": [...]}), a plain list of
+    such items, or a {folder: url} mapping.
+    """
+    if isinstance(data, dict) and "custom_nodes" in data:
+        data = data["custom_nodes"]
+    entries = []
+    if isinstance(data, dict):
+        for folder, url in data.items():
+            if isinstance(url, str) and url:
+                entries.append(RegistryEntry(title=folder, url=url, folder=folder))
+        return entries
+    for item in data if isinstance(data, list) else []:
+        if not isinstance(item, dict):
+            continue
+        url = None
+        if item.get("install_type", "git-clone") == "git-clone":
+            files = item.get("files") or []
+            url = next((f for f in files if isinstance(f, str) and f.startswith(("http", "git@"))), None)
+        url = url or item.get("reference") or item.get("url") or item.get("repository")
+        if not url:
+            continue
+        entries.append(RegistryEntry(
+            title=item.get("title") or item.get("name") or _folder_of(url),
+            url=url,
+            folder=item.get("folder") or _folder_of(url),
+            author=item.get("author", ""),
+            description=item.get("description", ""),
+        ))
+    return entries
+
+
+class NodeRegistry:
+    """
+    Index over one or more local registry files: exact lookups by folder/repo name key
+    and normalized URL, plus a trigram index for fuzzy name matching.
+    """
+
+    def __init__(self, entries: List[RegistryEntry]):
+        self.entries: List[RegistryEntry] = []
+        self.by_key: Dict[str, List[int]] = {}
+        self.by_url: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.postings: Dict[str, List[int]] = {}
+        for entry in entries:
+            url = normalize_remote_url(entry.url)
+            # Unusable URLs would all collide under None, and there is nothing to write back anyway
+            if url is None or url in self.by_url:
+                continue
+            i = len(self.entries)
+            self.entries.append(entry)
+            self.by_url[url] = i
+            keys = {name_key(entry.folder), name_key(_folder_of(entry.url))}
+            for key in keys:
+                if key:
+                    self.by_key.setdefault(key, []).append(i)
+            key = name_key(entry.folder)
+            self.keys.append(key)
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, []).append(i)
+        limit = max(50, int(len(self.entries) * _COMMON_TRIGRAM_RATIO))
+        self.common = {g for g, ids in self.postings.items() if len(ids) > limit}
+
+    @classmethod
+    def load(cls, paths: List[str], cache_file: Optional[str] = None) -> "NodeRegistry":
+        """
+        Build the index from registry files. With cache_file, the built index is reused
+        while every source file keeps its size and mtime.
+        """
+        signature = [_CACHE_VERSION]
+        for path in paths:
+            st = os.stat(path)
+            signature.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("signature") == signature:
+                    return cls._from_cache(data)
+            except Exception as e:
+                print(f"Error loading registry cache: {e}")
+
+        entries = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                entries.extend(_parse_entries(json.load(f)))
+        registry = cls(entries)
+        if cache_file:
+            try:
+                with open(cache_file, "w", encoding="utf-8") as f:
+                    json.dump(registry._to_cache(signature), f, ensure_ascii=False)
+            except Exception as e:
+                print(f"Error saving registry cache: {e}")
+        return registry
+
+    def _to_cache(self, signature: list) -> Dict:
+        return {
+            "signature": signature,
+            "entries": [asdict(entry) for entry in self.entries],
+            "by_key": self.by_key,
+            "by_url": self.by_url,
+            "keys": self.keys,
+            "postings": self.postings,
+            "common": sorted(self.common),
+        }
+
+    @classmethod
+    def _from_cache(cls, data: Dict) -> "NodeRegistry":
+        registry = cls([])
+        registry.entries = [RegistryEntry(**entry) for entry in data["entries"]]
+        registry.by_key = data["by_key"]
+        registry.by_url = data["by_url"]
+        registry.keys = data["keys"]
+        registry.postings = data["postings"]
+        registry.common = set(data["common"])
+        return registry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def lookup_url(self, url: str) -> Optional[RegistryEntry]:
+        i = self.by_url.get(normalize_remote_url(url))
+        return None if i is None else self.entries[i]
+
+    def lookup(self, name: str, limit: int = 5, min_score: float = 0.4) -> List[RegistryMatch]:
+        """
+        Candidates for a folder name, best first. Exact key matches score 1.0, the rest
+        are ranked by trigram Jaccard similarity.
+        """
+        key = name_key(name)
+        if not key:
+            return []
+        exact = self.by_key.get(key, [])
+        if exact:
+            return [RegistryMatch(self.entries[i], 1.0, MATCH_FOLDER) for i in exact[:limit]]
+
+        query = trigrams(key)
+        candidates: Dict[int, int] = {}
+        for gram in query:
+            if gram in self.common:
+                continue
+            for i in self.postings.get(gram, ()):
+                candidates[i] = candidates.get(i, 0) + 1
+        # Only the entries sharing the most rare trigrams get an exact Jaccard score;
+        # their trigram sets are rebuilt here instead of being stored, which keeps the cache small
+        shortlist = sorted(candidates, key=candidates.get, reverse=True)[:limit * 10]
+        scored: List[Tuple[float, int]] = []
+        for i in shortlist:
+            grams = trigrams(self.keys[i])
+            shared = len(query & grams)
+            score = shared / (len(query) + len(grams) - shared)
+            if score >= min_score:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [RegistryMatch(self.entries[i], round(score, 3), MATCH_FUZZY) for score, i in scored[:limit]]
+
+    def suggest(self, names: List[str], min_score: float = 0.4) -> Dict[str, RegistryMatch]:
+        """
+        Best match for each folder name that has one.
+        """
+        suggestions = {}
+        for name in names:
+            matches = self.lookup(name, limit=1, min_score=min_score)
+            if matches:
+                suggestions[name] = matches[0]
+        return suggestions
@@ -0,0 +1,259 @@
+import os
+import re
+import time
+import errno
+import shutil
+import tempfile
+import subprocess
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from metrics import span
+from git_refs import resolve_git_dir
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# Repair tiers, cheapest first
+TIER_NONE = "无需修复"
+TIER_INDEX = "重建索引"
+TIER_RESET = "本地还原"
+TIER_FETCH = "补全对象"
+TIER_RECLONE = "重新克隆"
+
+# What to do with local modifications before a hard reset
+LOCAL_STASH = "stash"
+LOCAL_REPORT = "report"
+LOCAL_DISCARD = "discard"
+
+_LOOSE_OBJECT_RE = re.compile(r"objects[/\\]([0-9a-f]{2})[/\\]([0-9a-f]{38,62})")
+
+
+@dataclass
+class RepairResult:
+    name: str
+    ok: bool
+    tier: str = TIER_NONE
+    message: str = ""
+    local_changes: List[str] = field(default_factory=list)
+    stash: Optional[str] = None
+    backup_path: Optional[str] = None
+    steps: List[str] = field(default_factory=list)
+
+
+class NodeRepairer:
+    """
+    Tiered repair of a Git node: verify integrity, rebuild a corrupt index, restore tracked
+    files from local objects, fetch missing objects, and re-clone only when all of that fails.
+    """
+
+    def __init__(self, manager, local_changes: str = LOCAL_STASH, backup_dir: Optional[str] = None):
+        self.manager = manager
+        self.local_changes = local_changes
+        # Temp clones and kept broken copies go here: inside custom_nodes ComfyUI would import them
+        self.backup_dir = backup_dir or os.path.join(tempfile.gettempdir(), "comfynode_repair")
+
+    def _git(self, node_path: str, *args: str, env: Optional[dict] = None) -> subprocess.CompletedProcess:
+        return subprocess.run(["git", *args], cwd=node_path, env=env, capture_output=True, text=True,
+                              creationflags=_CREATE_NO_WINDOW)
+
+    def _head_ok(self, node_path: str) -> bool:
+        return self._git(node_path, "rev-parse", "--verify", "--quiet", "HEAD^{commit}").returncode == 0
+
+    def _fsck(self, node_path: str) -> subprocess.CompletedProcess:
+        return self._git(node_path, "fsck", "--no-dangling", "--no-progress")
+
+    def _status(self, node_path: str) -> subprocess.CompletedProcess:
+        # Untracked files are never touched by a reset, only tracked changes matter here
+        return self._git(node_path, "status", "--porcelain", "-uno")
+
+    def _quarantine_corrupt_objects(self, node_path: str, fsck_output: str) -> int:
+        """
+        Move corrupt loose objects aside so a fetch can write them again.
+        """
+        git_dir = resolve_git_dir(node_path)
+        quarantine = os.path.join(git_dir, "corrupt-objects")
+        moved = 0
+        for prefix, rest in set(_LOOSE_OBJECT_RE.findall(fsck_output)):
+            path = os.path.join(git_dir, "objects", prefix, rest)
+            if os.path.isfile(path):
+                os.makedirs(quarantine, exist_ok=True)
+                os.replace(path, os.path.join(quarantine, prefix + rest))
+                moved += 1
+        return moved
+
+    def _save_local_changes(self, node_path: str, result: RepairResult) -> bool:
+        """
+        Returns False when the repair must stop because changes were only reported.
+        """
+        status = self._status(node_path)
+        if status.returncode != 0:
+            return True
+        result.local_changes = [line[3:] for line in status.stdout.splitlines() if line.strip()]
+        if not result.local_changes:
+            return True
+        if self.local_changes == LOCAL_REPORT:
+            result.message = f"有 {len(result.local_changes)} 个本地修改，未执行还原"
+            return False
+        if self.local_changes == LOCAL_DISCARD:
+            result.steps.append(f"丢弃 {len(result.local_changes)} 个本地修改")
+            return True
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        res = self._git(node_path, "-c", "user.name=ComfyNode Sync", "-c", "user.email=sync@localhost",
+                        "stash", "push", "-m", f"ComfyNode Sync repair {stamp}")
+        if res.returncode == 0:
+            result.stash = "stash@{0}"
+            result.steps.append(f"本地修改已保存到 {result.stash}")
+            return True
+        # A broken object store can make stash fail, keep the files instead of resetting over them
+        result.message = f"无法保存本地修改: {res.stderr.strip()}"
+        return False
+
+    def _reset(self, node_path: str, result: RepairResult) -> bool:
+        if not self._save_local_changes(node_path, result):
+            return False
+        res = self._git(node_path, "reset", "-q", "--hard", "HEAD")
+        if res.returncode != 0:
+            result.steps.append(f"reset 失败: {res.stderr.strip()}")
+            return False
+        status = self._status(node_path)
+        return status.returncode == 0 and not status.stdout.strip()
+
+    def repair(self, node_path: str, remote_url: Optional[str], proxy: Optional[str] = None,
+               progress: Optional[Callable[[str], None]] = None) -> RepairResult:
+        name = os.path.basename(os.path.normpath(node_path))
+        result = RepairResult(name=name, ok=False)
+
+        def step(msg: str) -> None:
+            result.steps.append(msg)
+            if progress:
+                progress(f"  {name}: {msg}")
+
+        with span("repair", node=name):
+            if resolve_git_dir(node_path) and self._repair_in_place(node_path, proxy, result, step):
+                result.ok = True
+                return result
+            if result.message:
+                # Stopped on purpose (reported local changes), never re-clone over them
+                return result
+            if not remote_url or remote_url == "-":
+                result.message = "本地修复失败且没有远程地址，无法重新克隆"
+                return result
+            self._reclone(node_path, remote_url, proxy, result, step)
+        return result
+
+    def _repair_in_place(self, node_path: str, proxy: Optional[str], result: RepairResult,
+                         step: Callable[[str], None]) -> bool:
+        # 1. Index: a corrupt index breaks every status/reset, rebuild it from HEAD
+        status = self._status(node_path)
+        if status.returncode != 0 and "index" in status.stderr.lower() and self._head_ok(node_path):
+            git_dir = resolve_git_dir(node_path)
+            try:
+                os.remove(os.path.join(git_dir, "index"))
+            except OSError:
+                pass
+            if self._git(node_path, "reset", "-q").returncode == 0:
+                result.tier = TIER_INDEX
+                step("索引已从 HEAD 重建")
+
+        # 2. Objects intact: restore tracked files from the local store, no download
+        fsck = self._fsck(node_path)
+        if fsck.returncode == 0 and self._head_ok(node_path):
+            status = self._status(node_path)
+            if status.returncode == 0 and not status.stdout.strip():
+                step("完整性检查通过，工作区无异常")
+                return True
+            if result.tier == TIER_NONE:
+                result.tier = TIER_RESET
+            step("完整性检查通过，从本地对象还原文件")
+            return self._reset(node_path, result)
+
+        # 3. Missing or corrupt objects: quarantine bad loose objects and fetch them again
+        result.tier = TIER_FETCH
+        moved = self._quarantine_corrupt_objects(node_path, fsck.stdout + fsck.stderr)
+        step(f"发现损坏或缺失的对象 (隔离 {moved} 个损坏的松散对象)，尝试从远程补全")
+        env = self.manager._get_git_env(proxy)
+        env["GIT_TERMINAL_PROMPT"] = "0"
+        with span("fetch", node=result.name):
+            res = self._git(node_path, "fetch", "--quiet", "origin", env=env)
+            if res.returncode != 0 or self._fsck(node_path).returncode != 0:
+                # Normal negotiation assumes local history is complete, refetch ignores that
+                res = self._git(node_path, "fetch", "--quiet", "--refetch", "origin", env=env)
+        if res.returncode != 0:
+            step(f"fetch 失败: {res.stderr.strip()}")
+            return False
+        if self._fsck(node_path).returncode != 0 or not self._head_ok(node_path):
+            step("补全后仍不完整")
+            return False
+        step("对象已补全，还原文件")
+        return self._reset(node_path, result)
+
+    def _reclone(self, node_path: str, remote_url: str, proxy: Optional[str], result: RepairResult,
+                 step: Callable[[str], None]) -> None:
+        result.tier = TIER_RECLONE
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        temp_path = _unique_path(os.path.join(self.backup_dir, f"{result.name}.repair_{stamp}"))
+        step("本地修复失败，重新克隆")
+        try:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            self.manager.clone_node(remote_url, temp_path, proxy=proxy)
+        except Exception as e:
+            self.manager.delete_node(temp_path)
+            result.message = f"重新克隆失败: {e}"
+            return
+
+        # Swap in the fresh clone; the old folder is kept when it may hold user files
+        backup_path = None
+        try:
+            if os.path.exists(node_path):
+                backup_path = _unique_path(os.path.join(self.backup_dir, f"{result.name}.broken_{stamp}"))
+                _move(node_path, backup_path)
+            _move(temp_path, node_path)
+        except OSError as e:
+            # Typically Windows refusing to move a folder whose .pyd files ComfyUI has loaded
+            if backup_path and os.path.exists(backup_path) and not os.path.exists(node_path):
+                try:
+                    _move(backup_path, node_path)
+                except OSError as restore_error:
+                    step(f"无法移回原目录，原目录位于 {backup_path}: {restore_error}")
+                    result.backup_path = backup_path
+            self.manager.delete_node(temp_path)
+            result.message = f"替换目录失败 (ComfyUI 是否正在运行?): {e}"
+            return
+        if backup_path:
+            if self._may_hold_user_files(backup_path):
+                result.backup_path = backup_path
+                step(f"原目录可能含有本地文件，已保留于 {backup_path}")
+            else:
+                self.manager.delete_node(backup_path)
+        result.ok = True
+
+    def _may_hold_user_files(self, path: str) -> bool:
+        if not resolve_git_dir(path):
+            return True
+        status = self._git(path, "status", "--porcelain", "--ignored")
+        if status.returncode != 0:
+            return True
+        # Bytecode caches are regenerated, anything else might be user data
+        return any("__pycache__" not in line and not line.endswith(".pyc")
+                   for line in status.stdout.splitlines() if line.strip())
+
+
+def _unique_path(path: str) -> str:
+    candidate, n = path, 1
+    while os.path.lexists(candidate):
+        candidate = f"{path}_{n}"
+        n += 1
+    return candidate
+
+
+def _move(src: str, dst: str) -> None:
+    """
+    Rename, copying only when dst is on another drive. A plain shutil.move would fall back
+    to copy-and-delete on any error and leave a half-deleted source behind.
+    """
+    try:
+        os.rename(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
@@ -0,0 +1,169 @@
+import os
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from node_manager import Node, normalize_remote_url
+
+# Row flags
+_GIT = 1
+_DELETED = 2
+
+# String id of None
+_NONE = 0
+
+
+class NodeTable:
+    """
+    Nodes stored column by column in typed arrays. Every string (name, folder, URL, time,
+    instance, SHA, status) is kept once in a shared pool and referenced by id, so the same
+    node across tens of instances and backups costs a few integers per row. Rows are
+    indexed by name and by normalized URL; Node objects are only built on request.
+    """
+
+    def __init__(self):
+        # Fleet workers set statuses concurrently, ids must be handed out under a lock
+        self._lock = threading.Lock()
+        self._strings: List[Optional[str]] = [None]
+        self._ids: Dict[str, int] = {}
+        # One string id per row and column
+        self._name = array("I")
+        self._dir = array("I")
+        self._url = array("I")
+        self._updated = array("I")
+        self._installed = array("I")
+        self._instance = array("I")
+        self._head = array("I")
+        self._status = array("I")
+        self._flags = array("B")
+        # Rows whose path is not <dir>/<name>
+        self._paths: Dict[int, str] = {}
+        self._by_name: Dict[int, List[int]] = {}
+        self._by_url: Dict[int, List[int]] = {}
+        self._live = 0
+
+    # --- String pool ---
+    def _intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NONE
+        sid = self._ids.get(value)
+        if sid is None:
+            with self._lock:
+                sid = self._ids.get(value)
+                if sid is None:
+                    sid = len(self._strings)
+                    self._strings.append(value)
+                    self._ids[value] = sid
+        return sid
+
+    def _str(self, column: array, row: int) -> Optional[str]:
+        return self._strings[column[row]]
+
+    # --- Rows ---
+    def __len__(self) -> int:
+        return self._live
+
+    def __iter__(self) -> Iterator[int]:
+        return (row for row in range(len(self._flags)) if not self._flags[row] & _DELETED)
+
+    def add(self, node: Node, instance: str = "", head_sha: Optional[str] = None, status: str = "未知") -> int:
+        row = len(self._flags)
+        name_id = self._intern(node.name)
+        folder, base = os.path.split(node.path)
+        if base != node.name:
+            self._paths[row] = node.path
+        self._name.append(name_id)
+        self._dir.append(self._intern(folder))
+        url_id = self._intern(node.remote_url)
+        self._url.append(url_id)
+        self._updated.append(self._intern(node.last_update_time))
+        self._installed.append(self._intern(node.install_time))
+        self._instance.append(self._intern(instance))
+        self._head.append(self._intern(head_sha))
+        self._status.append(self._intern(status))
+        self._flags.append(_GIT if node.is_git_repo else 0)
+        self._by_name.setdefault(name_id, []).append(row)
+        if node.remote_url:
+            self._by_url.setdefault(self._intern(normalize_remote_url(node.remote_url)), []).append(row)
+        self._live += 1
+        return row
+
+    def remove(self, row: int) -> None:
+        if self._flags[row] & _DELETED:
+            return
+        self._flags[row] |= _DELETED
+        self._live -= 1
+        rows = self._by_name.get(self._name[row])
+        if rows and row in rows:
+            rows.remove(row)
+            if not rows:
+                del self._by_name[self._name[row]]
+        url = self._str(self._url, row)
+        if url:
+            key = self._ids.get(normalize_remote_url(url))
+            rows = self._by_url.get(key)
+            if rows and row in rows:
+                rows.remove(row)
+                if not rows:
+                    del self._by_url[key]
+
+    def node(self, row: int) -> Node:
+        name = self._strings[self._name[row]]
+        return Node(
+            name=name,
+            path=self._paths.get(row) or os.path.join(self._strings[self._dir[row]], name),
+            is_git_repo=bool(self._flags[row] & _GIT),
+            remote_url=self._str(self._url, row),
+            last_update_time=self._str(self._updated, row),
+            install_time=self._str(self._installed, row),
+        )
+
+    # --- Columns ---
+    def name(self, row: int) -> str:
+        return self._strings[self._name[row]]
+
+    def url(self, row: int) -> Optional[str]:
+        return self._str(self._url, row)
+
+    def instance(self, row: int) -> str:
+        return self._str(self._instance, row) or ""
+
+    def head_sha(self, row: int) -> Optional[str]:
+        return self._str(self._head, row)
+
+    def set_head_sha(self, row: int, sha: Optional[str]) -> None:
+        self._head[row] = self._intern(sha)
+
+    def status(self, row: int) -> str:
+        return self._str(self._status, row)
+
+    def set_status(self, row: int, status: str) -> None:
+        self._status[row] = self._intern(status)
+
+    # --- Indexes ---
+    def rows_by_name(self, name: str) -> List[int]:
+        sid = self._ids.get(name)
+        return list(self._by_name.get(sid, ())) if sid is not None else []
+
+    def rows_by_url(self, url: str) -> List[int]:
+        sid = self._ids.get(normalize_remote_url(url))
+        return list(self._by_url.get(sid, ())) if sid is not None else []
+
+    def find(self, name: str, instance: str = "") -> Optional[int]:
+        sid, inst = self._ids.get(name), self._ids.get(instance)
+        if sid is None or inst is None:
+            return None
+        for row in self._by_name.get(sid, ()):
+            if self._instance[row] == inst:
+                return row
+        return None
+
+    def names(self) -> List[str]:
+        return [self._strings[sid] for sid in self._by_name]
+
+    def instance_rows(self, instance: str) -> List[int]:
+        sid = self._ids.get(instance)
+        if sid is None:
+            return []
+        column, flags = self._instance, self._flags
+        return [row for row in range(len(flags)) if column[row] == sid and not flags[row] & _DELETED]
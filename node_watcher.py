@@ -0,0 +1,241 @@
+import os
+import sys
+import time
+import select
+import struct
+import threading
+import ctypes
+import ctypes.util
+from typing import Callable, Dict, Optional, Set, Tuple
+
+# inotify(7) constants, see /usr/include/linux/inotify.h
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_ONLYDIR = 0x01000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+ROOT_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+NODE_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ONLYDIR
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Entries that never affect what scan_directory reports
+_IGNORED_NAMES = {"__pycache__"}
+
+
+def _is_node_dir_name(name: str) -> bool:
+    return not name.startswith('.') and name not in _IGNORED_NAMES
+
+
+class _PollingBackend:
+    """
+    Portable fallback: stat the custom_nodes entries and their .git dirs on an interval.
+    Git rewrites refs and the index through lock-file renames, so the .git directory
+    mtime moves on every pull, checkout or fetch.
+    """
+    name = "polling"
+
+    def __init__(self, root: str, interval: float):
+        self.root = root
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def _signature(self, path: str) -> Tuple:
+        sig = []
+        for p in (path, os.path.join(path, '.git'), os.path.join(path, '.git', 'config')):
+            try:
+                sig.append(os.stat(p).st_mtime_ns)
+            except OSError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _take_snapshot(self) -> Dict[str, Tuple]:
+        snapshot = {}
+        try:
+            with os.scandir(self.root) as it:
+                for entry in it:
+                    if _is_node_dir_name(entry.name) and entry.is_dir():
+                        snapshot[entry.name] = self._signature(entry.path)
+        except OSError:
+            pass
+        return snapshot
+
+    def wait(self, timeout: float) -> Set[str]:
+        time.sleep(min(timeout, self.interval))
+        current = self._take_snapshot()
+        changed = {name for name in current.keys() | self.snapshot.keys()
+                   if current.get(name) != self.snapshot.get(name)}
+        self.snapshot = current
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class _InotifyBackend:
+    """
+    Linux backend using inotify through libc via ctypes, no extra dependency.
+    Watches custom_nodes itself plus each node directory and its .git directory.
+    """
+    name = "inotify"
+
+    def __init__(self, root: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.root = root
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # watch descriptor -> node name (None for the custom_nodes root)
+        self.watches: Dict[int, Optional[str]] = {}
+        self._watch(root, None, ROOT_MASK)
+        with os.scandir(root) as it:
+            for entry in it:
+                if _is_node_dir_name(entry.name) and entry.is_dir():
+                    self._watch_node(entry.name)
+
+    def _watch(self, path: str, node_name: Optional[str], mask: int) -> None:
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd >= 0:
+            self.watches[wd] = node_name
+        elif node_name is None:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {path}")
+
+    def _watch_node(self, name: str) -> None:
+        node_path = os.path.join(self.root, name)
+        self._watch(node_path, name, NODE_MASK)
+        git_dir = os.path.join(node_path, '.git')
+        if os.path.isdir(git_dir):
+            self._watch(git_dir, name, NODE_MASK)
+
+    def wait(self, timeout: float) -> Set[str]:
+        changed: Set[str] = set()
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return changed
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode(sys.getfilesystemencoding(), "replace")
+            offset += length
+
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            node_name = self.watches[wd]
+            if node_name is None:
+                # Event on custom_nodes itself: a node folder appeared or went away
+                if not name or not _is_node_dir_name(name):
+                    continue
+                changed.add(name)
+                if mask & (IN_CREATE | IN_MOVED_TO) and mask & IN_ISDIR:
+                    self._watch_node(name)
+            else:
+                if name in _IGNORED_NAMES:
+                    continue
+                changed.add(node_name)
+                # A fresh clone creates .git after the node folder, pick it up
+                if name == '.git' and mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch(os.path.join(self.root, node_name, '.git'), node_name, NODE_MASK)
+        return changed
+
+    def close(self) -> None:
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class NodeWatcher:
+    """
+    Watch a custom_nodes directory and report which node folders changed.
+    Events are debounced: on_change(names) fires once a burst has been quiet for `debounce` seconds,
+    so a git pull or a folder copy results in a single callback per affected node.
+    """
+
+    def __init__(self, path: str, on_change: Callable[[Set[str]], None],
+                 debounce: float = 0.3, poll_interval: float = 0.5, use_inotify: bool = True):
+        self.path = path
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.backend = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def backend_name(self) -> str:
+        return self.backend.name if self.backend else "-"
+
+    def _create_backend(self):
+        if self.use_inotify and sys.platform.startswith("linux"):
+            try:
+                return _InotifyBackend(self.path)
+            except Exception as e:
+                print(f"inotify unavailable, falling back to polling: {e}")
+        return _PollingBackend(self.path, self.poll_interval)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        if not os.path.isdir(self.path):
+            raise FileNotFoundError(f"The path {self.path} does not exist.")
+        self.backend = self._create_backend()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+        if self.backend:
+            self.backend.close()
+            self.backend = None
+
+    def _run(self) -> None:
+        pending: Set[str] = set()
+        last_event = 0.0
+        while not self._stop.is_set():
+            timeout = self.debounce if pending else self.poll_interval
+            try:
+                changed = self.backend.wait(timeout)
+            except Exception as e:
+                print(f"Node watcher error: {e}")
+                changed = set()
+                time.sleep(self.poll_interval)
+            now = time.monotonic()
+            if changed:
+                pending |= changed
+                last_event = now
+            if pending and now - last_event >= self.debounce:
+                batch, pending = pending, set()
+                try:
+                    self.on_change(batch)
+                except Exception as e:
+                    print(f"Node watcher callback error: {e}")
@@ -0,0 +1,455 @@
+import os
+import json
+import threading
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from packaging.markers import Marker
+from packaging.requirements import Requirement, InvalidRequirement
+from packaging.specifiers import SpecifierSet
+from packaging.utils import canonicalize_name
+from packaging.version import Version, InvalidVersion
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+# pip options that take a value and never name a package
+_OPTION_PREFIXES = (
+    "-i", "--index-url", "--extra-index-url", "-f", "--find-links", "--trusted-host",
+    "--no-binary", "--only-binary", "--prefer-binary", "--pre", "--no-index",
+    "--use-feature", "--config-settings", "--global-option", "--install-option",
+)
+_VCS_PREFIXES = ("git+", "hg+", "svn+", "bzr+")
+
+# Runs inside the target interpreter: marker environment plus installed distributions, no pip
+_PROBE_SCRIPT = r"""
+import json, os, platform, sys
+try:
+    from importlib import metadata
+except ImportError:
+    import importlib_metadata as metadata
+impl = sys.implementation
+iv = impl.version
+impl_version = "{0.major}.{0.minor}.{0.micro}".format(iv)
+if iv.releaselevel != "final":
+    impl_version += iv.releaselevel[0] + str(iv.serial)
+env = {
+    "implementation_name": impl.name,
+    "implementation_version": impl_version,
+    "os_name": os.name,
+    "platform_machine": platform.machine(),
+    "platform_release": platform.release(),
+    "platform_system": platform.system(),
+    "platform_version": platform.version(),
+    "python_full_version": platform.python_version(),
+    "platform_python_implementation": platform.python_implementation(),
+    "python_version": ".".join(platform.python_version_tuple()[:2]),
+    "sys_platform": sys.platform,
+}
+packages = {}
+extra_requires = {}
+for dist in metadata.distributions():
+    name = dist.metadata["Name"]
+    if name:
+        packages[name] = dist.version
+        # Only needed to check 'pkg[extra]' requirements, keep the output small
+        if dist.metadata.get_all("Provides-Extra"):
+            extra_requires[name] = dist.requires or []
+print(json.dumps({"env": env, "packages": packages, "extra_requires": extra_requires,
+                  "paths": [p for p in sys.path if p.endswith("-packages")]}))
+"""
+
+
+@dataclass
+class ReqEntry:
+    node: str
+    raw: str
+    name: Optional[str]
+    specifier: str = ""
+    marker: Optional[str] = None
+    url: Optional[str] = None
+    extras: List[str] = field(default_factory=list)
+    source: str = ""
+    line_no: int = 0
+    error: Optional[str] = None
+    # From a -c file: pins the version if something requires the package, requires nothing itself
+    constraint: bool = False
+
+    @property
+    def is_vcs(self) -> bool:
+        return bool(self.url) and self.url.startswith(_VCS_PREFIXES)
+
+
+@dataclass
+class EnvironmentProbe:
+    python_path: str
+    env: Dict[str, str]
+    packages: Dict[str, str]
+    site_packages: List[str] = field(default_factory=list)
+    extra_requires: Dict[str, List[str]] = field(default_factory=dict)
+
+
+@dataclass
+class PackageReport:
+    name: str
+    entries: List[ReqEntry] = field(default_factory=list)
+    constraints: List[ReqEntry] = field(default_factory=list)
+    installed: Optional[str] = None
+    conflict: bool = False
+    unsatisfied: List[str] = field(default_factory=list)
+
+    @property
+    def status(self) -> str:
+        if self.conflict:
+            return "冲突"
+        if self.installed is None:
+            return "未安装"
+        if self.unsatisfied:
+            return "不满足"
+        return "正常"
+
+
+@dataclass
+class AnalysisResult:
+    packages: Dict[str, PackageReport]
+    errors: List[ReqEntry]
+    node_count: int
+
+    @property
+    def problems(self) -> List[PackageReport]:
+        return [p for p in self.packages.values() if p.status != "正常"]
+
+
+def _logical_lines(text: str):
+    """
+    Yield (line_no, line) with comments stripped and backslash continuations joined.
+    """
+    buf, start = "", 0
+    for no, line in enumerate(text.splitlines(), 1):
+        # A ' #' starts a comment, but '#' inside URLs (#egg=) does not
+        if line.lstrip().startswith("#"):
+            line = ""
+        elif " #" in line:
+            line = line.split(" #", 1)[0]
+        line = line.rstrip()
+        if not buf:
+            start = no
+        if line.endswith("\\"):
+            buf += line[:-1] + " "
+            continue
+        buf += line
+        if buf.strip():
+            yield start, buf.strip()
+        buf = ""
+    if buf.strip():
+        yield start, buf.strip()
+
+
+def _egg_name(url: str) -> Optional[str]:
+    fragment = url.partition("#")[2]
+    for part in fragment.split("&"):
+        key, _, value = part.partition("=")
+        if key == "egg" and value:
+            return value.split("[")[0]
+    # Fall back to the repository name, dropping an '@ref' suffix
+    tail = url.split("#")[0].rstrip("/").rsplit("/", 1)[-1].split("@")[0]
+    return tail[:-4] if tail.endswith(".git") else tail or None
+
+
+def parse_requirements_file(path: str, node: str, seen: Optional[Set[str]] = None,
+                            constraint: bool = False) -> List[ReqEntry]:
+    """
+    Parse a requirements file into entries, following -r/-c includes relative to the file.
+    Entries of -c files are marked as constraints.
+    """
+    seen = seen if seen is not None else set()
+    real = os.path.realpath(path)
+    if real in seen:
+        return []
+    seen.add(real)
+
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            text = f.read()
+    except OSError as e:
+        return [ReqEntry(node=node, raw="", name=None, source=path, error=str(e))]
+
+    entries = []
+    base = os.path.dirname(path)
+    for line_no, line in _logical_lines(text):
+        # Per-requirement pip options like --hash are not part of the requirement
+        line = " ".join(tok for tok in line.split() if not tok.startswith("--hash"))
+
+        for opt in ("-r", "--requirement", "-c", "--constraint"):
+            if line == opt or line.startswith(opt + " ") or line.startswith(opt + "="):
+                include = line[len(opt):].lstrip(" =")
+                entries.extend(parse_requirements_file(os.path.join(base, include), node, seen,
+                                                       constraint or opt in ("-c", "--constraint")))
+                break
+        else:
+            if line.startswith(_OPTION_PREFIXES):
+                continue
+            editable = False
+            if line.startswith(("-e ", "--editable ", "--editable=")):
+                line = line.split(None, 1)[1] if " " in line else line.split("=", 1)[1]
+                editable = True
+            entry = _parse_line(line, node, path, line_no, editable)
+            entry.constraint = constraint
+            entries.append(entry)
+    return entries
+
+
+def _parse_line(line: str, node: str, source: str, line_no: int, editable: bool) -> ReqEntry:
+    entry = ReqEntry(node=node, raw=line, name=None, source=source, line_no=line_no)
+    requirement_part, _, marker_part = line.partition(";")
+
+    if requirement_part.startswith(_VCS_PREFIXES) or editable or "://" in requirement_part.split("@")[0]:
+        # Bare URL / VCS requirement, the package name comes from #egg=
+        entry.url = requirement_part.strip()
+        name = _egg_name(entry.url)
+        entry.name = canonicalize_name(name) if name else None
+        entry.marker = marker_part.strip() or None
+        return entry
+
+    try:
+        req = Requirement(line)
+    except InvalidRequirement as e:
+        entry.error = str(e)
+        return entry
+    entry.name = canonicalize_name(req.name)
+    entry.specifier = str(req.specifier)
+    entry.extras = sorted(req.extras)
+    entry.marker = str(req.marker) if req.marker else None
+    entry.url = req.url
+    return entry
+
+
+def probe_environment(python_path: str, timeout: int = 60) -> EnvironmentProbe:
+    """
+    Read the marker environment and installed distributions of an interpreter with one subprocess.
+    """
+    res = subprocess.run([python_path, "-c", _PROBE_SCRIPT], capture_output=True, text=True,
+                         timeout=timeout, check=True, creationflags=_CREATE_NO_WINDOW)
+    data = json.loads(res.stdout)
+    packages = {canonicalize_name(k): v for k, v in data["packages"].items()}
+    extra_requires = {canonicalize_name(k): v for k, v in data.get("extra_requires", {}).items()}
+    return EnvironmentProbe(python_path, data["env"], packages, data.get("paths", []), extra_requires)
+
+
+def _site_signature(paths: List[str]) -> Tuple:
+    sig = []
+    for path in paths:
+        try:
+            sig.append((path, os.stat(path).st_mtime_ns))
+        except OSError:
+            sig.append((path, None))
+    return tuple(sig)
+
+
+class PackageSnapshotCache:
+    """
+    Installed-package snapshot per interpreter, probed once and reused until a site-packages
+    directory changes. Installing, upgrading or removing a distribution adds or removes its
+    *.dist-info folder, which bumps the directory mtime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple, EnvironmentProbe]] = {}
+        self._probe_locks: Dict[str, threading.Lock] = {}
+
+    def _valid(self, python_path: str) -> Optional[EnvironmentProbe]:
+        with self._lock:
+            cached = self._entries.get(python_path)
+        if cached and _site_signature(cached[1].site_packages) == cached[0]:
+            return cached[1]
+        return None
+
+    def get(self, python_path: str) -> EnvironmentProbe:
+        probe = self._valid(python_path)
+        if probe:
+            return probe
+        with self._lock:
+            probe_lock = self._probe_locks.setdefault(python_path, threading.Lock())
+        # Parallel installs ask at the same time, only one of them spawns the interpreter
+        with probe_lock:
+            probe = self._valid(python_path)
+            if probe:
+                return probe
+            probe = probe_environment(python_path)
+            # Without a known site-packages there is nothing to detect changes by, so don't cache
+            if probe.site_packages:
+                with self._lock:
+                    self._entries[python_path] = (_site_signature(probe.site_packages), probe)
+            return probe
+
+    def invalidate(self, python_path: Optional[str] = None) -> None:
+        with self._lock:
+            if python_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(python_path, None)
+
+
+def unmet_requirements(entries: List[ReqEntry], probe: EnvironmentProbe) -> List[ReqEntry]:
+    """
+    Entries the snapshot cannot show as satisfied. An empty result means pip would have nothing to do.
+    Only direct requirements and the requirements of requested extras are checked, not the full
+    dependency tree; URL/VCS requirements and unparsable lines always count as unmet.
+    """
+    unmet = []
+    marker_results: Dict[str, bool] = {}
+    for entry in entries:
+        if entry.constraint:
+            continue
+        if entry.error or not entry.name or entry.url:
+            unmet.append(entry)
+            continue
+        if entry.marker:
+            if entry.marker not in marker_results:
+                marker_results[entry.marker] = _marker_applies(entry.marker, probe.env)
+            if not marker_results[entry.marker]:
+                continue
+        if not _installed_satisfies(entry.name, entry.specifier, probe):
+            unmet.append(entry)
+            continue
+        for extra in entry.extras:
+            if not _extra_satisfied(entry.name, extra, probe):
+                unmet.append(entry)
+                break
+    return unmet
+
+
+def _installed_satisfies(name: str, specifier: str, probe: EnvironmentProbe) -> bool:
+    installed = probe.packages.get(name)
+    if installed is None:
+        return False
+    if not specifier:
+        return True
+    try:
+        return SpecifierSet(specifier).contains(Version(installed), prereleases=True)
+    except InvalidVersion:
+        return False
+
+
+def _extra_satisfied(name: str, extra: str, probe: EnvironmentProbe) -> bool:
+    env = dict(probe.env, extra=canonicalize_name(extra))
+    for line in probe.extra_requires.get(name, []):
+        try:
+            req = Requirement(line)
+        except InvalidRequirement:
+            return False
+        # Requirements without an extra marker belong to the base install
+        if not req.marker or "extra" not in str(req.marker):
+            continue
+        try:
+            if not req.marker.evaluate(env):
+                continue
+        except Exception:
+            return False
+        if req.url or not _installed_satisfies(canonicalize_name(req.name), str(req.specifier), probe):
+            return False
+    return True
+
+
+def _candidate_versions(specifiers: List[SpecifierSet], installed: Optional[str]) -> List[Version]:
+    """
+    Versions worth testing against a combined specifier: every version named in a clause,
+    plus a point just above it (catches open ranges like '>1,<2'), plus the installed version.
+    """
+    raw = {installed} if installed else set()
+    for spec_set in specifiers:
+        for spec in spec_set:
+            raw.add(spec.version.rstrip(".*"))
+    candidates = []
+    for value in raw:
+        try:
+            v = Version(value)
+        except InvalidVersion:
+            continue
+        candidates.append(v)
+        candidates.append(Version(v.base_version + ".1"))
+        release = list(v.release)
+        release[-1] += 1
+        candidates.append(Version(".".join(map(str, release))))
+    return candidates
+
+
+def specifiers_compatible(specifiers: List[SpecifierSet], installed: Optional[str] = None) -> bool:
+    combined = SpecifierSet()
+    for spec_set in specifiers:
+        combined &= spec_set
+    if not str(combined):
+        return True
+    return any(combined.contains(v, prereleases=True) for v in _candidate_versions(specifiers, installed))
+
+
+class RequirementsAnalyzer:
+    """
+    Environment-wide view of every node's requirements: which nodes pin which versions,
+    incompatible specifiers across nodes and whether the installed versions satisfy them.
+    """
+
+    def parse_node(self, node_path: str) -> List[ReqEntry]:
+        req_file = os.path.join(node_path, "requirements.txt")
+        if not os.path.exists(req_file):
+            return []
+        return parse_requirements_file(req_file, os.path.basename(node_path))
+
+    def analyze(self, node_paths: List[str], probe: Optional[EnvironmentProbe] = None) -> AnalysisResult:
+        env = probe.env if probe else None
+        installed = probe.packages if probe else {}
+        packages: Dict[str, PackageReport] = {}
+        errors: List[ReqEntry] = []
+        # The same markers repeat across nodes, evaluate each distinct one once
+        marker_results: Dict[str, bool] = {}
+        constraints: List[ReqEntry] = []
+
+        for node_path in node_paths:
+            for entry in self.parse_node(node_path):
+                if entry.constraint:
+                    if entry.name and not entry.error:
+                        constraints.append(entry)
+                    continue
+                if entry.error or not entry.name:
+                    errors.append(entry)
+                    continue
+                if entry.marker:
+                    if entry.marker not in marker_results:
+                        marker_results[entry.marker] = _marker_applies(entry.marker, env)
+                    if not marker_results[entry.marker]:
+                        continue
+                report = packages.get(entry.name)
+                if report is None:
+                    report = packages[entry.name] = PackageReport(name=entry.name, installed=installed.get(entry.name))
+                report.entries.append(entry)
+
+        # Constraints only count for packages some node actually requires
+        for entry in constraints:
+            report = packages.get(entry.name)
+            if report is None:
+                continue
+            if entry.marker and not marker_results.setdefault(entry.marker, _marker_applies(entry.marker, env)):
+                continue
+            report.constraints.append(entry)
+
+        for report in packages.values():
+            pinned = [(e, SpecifierSet(e.specifier)) for e in report.entries + report.constraints if e.specifier]
+            if len({e.node for e, _ in pinned}) > 1:
+                report.conflict = not specifiers_compatible([s for _, s in pinned], report.installed)
+            if report.installed is not None:
+                try:
+                    version = Version(report.installed)
+                except InvalidVersion:
+                    continue
+                report.unsatisfied = sorted({e.node for e, s in pinned if not s.contains(version, prereleases=True)})
+
+        return AnalysisResult(packages=packages, errors=errors, node_count=len(node_paths))
+
+
+def _marker_applies(marker: str, env: Optional[Dict[str, str]]) -> bool:
+    try:
+        return Marker(marker).evaluate(env)
+    except Exception:
+        # Unknown markers should not hide a requirement
+        return True
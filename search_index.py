@@ -0,0 +1,191 @@
+import re
+import shlex
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Fields matched by terms without a field prefix
+DEFAULT_FIELDS = ("name", "owner", "repo")
+
+# Few distinct values per field, indexed by value instead of scanned per row
+CATEGORICAL_FIELDS = ("status", "type", "instance")
+
+FIELD_ALIASES = {
+    "名称": "name", "作者": "owner", "仓库": "repo", "地址": "url", "状态": "status",
+    "类型": "type", "实例": "instance", "更新": "updated", "安装": "installed", "提交": "committed",
+    "author": "owner", "user": "owner",
+}
+
+_TERM_RE = re.compile(r"^(-?)([^\s:<>]+)([:<>])(.*)$")
+_REMOTE_RE = re.compile(r"[:/]([^/:]+)/([^/]+?)(?:\.git)?/?$")
+
+
+@dataclass(frozen=True)
+class Term:
+    value: str
+    field: Optional[str] = None
+    op: str = ":"
+    negate: bool = False
+
+    def implies(self, other: "Term") -> bool:
+        """
+        True when every row matching self also matches other, e.g. 'name:kijai' implies 'name:kij'.
+        """
+        return (not self.negate and not other.negate and self.op == other.op == ":"
+                and self.field == other.field and other.value in self.value)
+
+
+def parse_query(text: str) -> List[Term]:
+    """
+    'owner:kijai status:有更新 video -name:old updated>2024-05' -> terms. Quotes group words.
+    Unknown field prefixes are searched as plain text.
+    """
+    try:
+        tokens = shlex.split(text)
+    except ValueError:
+        # Unbalanced quote while the user is still typing
+        tokens = text.replace('"', " ").split()
+    terms = []
+    for token in tokens:
+        m = _TERM_RE.match(token)
+        if m:
+            negate, name, op, value = m.groups()
+            field = FIELD_ALIASES.get(name, name.lower())
+            if field in DEFAULT_FIELDS or field in CATEGORICAL_FIELDS or field in ("url", "updated", "installed", "committed"):
+                if value:
+                    terms.append(Term(value.lower(), field, op, bool(negate)))
+                continue
+        negate = token.startswith("-") and len(token) > 1
+        terms.append(Term(token[1:].lower() if negate else token.lower(), negate=negate))
+    return terms
+
+
+def split_remote(url: Optional[str]) -> Tuple[str, str]:
+    """
+    ('owner', 'repo') of a remote URL, empty strings when it has no such shape.
+    """
+    if not url:
+        return "", ""
+    m = _REMOTE_RE.search(url.strip())
+    return (m.group(1), m.group(2)) if m else ("", "")
+
+
+class SearchIndex:
+    """
+    Rows of lowercased field values kept up to date as nodes change, so a keystroke only
+    runs the query: categorical fields through value postings, text through precomputed
+    strings. Typing more of the same query narrows the previous result instead of
+    scanning every row again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        # Per row, each field's values joined (and DEFAULT_FIELDS under ""), one 'in' per substring test
+        self._text: Dict[str, Dict[str, str]] = {}
+        self._postings: Dict[str, Dict[str, Set[str]]] = {f: {} for f in CATEGORICAL_FIELDS}
+        self._last: Optional[Tuple[List[Term], Set[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @staticmethod
+    def _values(value) -> Tuple[str, ...]:
+        if value is None:
+            return ()
+        if isinstance(value, (list, tuple, set, frozenset)):
+            return tuple(str(v).lower() for v in value if v)
+        return (str(value).lower(),) if value != "" else ()
+
+    def _unindex(self, key: str) -> None:
+        row = self._rows.get(key, {})
+        for field, postings in self._postings.items():
+            for value in row.get(field, ()):
+                keys = postings.get(value)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del postings[value]
+
+    def set(self, key: str, **fields) -> None:
+        """
+        Replace a row. Pass url= to get owner and repo derived from it.
+        """
+        if "url" in fields and "owner" not in fields:
+            fields["owner"], fields["repo"] = split_remote(fields["url"])
+        with self._lock:
+            self._unindex(key)
+            row = {field: self._values(value) for field, value in fields.items()}
+            self._rows[key] = row
+            text = {field: "\0".join(values) for field, values in row.items()}
+            text[""] = "\0".join(text.get(field, "") for field in DEFAULT_FIELDS)
+            self._text[key] = text
+            for field, postings in self._postings.items():
+                for value in row.get(field, ()):
+                    postings.setdefault(value, set()).add(key)
+            self._last = None
+
+    def update(self, key: str, **fields) -> None:
+        with self._lock:
+            current = self._rows.get(key)
+        if current is None:
+            return
+        merged = dict(current)
+        merged.update(fields)
+        if "url" in fields and "owner" not in fields:
+            merged["owner"], merged["repo"] = split_remote(fields["url"])
+        self.set(key, **merged)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._unindex(key)
+            self._rows.pop(key, None)
+            self._text.pop(key, None)
+            self._last = None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self._text.clear()
+            for postings in self._postings.values():
+                postings.clear()
+            self._last = None
+
+    def _match_term(self, term: Term, keys: Iterable[str]) -> Set[str]:
+        if term.field in self._postings and term.op == ":":
+            # Substring over the few distinct values, so 'status:有更' works mid-typing
+            hits = set()
+            for value, posted in self._postings[term.field].items():
+                if term.value in value:
+                    hits |= posted
+            return hits.intersection(keys)
+        if term.op == ":":
+            field, value, text = term.field or "", term.value, self._text
+            return {key for key in keys if value in text[key].get(field, "")}
+        fields = (term.field,) if term.field else DEFAULT_FIELDS
+        greater = term.op == ">"
+        rows = self._rows
+        return {key for key in keys
+                if any((v > term.value) if greater else (v < term.value)
+                       for field in fields for v in rows[key].get(field, ()))}
+
+    def search(self, text: str) -> Set[str]:
+        """
+        Keys of the rows matching every term of the query.
+        """
+        terms = parse_query(text)
+        with self._lock:
+            candidates: Set[str] = set(self._rows)
+            if self._last is not None:
+                last_terms, last_result = self._last
+                if all(any(t.implies(old) for t in terms) for old in last_terms):
+                    candidates = set(last_result)
+            # Posting lookups first, they shrink the set the text terms have to scan
+            ordered = sorted(terms, key=lambda t: (t.negate, t.field not in self._postings))
+            for term in ordered:
+                if not candidates:
+                    break
+                hits = self._match_term(term, candidates)
+                candidates = candidates - hits if term.negate else hits
+            self._last = (terms, candidates)
+            return set(candidates)
@@ -0,0 +1,322 @@
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import span
+from requirements_analyzer import PackageSnapshotCache, parse_requirements_file, unmet_requirements
+
+_CREATE_NO_WINDOW = 0x08000000 if os.name == "nt" else 0
+
+INDEX_FILE = ".wheelhouse_index.json"
+DEFAULT_MAX_BYTES = 10 * 1024 ** 3
+
+_WHEEL_RE = re.compile(r"([^\s/\\]+\.whl)")
+
+# Requirements file options that still apply when only some lines are wheeled
+_INDEX_OPTIONS = ("-i", "--index-url", "--extra-index-url", "-f", "--find-links", "--trusted-host", "--pre")
+
+
+@dataclass
+class PrefetchResult:
+    python_path: str
+    requirements_path: str
+    ok: bool
+    wheels: int = 0
+    message: str = ""
+
+
+class Wheelhouse:
+    """
+    A shared directory of built wheels for node dependencies.
+    Wheels are fetched once with 'pip wheel' and installed with '--no-index --find-links',
+    so a second ComfyUI instance installs the same requirements without network access.
+    The directory is kept under max_bytes by evicting the least recently used wheels.
+    With a package snapshot cache only requirements the interpreter does not already
+    satisfy are wheeled, so installed torch or xformers pins never land in the house.
+    """
+
+    def __init__(self, root: str, max_bytes: int = DEFAULT_MAX_BYTES, max_workers: int = 4,
+                 snapshots: Optional[PackageSnapshotCache] = None):
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.snapshots = snapshots
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self._last_used: Dict[str, float] = self._load_index()
+
+    # --- Index ---
+    def _load_index(self) -> Dict[str, float]:
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self) -> None:
+        with self._lock:
+            data = dict(self._last_used)
+        try:
+            with open(os.path.join(self.root, INDEX_FILE), 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError as e:
+            print(f"Error saving wheelhouse index: {e}")
+
+    def _touch(self, names: Iterable[str]) -> None:
+        now = time.time()
+        with self._lock:
+            for name in names:
+                self._last_used[name] = now
+        self._save_index()
+
+    def wheels(self) -> Dict[str, int]:
+        """
+        Wheel file name -> size in bytes.
+        """
+        result = {}
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".whl"):
+                    result[entry.name] = entry.stat().st_size
+        return result
+
+    def size(self) -> int:
+        return sum(self.wheels().values())
+
+    # --- Fetch / Install ---
+    def _unmet_requirements_file(self, requirements_path: str, python_path: str, tmp: str) -> Optional[str]:
+        """
+        A requirements file with only the lines the interpreter does not satisfy yet (URL/VCS
+        lines always), or None when nothing is missing. Without a snapshot cache, or when
+        the interpreter cannot be probed, the original file is returned.
+        """
+        if self.snapshots is None:
+            return requirements_path
+        node = os.path.basename(os.path.dirname(requirements_path))
+        try:
+            probe = self.snapshots.get(python_path)
+            entries = parse_requirements_file(requirements_path, node)
+            unmet = unmet_requirements(entries, probe)
+        except Exception as e:
+            print(f"Could not check installed packages for {node}, wheeling all requirements: {e}")
+            return requirements_path
+        if not unmet:
+            return None
+        lines = _index_options(requirements_path)
+        # Keep the version pins of constraint files, the new file lives elsewhere so paths become absolute
+        for source in sorted({entry.source for entry in entries if entry.constraint}):
+            lines.append(f"-c {os.path.abspath(source)}")
+        lines.extend(entry.raw for entry in unmet if entry.raw)
+        path = os.path.join(tmp, "requirements.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+
+    def fetch(self, requirements_path: str, python_path: str, env: Optional[dict] = None) -> List[str]:
+        """
+        Download or build wheels for the unmet requirements of a file (and their dependencies) with
+        the target interpreter. Returns the wheel names involved, empty when everything is installed.
+        Wheels already in the house are reused instead of downloaded.
+        """
+        # Build into a private dir and move into place, so parallel fetches never see partial files
+        tmp = tempfile.mkdtemp(prefix=".fetch_", dir=self.root)
+        names = []
+        try:
+            wanted = self._unmet_requirements_file(requirements_path, python_path, tmp)
+            if wanted is None:
+                return names
+            cmd = [python_path, "-m", "pip", "wheel", "-r", wanted,
+                   "-w", tmp, "--find-links", self.root]
+            # Relative local paths in the requirements resolve against the node folder
+            subprocess.run(cmd, env=env, cwd=os.path.dirname(os.path.abspath(requirements_path)), check=True,
+                           capture_output=True, text=True, creationflags=_CREATE_NO_WINDOW)
+            for name in os.listdir(tmp):
+                if not name.endswith(".whl"):
+                    continue
+                dest = os.path.join(self.root, name)
+                if os.path.exists(dest):
+                    os.remove(os.path.join(tmp, name))
+                else:
+                    os.replace(os.path.join(tmp, name), dest)
+                names.append(name)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        self._touch(names)
+        self.evict(protect=set(names))
+        return names
+
+    def _offline_requirements(self, requirements_path: str) -> Tuple[List[str], List[str]]:
+        """
+        (lines pip can resolve from the wheelhouse, lines that need the network). A URL/VCS
+        requirement that states its name becomes that name, fetch built its wheel into the house;
+        without one there is nothing to look up, so it stays online.
+        """
+        node = os.path.basename(os.path.dirname(requirements_path))
+        entries = parse_requirements_file(requirements_path, node)
+        offline, online = [], []
+        for source in sorted({entry.source for entry in entries if entry.constraint}):
+            offline.append(f"-c {os.path.abspath(source)}")
+        for entry in entries:
+            if entry.constraint or not entry.raw:
+                continue
+            if entry.url and not entry.url.startswith("file:"):
+                # 'name @ url' and '#egg=name' state the name; for a bare URL it is only a guess
+                named = entry.name and (not entry.raw.startswith(entry.url) or "egg=" in entry.url)
+                if not named:
+                    online.append(entry.raw)
+                    continue
+                extras = f"[{','.join(entry.extras)}]" if entry.extras else ""
+                offline.append(entry.name + extras + (f"; {entry.marker}" if entry.marker else ""))
+            else:
+                # Plain requirements, local paths and lines pip parses better than we do
+                offline.append(entry.raw)
+        return offline, online
+
+    def install_offline(self, requirements_path: str, python_path: str, env: Optional[dict] = None) -> List[str]:
+        """
+        Install a requirements file from the wheelhouse only. Raises CalledProcessError if anything is missing.
+        Returns the URL/VCS lines that cannot be served offline and still need installing.
+        """
+        offline, online = self._offline_requirements(requirements_path)
+        tmp = tempfile.mkdtemp(prefix=".install_", dir=self.root)
+        try:
+            path = os.path.join(tmp, "requirements.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(offline) + "\n")
+            cmd = [python_path, "-m", "pip", "install", "--no-index", "--find-links", self.root, "-r", path]
+            # Relative local paths in the requirements resolve against the node folder
+            res = subprocess.run(cmd, env=env, cwd=os.path.dirname(os.path.abspath(requirements_path)), check=True,
+                                 capture_output=True, text=True, creationflags=_CREATE_NO_WINDOW)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        used = [m.group(1) for line in res.stdout.splitlines()
+                if line.lstrip().startswith("Processing") for m in [_WHEEL_RE.search(line)] if m]
+        if used:
+            self._touch(used)
+        return online
+
+    def install(self, requirements_path: str, python_path: str, env: Optional[dict] = None) -> bool:
+        """
+        Install offline, fetching the missing wheels first if needed.
+        Returns False when the requirements cannot be served from the wheelhouse (caller should use plain pip).
+        """
+        name = os.path.basename(os.path.dirname(requirements_path))
+        try:
+            try:
+                online = self.install_offline(requirements_path, python_path, env)
+            except subprocess.CalledProcessError:
+                with span("wheel", node=name):
+                    self.fetch(requirements_path, python_path, env)
+                online = self.install_offline(requirements_path, python_path, env)
+            if online:
+                print(f"{name}: {len(online)} URL/VCS requirement(s) without a stated package name cannot be installed "
+                      f"from the wheelhouse, installing them online: {', '.join(online)}")
+                self._install_online(online, requirements_path, python_path, env)
+            return True
+        except Exception as e:
+            detail = getattr(e, "stderr", None) or str(e)
+            print(f"Wheelhouse could not serve {name}, falling back to online install: {detail.strip()[-300:]}")
+            return False
+
+    def _install_online(self, lines: List[str], requirements_path: str, python_path: str,
+                        env: Optional[dict] = None) -> None:
+        tmp = tempfile.mkdtemp(prefix=".install_", dir=self.root)
+        try:
+            path = os.path.join(tmp, "requirements.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(_index_options(requirements_path) + lines) + "\n")
+            subprocess.run([python_path, "-m", "pip", "install", "-r", path], env=env,
+                           cwd=os.path.dirname(os.path.abspath(requirements_path)), check=True,
+                           capture_output=True, text=True, creationflags=_CREATE_NO_WINDOW)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def prefetch(self, jobs: List[Tuple[str, str]], env: Optional[dict] = None,
+                 progress: Optional[Callable[[PrefetchResult], None]] = None) -> List[PrefetchResult]:
+        """
+        Fetch wheels for many (python_path, requirements_path) pairs in parallel.
+        Files with identical content for the same interpreter are fetched once.
+        """
+        unique: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for python_path, req_path in jobs:
+            try:
+                with open(req_path, 'rb') as f:
+                    digest = hashlib.sha1(f.read()).hexdigest()
+            except OSError:
+                continue
+            unique.setdefault((python_path, digest), (python_path, req_path))
+
+        def _run(python_path: str, req_path: str) -> PrefetchResult:
+            node = os.path.basename(os.path.dirname(req_path))
+            try:
+                with span("wheel", node=node):
+                    names = self.fetch(req_path, python_path, env)
+                return PrefetchResult(python_path, req_path, True, len(names), "" if names else "依赖均已安装")
+            except subprocess.CalledProcessError as e:
+                return PrefetchResult(python_path, req_path, False, message=(e.stderr or "").strip()[-300:])
+            except Exception as e:
+                return PrefetchResult(python_path, req_path, False, message=str(e))
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = [pool.submit(_run, py, req) for py, req in unique.values()]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if progress:
+                    progress(result)
+        return results
+
+    # --- Eviction ---
+    def evict(self, protect: Optional[set] = None) -> List[str]:
+        """
+        Remove least recently used wheels until the house fits in max_bytes.
+        """
+        protect = protect or set()
+        wheels = self.wheels()
+        total = sum(wheels.values())
+        if total <= self.max_bytes:
+            return []
+        with self._lock:
+            last_used = dict(self._last_used)
+
+        def _age(name: str) -> float:
+            if name in last_used:
+                return last_used[name]
+            try:
+                return os.path.getmtime(os.path.join(self.root, name))
+            except OSError:
+                return 0.0
+
+        removed = []
+        for name in sorted(wheels, key=_age):
+            if total <= self.max_bytes:
+                break
+            if name in protect:
+                continue
+            try:
+                os.remove(os.path.join(self.root, name))
+            except OSError:
+                continue
+            total -= wheels[name]
+            removed.append(name)
+        if removed:
+            with self._lock:
+                for name in removed:
+                    self._last_used.pop(name, None)
+            self._save_index()
+        return removed
+
+
+def _index_options(requirements_path: str) -> List[str]:
+    with open(requirements_path, "r", encoding="utf-8", errors="replace") as f:
+        return [line.strip() for line in f if line.strip().startswith(_INDEX_OPTIONS)]